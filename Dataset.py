@@ -1,4 +1,8 @@
+import sys
+
 import kaggle
 
-# Descargar el dataset
-kaggle.api.dataset_download_files('mexwell/carrier-on-time-performance-dataset', path='./data', unzip=True)
+# Descargar el dataset. Con --sin-descomprimir se conserva el .zip y etl.py lo lee
+# directamente (python etl.py --origen ./data/carrier-on-time-performance-dataset.zip)
+descomprimir = '--sin-descomprimir' not in sys.argv
+kaggle.api.dataset_download_files('mexwell/carrier-on-time-performance-dataset', path='./data', unzip=descomprimir)
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+from reglas import comparaciones, Bandera
+
+
+#  Operaciones soportadas por métrica:
+#    ('col', 'count')               valores no nulos
+#    (None, 'size')                 filas del grupo
+#    ('col', 'sum') / ('col', 'mean')
+#    ('col', 'count_if', ('>', 60)) valores no nulos que cumplen la condición
+operaciones = {'count', 'size', 'sum', 'mean', 'count_if'}
+
+
+def _valores_nivel(unicos):
+    #  Las categorías se guardan con su tipo de valor para poder combinar lotes
+    if isinstance(unicos, pd.Categorical):
+        return pd.Index(np.asarray(unicos))
+    return pd.Index(unicos)
+
+
+class Agregacion:
+    #  Calcula varias métricas por clave en una sola pasada vectorizada: las claves
+    #  se codifican una vez y cada acumulador es un `np.bincount` sobre esos códigos.
+    #  El resultado parcial (sumas, conteos) se puede combinar entre lotes.
+
+    def __init__(self, claves, metricas):
+        self.claves = list(claves)
+        self.metricas = {}
+        for nombre, definicion in metricas.items():
+            columna, operacion, *condicion = definicion
+            if operacion not in operaciones:
+                raise ValueError(f"Operación no soportada en '{nombre}': {operacion}")
+            if operacion == 'count_if':
+                if not condicion or condicion[0][0] not in comparaciones:
+                    raise ValueError(f"'{nombre}' necesita una condición como ('>', 60)")
+                condicion = Bandera(*condicion[0])
+            else:
+                condicion = None
+            self.metricas[nombre] = (columna, operacion, condicion)
+
+    def _acumuladores(self):
+        #  Acumuladores necesarios, sin repetir (p. ej. 'mean' y 'sum' comparten la suma)
+        acumuladores = {}
+        for columna, operacion, condicion in self.metricas.values():
+            if operacion == 'size':
+                acumuladores['filas'] = ('filas', None, None)
+            if operacion in ('sum', 'mean'):
+                acumuladores[f'suma|{columna}'] = ('suma', columna, None)
+            if operacion in ('count', 'mean'):
+                acumuladores[f'n|{columna}'] = ('n', columna, None)
+            if operacion == 'count_if':
+                acumuladores[f'si|{columna}|{condicion.comparacion}|{condicion.umbral}'] = ('si', columna, condicion)
+        return acumuladores
+
+    def _codificar(self, df):
+        codigos, niveles = None, []
+        for clave in self.claves:
+            codigo, unicos = pd.factorize(df[clave], sort=True)
+            codigo = codigo.astype('int64')
+            niveles.append(_valores_nivel(unicos))
+            codigos = codigo if codigos is None else np.where((codigos < 0) | (codigo < 0), -1, codigos * len(unicos) + codigo)
+
+        #  Las filas con claves nulas se descartan (igual que `groupby`)
+        validas = codigos >= 0
+        if len(self.claves) == 1:
+            return validas, codigos[validas], niveles[0].rename(self.claves[0])
+
+        grupo, combinados = pd.factorize(codigos[validas], sort=True)
+        codigos_nivel = []
+        for nivel in reversed(niveles[1:]):
+            combinados, resto = np.divmod(combinados, len(nivel))
+            codigos_nivel.insert(0, resto)
+        codigos_nivel.insert(0, combinados)
+        return validas, grupo, pd.MultiIndex(levels=niveles, codes=codigos_nivel, names=self.claves)
+
+    def parcial(self, df):
+        validas, grupo, indice = self._codificar(df)
+        grupos = len(indice)
+        todas = validas.all()
+        columnas = {}
+        resultado = {}
+        for nombre, (tipo, columna, condicion) in self._acumuladores().items():
+            if tipo == 'filas':
+                resultado[nombre] = np.bincount(grupo, minlength=grupos)
+                continue
+
+            #  Cada columna se convierte una sola vez aunque alimente varios acumuladores
+            if columna not in columnas:
+                serie = df[columna] if todas else df[columna][validas]
+                no_nulos = serie.notna().to_numpy()
+                columnas[columna] = [serie, no_nulos, None]
+            serie, no_nulos, valores = columnas[columna]
+            if tipo == 'n':
+                resultado[nombre] = np.bincount(grupo[no_nulos], minlength=grupos)
+                continue
+
+            if valores is None:
+                valores = pd.to_numeric(serie, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+                valores = np.where(no_nulos, valores, 0.0)
+                columnas[columna][2] = valores
+            if tipo == 'suma':
+                suma = np.bincount(grupo, weights=valores, minlength=grupos)
+                entera = pd.api.types.is_integer_dtype(serie.dtype) or pd.api.types.is_bool_dtype(serie.dtype)
+                resultado[nombre] = suma.astype('int64') if entera else suma
+            else:
+                resultado[nombre] = np.bincount(grupo[no_nulos & condicion.evaluar(valores)], minlength=grupos)
+
+        return pd.DataFrame(resultado, index=indice)
+
+    @staticmethod
+    def combinar(acumulado, parcial):
+        if acumulado is None:
+            return parcial
+        return pd.concat([acumulado, parcial]).groupby(level=list(range(parcial.index.nlevels))).sum()
+
+    def finalizar(self, parcial):
+        resultado = {}
+        for nombre, (columna, operacion, condicion) in self.metricas.items():
+            if operacion == 'size':
+                resultado[nombre] = parcial['filas']
+            elif operacion == 'count':
+                resultado[nombre] = parcial[f'n|{columna}']
+            elif operacion == 'sum':
+                resultado[nombre] = parcial[f'suma|{columna}']
+            elif operacion == 'mean':
+                n = parcial[f'n|{columna}']
+                resultado[nombre] = parcial[f'suma|{columna}'] / n.where(n > 0)
+            else:
+                resultado[nombre] = parcial[f'si|{columna}|{condicion.comparacion}|{condicion.umbral}']
+        return pd.DataFrame(resultado, index=parcial.index)
+
+    def calcular(self, df):
+        return self.finalizar(self.parcial(df))
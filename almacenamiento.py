@@ -0,0 +1,182 @@
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from limpieza import limpiar_lote
+from metricas import RegistroEtapas
+from bocetos import escribir_parcial
+
+
+#  Columnas por las que se particiona el staging (Year=2018/Month=1/...)
+columnas_particion = ['Year', 'Month']
+
+#  Tipos de las columnas de partición (se pierden en la ruta si no se indican)
+esquema_particion = pa.schema([('Year', pa.int16()), ('Month', pa.int8())])
+
+#  Compresión de los archivos Parquet
+compresion_parquet = 'zstd'
+
+
+def _normalizar_tipo(tipo):
+    #  Las categorías de cada lote usan su propio tamaño de índice; se fija int32
+    #  para que todos los archivos compartan el mismo tipo de diccionario.
+    if pa.types.is_dictionary(tipo):
+        return pa.dictionary(pa.int32(), _normalizar_tipo(tipo.value_type))
+    if pa.types.is_large_string(tipo):
+        return pa.string()
+    return tipo
+
+
+def lote_a_arrow(chunk):
+    tabla = pa.Table.from_pandas(chunk, preserve_index=False).replace_schema_metadata(None)
+    for i, (campo, columna) in enumerate(zip(tabla.schema, tabla.columns)):
+        #  Una columna completamente vacía no dice nada de su tipo real: se guarda
+        #  como `null` y se resuelve con el esquema común al leer. (Arrow no
+        #  convierte texto ni números a `null`, así que se reemplaza la columna.)
+        if len(columna) > 0 and columna.null_count == len(columna):
+            tabla = tabla.set_column(i, pa.field(campo.name, pa.null()), pa.nulls(len(columna)))
+        else:
+            tabla = tabla.set_column(i, pa.field(campo.name, _normalizar_tipo(campo.type)), columna.cast(_normalizar_tipo(campo.type)))
+    return tabla
+
+
+def escribir_particiones(tabla, ruta, nombre_base):
+    particiones = [col for col in columnas_particion if col in tabla.column_names]
+    pq.write_to_dataset(
+        tabla, ruta,
+        partition_cols=particiones or None,
+        basename_template=f"{nombre_base}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+        compression=compresion_parquet,
+    )
+
+
+def limpiar_y_particionar(lote, ruta, bocetos=None):
+    #  Cada proceso escribe sus propios archivos; el índice del lote va en el
+    #  nombre para conservar el orden original dentro de cada partición.
+    #  Con `bocetos` (carpeta) escribe también los bocetos parciales del lote.
+    indice, chunk = lote
+    registros = len(chunk)
+    registro = RegistroEtapas()
+    chunk = limpiar_lote(chunk, registro)
+    with registro.etapa('staging', len(chunk)):
+        tabla = lote_a_arrow(chunk)
+        escribir_particiones(tabla, ruta, f"lote-{indice:06d}")
+    if bocetos:
+        with registro.etapa('bocetos', len(chunk)):
+            escribir_parcial(chunk, bocetos, f"lote-{indice:06d}")
+    return registros, len(chunk), tabla.schema, registro
+
+
+def unir_esquemas(esquemas):
+    esquema = pa.unify_schemas(esquemas, promote_options='permissive')
+    return pa.schema([pa.field(c.name, pa.string()) if pa.types.is_null(c.type) else c for c in esquema])
+
+
+def guardar_esquema(ruta, esquema):
+    #  `_common_metadata` guarda el esquema unificado de todos los lotes
+    pq.write_metadata(esquema, os.path.join(ruta, '_common_metadata'))
+
+
+def ampliar_esquema(ruta, esquemas):
+    #  Une el esquema guardado con el de los lotes nuevos (modo incremental)
+    existente = os.path.join(ruta, '_common_metadata')
+    if os.path.exists(existente):
+        esquemas = [pq.read_schema(existente)] + list(esquemas)
+    guardar_esquema(ruta, unir_esquemas(esquemas))
+
+
+def preparar_staging(ruta):
+    if os.path.isdir(ruta):
+        shutil.rmtree(ruta)
+    elif os.path.exists(ruta):
+        os.remove(ruta)
+
+
+def es_csv(ruta):
+    return ruta.endswith('.csv') or ruta.endswith('.csv.gz')
+
+
+def abrir_staging(ruta):
+    esquema = pq.read_schema(os.path.join(ruta, '_common_metadata'))
+    particiones = [c for c in esquema_particion if c.name in esquema.names]
+    esquema = pa.schema([c for c in esquema if c.name not in esquema_particion.names] + particiones)
+    dataset = ds.dataset(
+        ruta, format='parquet', schema=esquema,
+        partitioning=ds.partitioning(pa.schema(particiones), flavor='hive'),
+        ignore_prefixes=['_', '.'],
+    )
+    #  Arrow recorre las carpetas en orden lexicográfico (Month=10 antes que
+    #  Month=2): se ordenan por lote para leer en el orden del origen, como el CSV
+    fragmentos = sorted(dataset.get_fragments(), key=_orden_fragmento)
+    return ds.FileSystemDataset(fragmentos, dataset.schema, dataset.format, dataset.filesystem)
+
+
+def _orden_fragmento(fragmento):
+    #  Primero el nombre del archivo, que lleva el índice del lote, y dentro del
+    #  lote Year y Month numéricos (las particiones sin valor al final): las filas
+    #  de un lote que abarca varios meses salen agrupadas por mes
+    claves = ds.get_partition_keys(fragmento.partition_expression)
+    return (os.path.basename(fragmento.path),) + tuple(
+        (claves.get(c) is None, claves.get(c) or 0) for c in esquema_particion.names)
+
+
+def _filtro_arrow(filtros):
+    if not filtros:
+        return None
+    return pq.filters_to_expression(filtros)
+
+
+def _usecols(columnas):
+    if columnas is None:
+        return None
+    return lambda col: col in columnas
+
+
+def _filtrar(df, filtros):
+    #  El CSV no tiene particiones: los filtros se aplican después de leer
+    if not filtros:
+        return df
+    return pa.Table.from_pandas(df, preserve_index=False).filter(_filtro_arrow(filtros)).to_pandas()
+
+
+def leer_staging(ruta, columnas=None, filtros=None):
+    #  Lee solo las columnas y particiones pedidas, p. ej.
+    #  filtros=[('Year', '=', 2018), ('Month', 'in', [1, 2])]
+    if es_csv(ruta):
+        return _filtrar(pd.read_csv(ruta, usecols=_usecols(columnas), low_memory=False), filtros)
+    dataset = abrir_staging(ruta)
+    columnas = [c for c in columnas if c in dataset.schema.names] if columnas else None
+    return dataset.to_table(columns=columnas, filter=_filtro_arrow(filtros)).to_pandas()
+
+
+def iterar_staging(ruta, tamaño_lote, columnas=None, filtros=None):
+    if es_csv(ruta):
+        for chunk in pd.read_csv(ruta, chunksize=tamaño_lote, usecols=_usecols(columnas)):
+            yield _filtrar(chunk, filtros)
+        return
+    dataset = abrir_staging(ruta)
+    columnas = [c for c in columnas if c in dataset.schema.names] if columnas else None
+    #  Cada archivo aporta lotes pequeños; se agrupan hasta `tamaño_lote` filas
+    pendientes, filas = [], 0
+    for batch in dataset.to_batches(columns=columnas, filter=_filtro_arrow(filtros), batch_size=tamaño_lote):
+        if not batch.num_rows:
+            continue
+        pendientes.append(batch)
+        filas += batch.num_rows
+        if filas >= tamaño_lote:
+            yield pa.Table.from_batches(pendientes).to_pandas()
+            pendientes, filas = [], 0
+    if pendientes:
+        yield pa.Table.from_batches(pendientes).to_pandas()
+
+
+def exportar_csv(ruta, salida, tamaño_lote=100000):
+    #  Exporta el staging Parquet como CSV comprimido (formato anterior)
+    with open(salida, 'wb') as destino:
+        for i, chunk in enumerate(iterar_staging(ruta, tamaño_lote)):
+            chunk.to_csv(destino, index=False, header=i == 0, compression='gzip')
@@ -0,0 +1,117 @@
+#  Compara el motor de agregación fusionado (agregaciones.py) con la versión
+#  anterior de etl.py: varios groupby, una lambda por grupo y merges encadenados.
+#
+#  Uso:  python -m benchmarks.agregaciones --filas 2000000
+#        python -m benchmarks.agregaciones --staging airline_cleaned
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from esquema import agregacion_operaciones, agregacion_aerolinea, agregacion_aeropuerto
+
+
+def datos_sinteticos(filas, semilla=0):
+    rng = np.random.default_rng(semilla)
+    aerolineas = np.array(['AA', 'DL', 'UA', 'WN', 'B6', 'AS', 'NK', 'F9', 'G4', 'HA', 'OO', 'YX', 'MQ', 'OH', '9E', 'QX', 'EV'])
+
+    def con_nulos(valores, proporcion=0.02):
+        valores = valores.astype('float32')
+        valores[rng.random(filas) < proporcion] = np.nan
+        return valores
+
+    return pd.DataFrame({
+        'FlightDate': pd.Timestamp('2018-01-01') + pd.to_timedelta(rng.integers(0, 730, filas), unit='D'),
+        'OriginAirportID': rng.integers(10000, 10370, filas).astype('int32'),
+        'Reporting_Airline': pd.Categorical(rng.choice(aerolineas, filas)),
+        'Cancelled': (rng.random(filas) < 0.02).astype('int8'),
+        'DepDelayMinutes': con_nulos(rng.exponential(14, filas).round()),
+        'ArrDelayMinutes': con_nulos(rng.exponential(15, filas).round()),
+        'TaxiOut': con_nulos(rng.integers(5, 40, filas)),
+        'TaxiIn': con_nulos(rng.integers(2, 20, filas)),
+        'CarrierDelay': con_nulos(rng.integers(0, 60, filas), 0.8),
+        'WeatherDelay': con_nulos(rng.integers(0, 30, filas), 0.8),
+        'NASDelay': con_nulos(rng.integers(0, 30, filas), 0.8),
+        'SecurityDelay': con_nulos(rng.integers(0, 5, filas), 0.8),
+        'LateAircraftDelay': con_nulos(rng.integers(0, 60, filas), 0.8),
+    })
+
+
+#  Versión anterior (referencia)
+def referencia_operaciones(df):
+    return df.groupby(['OriginAirportID', 'FlightDate']).agg(
+        Vuelos_Atendidos=('FlightDate', 'count'),
+        Vuelos_Cancelados=('Cancelled', 'sum'),
+        Retrasos_Promedio_Salida=('DepDelayMinutes', 'mean'),
+        Retrasos_Promedio_Llegada=('ArrDelayMinutes', 'mean'),
+        Total_TaxiOut=('TaxiOut', 'sum'),
+        Total_TaxiIn=('TaxiIn', 'sum'),
+        Retrasos_Aerolinea=('CarrierDelay', 'sum'),
+        Retrasos_Clima=('WeatherDelay', 'sum'),
+        Retrasos_Trafico_Aereo=('NASDelay', 'sum'),
+        Retrasos_Seguridad=('SecurityDelay', 'sum'),
+        Retrasos_Llegada_Tardia_Avion=('LateAircraftDelay', 'sum'),
+        Retrasos_Severos=('DepDelayMinutes', lambda x: (pd.to_numeric(x, errors='coerce').fillna(0) > 60).sum())
+    )
+
+
+def referencia_aerolinea(df):
+    promedio_cancelaciones = df.groupby('Reporting_Airline', observed=True)['Cancelled'].mean().reset_index()
+    tiempo_retraso = df.groupby('Reporting_Airline', observed=True)[['DepDelayMinutes', 'ArrDelayMinutes']].mean().reset_index()
+    resultado = promedio_cancelaciones.merge(tiempo_retraso, on='Reporting_Airline', how='left')
+    return resultado.set_index('Reporting_Airline')
+
+
+def referencia_aeropuerto(df):
+    vuelos = df.groupby('OriginAirportID').size().reset_index(name='Cantidad_Vuelos_Diarios')
+    retraso = df.groupby('OriginAirportID')[['DepDelayMinutes', 'ArrDelayMinutes']].mean().reset_index()
+    cancelaciones = df.groupby('OriginAirportID')['Cancelled'].mean().reset_index()
+    resultado = vuelos.merge(retraso, on='OriginAirportID', how='left')
+    resultado = resultado.merge(cancelaciones, on='OriginAirportID', how='left')
+    return resultado.set_index('OriginAirportID')
+
+
+casos = [
+    ('fact_operaciones_aeropuertos', referencia_operaciones, agregacion_operaciones.calcular, {}),
+    ('dim_aerolinea', referencia_aerolinea, agregacion_aerolinea.calcular,
+     {'Cancelled': 'Promedio_Cancelaciones', 'DepDelayMinutes': 'Retraso_Salida', 'ArrDelayMinutes': 'Retraso_Llegada'}),
+    ('dim_aeropuerto', referencia_aeropuerto, agregacion_aeropuerto.calcular,
+     {'Cancelled': 'Promedio_Cancelaciones', 'DepDelayMinutes': 'Retraso_Salida', 'ArrDelayMinutes': 'Retraso_Llegada'}),
+]
+
+
+def medir(funcion, df, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(df)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del motor de agregación fusionado")
+    parser.add_argument('--filas', type=int, default=2_000_000, help="Filas de datos sintéticos")
+    parser.add_argument('--staging', help="Usar los datos limpios de este staging en lugar de datos sintéticos")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.staging:
+        from almacenamiento import leer_staging
+        df = leer_staging(args.staging)
+    else:
+        df = datos_sinteticos(args.filas)
+    print(f" {len(df):,} filas")
+
+    for nombre, referencia, motor, columnas in casos:
+        t_referencia, esperado = medir(referencia, df, args.repeticiones)
+        t_motor, obtenido = medir(motor, df, args.repeticiones)
+        esperado = esperado.rename(columns=columnas)
+        pd.testing.assert_frame_equal(obtenido[esperado.columns], esperado, check_dtype=False, check_index_type=False,
+                                      check_categorical=False, rtol=1e-5)
+        print(f"  {nombre:<30} anterior {t_referencia:8.3f} s   fusionado {t_motor:8.3f} s   x{t_referencia / t_motor:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
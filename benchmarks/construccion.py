@@ -0,0 +1,83 @@
+#  Compara la construcción del modelo estrella en serie (las ocho tablas una
+#  tras otra en el proceso principal) con construccion.ConstructorParalelo
+#  (cada tabla en su proceso, leyendo las columnas desde memoria compartida):
+#  tiempo real y memoria residente total, y verifica que las tablas coinciden.
+#
+#  Uso:  python -m benchmarks.construccion --staging ./airline_cleaned
+#        python -m benchmarks.construccion --filas 2000000 --procesos 8   (datos de benchmarks.generador)
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from almacenamiento import limpiar_y_particionar, unir_esquemas, guardar_esquema, leer_staging
+from esquema import columnas_modelo
+from lectura import planificar_lectura, leer_csv
+from claves import IndiceClaves
+from construccion import ConstructorParalelo, constructores
+from metricas import rss_actual
+from benchmarks.generador import generar_csv
+from benchmarks.etl import MonitorMemoria
+
+
+def staging_sintetico(directorio, filas):
+    ruta_csv = os.path.join(directorio, 'airline.csv')
+    staging = os.path.join(directorio, 'staging')
+    generar_csv(ruta_csv, filas)
+    esquemas = [limpiar_y_particionar(lote, staging)[2]
+                for lote in enumerate(leer_csv(ruta_csv, 500000, planificar_lectura(ruta_csv)))]
+    guardar_esquema(staging, unir_esquemas(esquemas))
+    return staging
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la construcción del modelo en serie y en paralelo")
+    parser.add_argument('--staging', help="Staging Parquet existente (por defecto se generan datos sintéticos)")
+    parser.add_argument('--filas', type=int, default=1_000_000)
+    parser.add_argument('--procesos', type=int, default=0, help="0 = todos los núcleos")
+    args = parser.parse_args()
+
+    temporal = None if args.staging else tempfile.mkdtemp(prefix='benchmark_construccion_')
+    try:
+        staging = args.staging or staging_sintetico(temporal, args.filas)
+        df = leer_staging(staging, columnas=columnas_modelo)
+        base = rss_actual()
+        print(f" {len(df):,} filas limpias ({df.memory_usage(deep=True).sum() / 1e6:,.0f} MB en pandas), {os.cpu_count()} núcleos")
+
+        with MonitorMemoria() as monitor:
+            inicio = time.perf_counter()
+            claves = IndiceClaves(ruta=None)
+            serie = {nombre: funcion(df, claves=claves) if usa_claves else funcion(df)
+                     for nombre, (funcion, usa_claves) in constructores.items()}
+            segundos_serie = time.perf_counter() - inicio
+            pico_serie = monitor.pico
+        print(f"  en serie:    {segundos_serie:8.2f} s   pico RSS {pico_serie / 1e6:8,.0f} MB "
+              f"(+{(pico_serie - base) / 1e6:,.0f} MB sobre el DataFrame cargado)")
+        del serie
+
+        constructor = ConstructorParalelo(args.procesos)
+        inicio = time.perf_counter()
+        paralelo = constructor.construir(df, IndiceClaves(ruta=None))
+        segundos_paralelo = time.perf_counter() - inicio
+        picos = constructor.pico_rss
+        print(f"  en paralelo: {segundos_paralelo:8.2f} s   pico RSS {sum(picos.values()) / 1e6:8,.0f} MB sumando "
+              f"{len(picos) - 1} procesos ({constructor.procesos} a la vez) y el principal")
+        for nombre, pico in picos.items():
+            print(f"    {nombre:<36} {pico / 1e6:8,.0f} MB")
+        print(f"  aceleración: {segundos_serie / segundos_paralelo:.2f}x")
+
+        #  Las tablas deben coincidir con las de la construcción en serie
+        claves = IndiceClaves(ruta=None)
+        for nombre, (funcion, usa_claves) in constructores.items():
+            esperada = funcion(df, claves=claves) if usa_claves else funcion(df)
+            pd.testing.assert_frame_equal(paralelo[nombre].reset_index(drop=True), esperada.reset_index(drop=True))
+    finally:
+        if temporal:
+            shutil.rmtree(temporal, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
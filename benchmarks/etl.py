@@ -0,0 +1,198 @@
+#  Mide el ETL completo etapa por etapa sobre un CSV (real o de
+#  benchmarks.generador): lectura, limpieza, escritura del staging, lectura del
+#  staging, construcción de cada tabla del modelo y, con --db-url, la carga en
+#  PostgreSQL. Para cada etapa guarda filas, segundos, filas/s y el pico de
+#  memoria residente (RSS) en un JSON para comparar ejecuciones.
+#
+#  Uso:  python -m benchmarks.generador --filas 10000000 --salida ./data/airline_10m.csv
+#        python -m benchmarks.etl --csv ./data/airline_10m.csv --salida antes.json
+#        python -m benchmarks.etl --csv ./data/airline_10m.csv --comparar antes.json
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import threading
+import time
+
+from contextlib import closing, contextmanager
+
+from limpieza import limpiar_lote
+from almacenamiento import lote_a_arrow, escribir_particiones, unir_esquemas, guardar_esquema, leer_staging, iterar_staging
+from esquema import (construir_fact_vuelos, construir_fact_operaciones_aeropuertos, construir_dim_aerolinea,
+                     construir_dim_aeropuerto, construir_dim_tiempo, construir_dim_cancelacion,
+                     construir_dim_desviaciones, construir_dim_retraso, columnas_modelo)
+from lectura import planificar_lectura, leer_csv, motor_csv
+from claves import IndiceClaves
+from metricas import rss_actual
+
+
+class MonitorMemoria:
+    #  Muestrea el RSS en un hilo para conocer el pico de cada etapa
+
+    def __init__(self, intervalo=0.005):
+        self.intervalo = intervalo
+        self.pico = rss_actual()
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _muestrear(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico = max(self.pico, rss_actual())
+
+    def reiniciar(self):
+        self.pico = rss_actual()
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._hilo.join()
+
+
+class Mediciones:
+    #  Acumula tiempo, filas y pico de RSS por etapa. Una etapa puede medirse en
+    #  varios tramos (una vez por lote) y se suman.
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self.etapas = {}
+
+    @contextmanager
+    def etapa(self, nombre, filas=0):
+        etapa = self.etapas.setdefault(nombre, {'filas': 0, 'segundos': 0.0, 'pico_rss_mb': 0.0})
+        self.monitor.reiniciar()
+        inicio = time.perf_counter()
+        yield etapa
+        etapa['segundos'] += time.perf_counter() - inicio
+        etapa['filas'] += filas
+        etapa['pico_rss_mb'] = max(etapa['pico_rss_mb'], max(self.monitor.pico, rss_actual()) / 1e6)
+
+    def resultados(self):
+        for etapa in self.etapas.values():
+            etapa['filas_por_segundo'] = etapa['filas'] / etapa['segundos'] if etapa['segundos'] else None
+            etapa['segundos'] = round(etapa['segundos'], 4)
+            etapa['pico_rss_mb'] = round(etapa['pico_rss_mb'], 1)
+        return self.etapas
+
+
+def medir_limpieza(mediciones, ruta_csv, staging, chunk_size, motor):
+    #  Lectura, limpieza y escritura del staging, lote a lote como en etl.py (un proceso)
+    esquemas = []
+    with closing(leer_csv(ruta_csv, chunk_size, planificar_lectura(ruta_csv), motor)) as lector:
+        lotes = iter(lector)
+        indice = 0
+        while True:
+            with mediciones.etapa('lectura_csv') as etapa:
+                chunk = next(lotes, None)
+                if chunk is not None:
+                    etapa['filas'] += len(chunk)
+            if chunk is None:
+                break
+            with mediciones.etapa('limpieza', len(chunk)):
+                chunk = limpiar_lote(chunk)
+            with mediciones.etapa('escritura_staging', len(chunk)):
+                tabla = lote_a_arrow(chunk)
+                escribir_particiones(tabla, staging, f"lote-{indice:06d}")
+            esquemas.append(tabla.schema)
+            indice += 1
+    guardar_esquema(staging, unir_esquemas(esquemas))
+
+
+def medir_modelo(mediciones, staging):
+    with mediciones.etapa('lectura_staging') as etapa:
+        df = leer_staging(staging, columnas=columnas_modelo)
+        etapa['filas'] += len(df)
+
+    claves = IndiceClaves(ruta=None)
+    constructores = {
+        'fact_vuelos': lambda: construir_fact_vuelos(df, claves=claves),
+        'fact_operaciones_aeropuertos': lambda: construir_fact_operaciones_aeropuertos(df, claves),
+        'dim_aerolinea': lambda: construir_dim_aerolinea(df, claves),
+        'dim_aeropuerto': lambda: construir_dim_aeropuerto(df, claves),
+        'dim_tiempo': lambda: construir_dim_tiempo(df),
+        'dim_cancelacion': lambda: construir_dim_cancelacion(df, claves),
+        'dim_desviaciones': lambda: construir_dim_desviaciones(df),
+        'dim_retraso': lambda: construir_dim_retraso(df),
+    }
+    for nombre, construir in constructores.items():
+        with mediciones.etapa(nombre, len(df)) as etapa:
+            etapa['filas_salida'] = len(construir())
+    return len(df)
+
+
+def medir_carga(mediciones, staging, db_url, tabla, conexiones, tamaño_lote=100000):
+    from carga import CargadorCopy
+    cargador = CargadorCopy(db_url, conexiones=conexiones)
+    with mediciones.etapa('carga') as etapa:
+        etapa['filas'] += cargador.cargar(tabla, iterar_staging(staging, tamaño_lote), reemplazar=True)
+
+
+def comparar(actual, anterior):
+    print(f"\n  {'etapa':<30} {'antes (s)':>10} {'ahora (s)':>10} {'cambio':>8}   {'RSS antes':>10} {'RSS ahora':>10}")
+    for nombre, etapa in actual['etapas'].items():
+        previa = anterior['etapas'].get(nombre)
+        if not previa:
+            continue
+        cambio = etapa['segundos'] / previa['segundos'] - 1 if previa['segundos'] else 0
+        print(f"  {nombre:<30} {previa['segundos']:10.3f} {etapa['segundos']:10.3f} {cambio:+8.1%}"
+              f"   {previa['pico_rss_mb']:8.1f}MB {etapa['pico_rss_mb']:8.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo del ETL")
+    parser.add_argument('--csv', default='./data/airline_2m.csv')
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--parser', choices=['c', 'pyarrow'], default=motor_csv)
+    parser.add_argument('--db-url', help="Medir también la carga en PostgreSQL")
+    parser.add_argument('--tabla', default='vuelos_benchmark', help="Tabla de destino de la carga (se reemplaza)")
+    parser.add_argument('--conexiones', type=int, default=4)
+    parser.add_argument('--salida', help="JSON de resultados (por defecto benchmark_etl_<fecha>.json)")
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior")
+    args = parser.parse_args()
+
+    staging = tempfile.mkdtemp(prefix='staging_benchmark_')
+    inicio = time.perf_counter()
+    try:
+        with MonitorMemoria() as monitor:
+            mediciones = Mediciones(monitor)
+            medir_limpieza(mediciones, args.csv, staging, args.chunk_size, args.parser)
+            filas = medir_modelo(mediciones, staging)
+            if args.db_url:
+                medir_carga(mediciones, staging, args.db_url, args.tabla, args.conexiones)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    resultado = {
+        'csv': args.csv,
+        'bytes_csv': os.path.getsize(args.csv),
+        'filas_limpias': filas,
+        'chunk_size': args.chunk_size,
+        'parser': args.parser,
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'segundos_total': round(time.perf_counter() - inicio, 3),
+        'etapas': mediciones.resultados(),
+    }
+
+    print(f"  {'etapa':<30} {'filas':>12} {'segundos':>10} {'filas/s':>14} {'pico RSS':>10}")
+    for nombre, etapa in resultado['etapas'].items():
+        velocidad = f"{etapa['filas_por_segundo']:,.0f}" if etapa['filas_por_segundo'] else '-'
+        print(f"  {nombre:<30} {etapa['filas']:>12,} {etapa['segundos']:10.3f} {velocidad:>14} {etapa['pico_rss_mb']:8.1f}MB")
+
+    salida = args.salida or f"benchmark_etl_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+    print(f"\n  Resultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            comparar(resultado, json.load(archivo))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#  Genera CSV sintéticos con el formato de airline_2m.csv (mismas columnas y
+#  tipos que `limpieza.dtypes`) para medir el ETL sin descargar el dataset.
+#  Las proporciones imitan los datos de BTS: ~17 aerolíneas con su cuota de
+#  mercado, ~360 aeropuertos con tráfico muy desigual, cancelaciones, desvíos,
+#  causas de retraso solo en vuelos con 15+ minutos de retraso, y una fracción
+#  pequeña de filas con nulos o negativos que la limpieza debe descartar.
+#
+#  Uso:  python -m benchmarks.generador --filas 10000000 --salida ./data/airline_10m.csv
+#        python -m benchmarks.generador --filas 1000000 --columnas-extra 72   (ancho del archivo original de BTS)
+import argparse
+import string
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pv
+
+from limpieza import dtypes
+
+
+#  Aerolíneas: (código, DOT_ID, cuota de vuelos)
+aerolineas = [
+    ('WN', 19393, 0.180), ('AA', 19805, 0.130), ('DL', 19790, 0.130), ('OO', 20304, 0.110),
+    ('UA', 19977, 0.085), ('YX', 20452, 0.045), ('MQ', 20398, 0.040), ('B6', 20409, 0.040),
+    ('OH', 20397, 0.040), ('9E', 20363, 0.035), ('AS', 19930, 0.035), ('YV', 20378, 0.030),
+    ('NK', 20416, 0.025), ('EV', 20366, 0.020), ('F9', 20436, 0.020), ('G4', 20368, 0.015),
+    ('HA', 19690, 0.012),
+]
+
+#  Aeropuertos con más tráfico: (código, AirportID, ciudad, estado, WAC)
+aeropuertos_principales = [
+    ('ATL', 10397, 'Atlanta, GA', 'GA', 34), ('ORD', 13930, 'Chicago, IL', 'IL', 41),
+    ('DFW', 11298, 'Dallas/Fort Worth, TX', 'TX', 74), ('DEN', 11292, 'Denver, CO', 'CO', 82),
+    ('LAX', 12892, 'Los Angeles, CA', 'CA', 91), ('SFO', 14771, 'San Francisco, CA', 'CA', 91),
+    ('PHX', 14107, 'Phoenix, AZ', 'AZ', 81), ('IAH', 12266, 'Houston, TX', 'TX', 74),
+    ('LAS', 12889, 'Las Vegas, NV', 'NV', 85), ('MSP', 13487, 'Minneapolis, MN', 'MN', 63),
+    ('MCO', 13204, 'Orlando, FL', 'FL', 33), ('SEA', 14747, 'Seattle, WA', 'WA', 93),
+    ('DTW', 11433, 'Detroit, MI', 'MI', 43), ('BOS', 10721, 'Boston, MA', 'MA', 13),
+    ('EWR', 11618, 'Newark, NJ', 'NJ', 21), ('CLT', 11057, 'Charlotte, NC', 'NC', 36),
+    ('LGA', 12953, 'New York, NY', 'NY', 22), ('SLC', 14869, 'Salt Lake City, UT', 'UT', 87),
+    ('JFK', 12478, 'New York, NY', 'NY', 22), ('BWI', 10821, 'Baltimore, MD', 'MD', 35),
+]
+
+#  Estados y su código WAC para los aeropuertos generados
+estados = {
+    'AL': 51, 'AR': 71, 'AZ': 81, 'CA': 91, 'CO': 82, 'FL': 33, 'GA': 34, 'IA': 61, 'ID': 83, 'IL': 41,
+    'IN': 42, 'KS': 62, 'KY': 52, 'LA': 72, 'MI': 43, 'MN': 63, 'MO': 64, 'MS': 53, 'MT': 84, 'NC': 36,
+    'ND': 66, 'NE': 65, 'NM': 86, 'NV': 85, 'NY': 22, 'OH': 44, 'OK': 73, 'OR': 92, 'PA': 23, 'SC': 37,
+    'SD': 67, 'TN': 54, 'TX': 74, 'UT': 87, 'VA': 38, 'WA': 93, 'WI': 45, 'WY': 88,
+}
+
+#  Proporciones por defecto
+tasas = {
+    'cancelados': 0.017,          # vuelos cancelados
+    'cancelados_con_salida': 0.2, # cancelados que llegaron a salir de la puerta (tienen DepTime)
+    'desviados': 0.0025,          # vuelos desviados
+    'desviados_con_llegada': 0.6, # desviados que registran ArrTime
+    'a_tiempo': 0.62,             # salidas sin retraso
+    'nulos': 0.001,               # filas con DepTime o ArrTime faltante sin motivo
+    'negativos': 0.0005,          # filas con TaxiOut o ActualElapsedTime negativo
+}
+
+#  Razones de cancelación (A aerolínea, B clima, C sistema nacional, D seguridad)
+razones_cancelacion = {'A': 0.26, 'B': 0.52, 'C': 0.21, 'D': 0.01}
+
+#  Columnas del archivo generado (las de `dtypes`, en el orden del CSV de BTS)
+columnas = ['Unnamed: 0'] + list(dtypes)
+
+_tipos_arrow = {'int8': pa.int8(), 'int16': pa.int16(), 'int32': pa.int32(), 'float32': pa.float32(), 'str': pa.string()}
+
+
+def crear_aeropuertos(cantidad, rng):
+    #  Los aeropuertos principales más códigos generados hasta `cantidad`
+    codigos = {a[0] for a in aeropuertos_principales}
+    ids = {a[1] for a in aeropuertos_principales}
+    lista = list(aeropuertos_principales[:cantidad])
+    letras = np.array(list(string.ascii_uppercase))
+    while len(lista) < cantidad:
+        codigo = ''.join(rng.choice(letras, 3))
+        identificador = int(rng.integers(10000, 16999))
+        if codigo in codigos or identificador in ids:
+            continue
+        codigos.add(codigo)
+        ids.add(identificador)
+        estado = str(rng.choice(list(estados)))
+        lista.append((codigo, identificador, f"{codigo.title()} City, {estado}", estado, estados[estado]))
+
+    #  Tráfico con forma de ley de Zipf y coordenadas para calcular distancias
+    pesos = 1 / np.arange(1, cantidad + 1) ** 1.1
+    coordenadas = np.column_stack([rng.uniform(25, 48, cantidad), rng.uniform(-123, -70, cantidad)])
+    return lista, pesos / pesos.sum(), coordenadas
+
+
+def _hhmm(minutos):
+    #  Minutos desde medianoche -> HHMM; BTS escribe la medianoche como 2400
+    minutos = np.mod(minutos, 1440)
+    hhmm = (minutos // 60) * 100 + minutos % 60
+    return np.where(hhmm == 0, 2400, hhmm)
+
+
+def _con_nulos(valores, nulos):
+    valores = valores.astype('float32')
+    valores[nulos] = np.nan
+    return valores
+
+
+def generar_lote(filas, inicio, rng, aeropuertos, fechas, tasas=tasas):
+    lista, pesos, coordenadas = aeropuertos
+
+    fecha = fechas[rng.integers(0, len(fechas), filas)]
+    i_aerolinea = rng.choice(len(aerolineas), filas, p=[a[2] / sum(x[2] for x in aerolineas) for a in aerolineas])
+    i_origen = rng.choice(len(lista), filas, p=pesos)
+    i_destino = rng.choice(len(lista), filas, p=pesos)
+    i_destino = np.where(i_destino == i_origen, (i_destino + 1) % len(lista), i_destino)
+
+    #  Distancia aproximada en millas a partir de las coordenadas
+    delta = (coordenadas[i_origen] - coordenadas[i_destino]) * [69.0, 54.6]
+    distancia = np.clip(np.hypot(delta[:, 0], delta[:, 1]), 67, 4983).round()
+
+    #  Horarios programados y reales (minutos desde medianoche)
+    salida_programada = np.clip(rng.normal(13 * 60, 4 * 60, filas), 5 * 60, 23 * 60 + 59).astype('int64')
+    duracion_programada = (distancia / 7.5 + 25 + rng.normal(0, 8, filas)).round().clip(20)
+    a_tiempo = rng.random(filas) < tasas['a_tiempo']
+    retraso_salida = np.where(a_tiempo, -rng.integers(0, 8, filas), rng.exponential(35, filas).round() + 1)
+    taxi_out = (8 + rng.gamma(2, 6.5, filas)).round()
+    taxi_in = (3 + rng.gamma(2, 2.5, filas)).round()
+    duracion_real = (duracion_programada + rng.normal(-3, 10, filas)).round().clip(15)
+    retraso_llegada = retraso_salida + (duracion_real - duracion_programada)
+
+    cancelado = rng.random(filas) < tasas['cancelados']
+    desviado = ~cancelado & (rng.random(filas) < tasas['desviados'])
+    sin_salida = cancelado & (rng.random(filas) >= tasas['cancelados_con_salida'])
+    sin_llegada = cancelado | (desviado & (rng.random(filas) >= tasas['desviados_con_llegada']))
+    incompleto = cancelado | desviado
+
+    #  Causas de retraso: solo con 15 minutos o más de retraso en la llegada
+    con_causas = ~incompleto & (retraso_llegada >= 15)
+    reparto = rng.dirichlet([2.0, 0.3, 1.5, 0.05, 2.0], filas) * np.maximum(retraso_llegada, 0)[:, None]
+    causas = [_con_nulos(reparto[:, j].round(), ~con_causas) for j in range(5)]
+
+    #  Filas defectuosas que la limpieza debe descartar
+    nula = rng.random(filas) < tasas['nulos']
+    negativa = rng.random(filas) < tasas['negativos']
+
+    codigos = np.array(list(razones_cancelacion))
+    cancelacion = np.where(cancelado, codigos[rng.choice(len(codigos), filas, p=list(razones_cancelacion.values()))], None)
+    i_desvio = rng.choice(len(lista), filas, p=pesos)
+
+    anio, mes, dia = fecha.astype('datetime64[Y]'), fecha.astype('datetime64[M]'), fecha
+    mes_numero = (mes - anio).astype('int64') + 1
+    datos = {
+        'Unnamed: 0': np.arange(inicio, inicio + filas),
+        'Year': anio.astype('int64') + 1970,
+        'Quarter': (mes_numero - 1) // 3 + 1,
+        'Month': mes_numero,
+        'DayofMonth': (dia - mes).astype('int64') + 1,
+        'DayOfWeek': (dia.astype('int64') + 3) % 7 + 1,
+        'FlightDate': np.datetime_as_string(fecha, unit='D'),
+        'Reporting_Airline': np.array([a[0] for a in aerolineas])[i_aerolinea],
+        'DOT_ID_Reporting_Airline': np.array([a[1] for a in aerolineas])[i_aerolinea],
+        'Flight_Number_Reporting_Airline': rng.integers(1, 7000, filas),
+        'OriginAirportID': np.array([a[1] for a in lista])[i_origen],
+        'Origin': np.array([a[0] for a in lista])[i_origen],
+        'OriginCityName': np.array([a[2] for a in lista])[i_origen],
+        'OriginState': np.array([a[3] for a in lista])[i_origen],
+        'OriginWac': np.array([a[4] for a in lista])[i_origen],
+        'DestAirportID': np.array([a[1] for a in lista])[i_destino],
+        'Dest': np.array([a[0] for a in lista])[i_destino],
+        'CRSDepTime': _hhmm(salida_programada),
+        'DepTime': _con_nulos(_hhmm(salida_programada + retraso_salida), sin_salida | nula),
+        'DepDelayMinutes': _con_nulos(np.maximum(retraso_salida, 0), sin_salida),
+        'TaxiOut': _con_nulos(np.where(negativa, -taxi_out, taxi_out), sin_salida),
+        'TaxiIn': _con_nulos(taxi_in, sin_llegada),
+        'CRSArrTime': _hhmm(salida_programada + duracion_programada.astype('int64')),
+        'ArrTime': _con_nulos(_hhmm(salida_programada + retraso_salida + duracion_real.astype('int64')), sin_llegada | nula),
+        'ArrDelayMinutes': _con_nulos(np.maximum(retraso_llegada, 0), incompleto),
+        'Cancelled': cancelado.astype('int8'),
+        'CancellationCode': cancelacion,
+        'Diverted': desviado.astype('int8'),
+        'CRSElapsedTime': duracion_programada,
+        'ActualElapsedTime': _con_nulos(np.where(negativa, -duracion_real, duracion_real), incompleto),
+        'Distance': distancia,
+        'CarrierDelay': causas[0],
+        'WeatherDelay': causas[1],
+        'NASDelay': causas[2],
+        'SecurityDelay': causas[3],
+        'LateAircraftDelay': causas[4],
+        'Div1AirportID': _con_nulos(np.array([a[1] for a in lista])[i_desvio], ~desviado),
+    }
+    arreglos = {col: pa.array(valores, type=_tipos_arrow.get(dtypes.get(col), pa.int64()), from_pandas=True)
+                for col, valores in datos.items()}
+    return pa.table(arreglos)
+
+
+def generar_csv(salida, filas, semilla=0, lote=1_000_000, aeropuertos=360, inicio='2018-01-01', fin='2019-12-31',
+                columnas_extra=0, tasas=tasas):
+    rng = np.random.default_rng(semilla)
+    catalogo = crear_aeropuertos(aeropuertos, rng)
+    fechas = np.arange(np.datetime64(inicio), np.datetime64(fin) + 1)
+    escritor = None
+    try:
+        for desde in range(0, filas, lote):
+            tabla = generar_lote(min(lote, filas - desde), desde, rng, catalogo, fechas, tasas)
+            #  Columnas de relleno que el ETL no usa (el archivo de BTS tiene ~110 columnas)
+            for j in range(columnas_extra):
+                tabla = tabla.append_column(f'Extra{j}', pa.array(rng.integers(0, 10000, tabla.num_rows)))
+            if escritor is None:
+                escritor = pv.CSVWriter(salida, tabla.schema)
+            escritor.write_table(tabla)
+            print(f"  {min(desde + lote, filas):,} / {filas:,} filas")
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos de vuelos")
+    parser.add_argument('--filas', type=int, default=1_000_000, help="Filas a generar (p. ej. 1000000, 10000000, 50000000)")
+    parser.add_argument('--salida', default='./data/airline_sintetico.csv')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--lote', type=int, default=1_000_000, help="Filas generadas por lote (memoria)")
+    parser.add_argument('--aeropuertos', type=int, default=360)
+    parser.add_argument('--columnas-extra', type=int, default=0, help="Columnas de relleno que el ETL no usa")
+    args = parser.parse_args()
+
+    generar_csv(args.salida, args.filas, args.semilla, args.lote, args.aeropuertos, columnas_extra=args.columnas_extra)
+    print(f"  {args.salida} generado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#  Compara la lectura completa del CSV de origen (todas las columnas, como hacía
+#  etl.py) con la lectura planificada: solo las columnas que usa el ETL, con
+#  tipos para todas ellas, con el parser de pandas y con el de pyarrow.
+#
+#  Uso:  python -m benchmarks.lectura --csv ./data/airline_2m.csv
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from lectura import planificar_lectura, columnas_archivo, leer_csv
+
+
+def medir(ruta, chunk_size, columnas, motor):
+    inicio = time.perf_counter()
+    filas, memoria, primero = 0, 0, None
+    lector = leer_csv(ruta, chunk_size, columnas, motor)
+    for chunk in lector:
+        filas += len(chunk)
+        memoria += int(chunk.memory_usage(deep=True).sum())
+        if primero is None:
+            primero = chunk
+    if hasattr(lector, 'close'):
+        lector.close()
+    return time.perf_counter() - inicio, filas, memoria, primero
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la proyección de columnas al leer el CSV")
+    parser.add_argument('--csv', default='./data/airline_2m.csv')
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    args = parser.parse_args()
+
+    todas = columnas_archivo(args.csv)
+    plan = planificar_lectura(args.csv)
+    print(f" {args.csv}: {os.path.getsize(args.csv) / 1e6:,.1f} MB, {len(todas)} columnas, se usan {len(plan)}")
+
+    casos = [
+        ('completa (c)', None, 'c'),
+        ('planificada (c)', plan, 'c'),
+        ('planificada (pyarrow)', plan, 'pyarrow'),
+    ]
+    base = None
+    referencia = None
+    for nombre, columnas, motor in casos:
+        segundos, filas, memoria, primero = medir(args.csv, args.chunk_size, columnas, motor)
+        if base is None:
+            base = (segundos, memoria)
+        ahorro = base[0] - segundos
+        print(f"  {nombre:<24} {segundos:8.2f} s  {filas:>10,} filas  {memoria / 1e6:10,.1f} MB parseados"
+              f"  ({memoria / base[1]:6.1%} de la lectura completa, {ahorro:+.2f} s ahorrados)")
+
+        #  Los dos parsers deben producir los mismos lotes
+        if columnas is not None:
+            if referencia is None:
+                referencia = primero
+            else:
+                pd.testing.assert_frame_equal(primero, referencia, check_dtype=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#  Compara las reglas vectorizadas de reglas.py con las lambdas fila a fila que
+#  reemplazan: Estación (dim_tiempo), Retraso_Categoria (dim_retraso) y
+#  Retrasos_Severos (fact_operaciones_aeropuertos).
+#
+#  Uso:  python -m benchmarks.reglas --filas 2000000
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from agregaciones import Agregacion
+from esquema import estaciones, categorias_retraso
+from benchmarks.agregaciones import datos_sinteticos, medir
+
+
+#  Versión anterior (referencia)
+def referencia_estacion(mes):
+    return mes.apply(lambda x: 'Invierno' if x in [12, 1, 2] else
+                               'Primavera' if x in [3, 4, 5] else
+                               'Verano' if x in [6, 7, 8] else 'Otoño')
+
+
+def referencia_categoria(total):
+    return total.apply(lambda x: 'Sin Retraso' if x == 0 else
+                                 'Retraso Leve' if x <= 15 else
+                                 'Retraso Moderado' if x <= 60 else
+                                 'Retraso Severo')
+
+
+def referencia_severos(df):
+    return df.groupby(['OriginAirportID', 'FlightDate'])['DepDelayMinutes'].agg(
+        lambda x: (pd.to_numeric(x, errors='coerce').fillna(0) > 60).sum())
+
+
+severos = Agregacion(['OriginAirportID', 'FlightDate'], {
+    'Retrasos_Severos': ('DepDelayMinutes', 'count_if', ('>', 60)),
+})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las reglas vectorizadas")
+    parser.add_argument('--filas', type=int, default=2_000_000)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    df = datos_sinteticos(args.filas)
+    mes = pd.Series(rng.integers(1, 13, args.filas), dtype='int32')
+    total = pd.Series(np.where(rng.random(args.filas) < 0.1, 0, rng.exponential(40, args.filas).round()), dtype='float32')
+    print(f" {args.filas:,} filas")
+
+    casos = [
+        ('Estación', lambda: referencia_estacion(mes), lambda: estaciones.aplicar(mes)),
+        ('Retraso_Categoria', lambda: referencia_categoria(total), lambda: categorias_retraso.aplicar(total)),
+        ('Retrasos_Severos', lambda: referencia_severos(df), lambda: severos.calcular(df)['Retrasos_Severos']),
+    ]
+    for nombre, referencia, regla in casos:
+        t_referencia, esperado = medir(lambda _: referencia(), None, args.repeticiones)
+        t_regla, obtenido = medir(lambda _: regla(), None, args.repeticiones)
+        if isinstance(obtenido.dtype, pd.CategoricalDtype):
+            obtenido = obtenido.astype(str)
+            esperado = esperado.astype(str)
+        np.testing.assert_array_equal(obtenido.to_numpy(), esperado.to_numpy())
+        print(f"  {nombre:<20} lambda {t_referencia:8.3f} s   regla {t_regla:8.3f} s   x{t_referencia / t_regla:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
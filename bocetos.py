@@ -0,0 +1,380 @@
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+#  Bocetos (sketches) combinables que el ETL construye lote a lote para
+#  responder percentiles y conteos distintos aproximados sin recorrer `vuelos`:
+#
+#    - Cuantiles: histograma de cubetas logarítmicas (el esquema de DDSketch).
+#      Un valor x > 0 cae en la cubeta i = ceil(log_γ x), con γ = (1 + α) / (1 - α);
+#      el valor que se devuelve para la cubeta está a menos de α (error relativo)
+#      de cualquier valor de la cubeta. Combinar bocetos es sumar conteos.
+#    - Distintos: HyperLogLog disperso de 2^p registros sobre el hash de 64 bits
+#      de la clave (las rutas Origin-Dest). Combinar es tomar el máximo por registro.
+#
+#  Cada lote escribe sus bocetos parciales en su propio archivo (como el
+#  staging); al terminar, `compactar` los combina en un archivo por grano.
+
+#  Carpeta de los bocetos
+directorio_bocetos = 'bocetos'
+
+#  Granos: mismo (OriginAirportID, FlightDate) que fact_operaciones_aeropuertos, y aerolínea por día
+granos = {
+    'aeropuerto_dia': ['OriginAirportID', 'FlightDate'],
+    'aerolinea_dia': ['Reporting_Airline', 'FlightDate'],
+}
+
+#  Columnas con boceto de cuantiles (la limpieza ya descartó los negativos)
+metricas_cuantiles = ['ArrDelayMinutes', 'DepDelayMinutes']
+
+#  Conteos distintos: nombre -> columnas que forman la clave
+claves_distintas = {'rutas': ['Origin', 'Dest']}
+
+#  Error relativo de los cuantiles y precisión del HyperLogLog (2^14 registros:
+#  0.8 % de error estándar; disperso, un grupo solo guarda los registros ocupados)
+error_relativo = 0.01
+precision_hll = 14
+
+#  Parámetros con los que se construyeron los bocetos de la carpeta
+archivo_parametros = 'bocetos.json'
+
+#  Cubeta de los ceros (log de 0 no existe)
+cubeta_cero = np.iinfo(np.int16).min
+
+tipos = ('cuantiles', 'distintos')
+
+
+def parametros_actuales():
+    return {
+        'error_relativo': error_relativo,
+        'precision_hll': precision_hll,
+        'granos': granos,
+        'metricas_cuantiles': metricas_cuantiles,
+        'claves_distintas': claves_distintas,
+    }
+
+
+def columnas_bocetos():
+    #  Columnas del lote limpio que necesitan los bocetos
+    columnas = [c for claves in granos.values() for c in claves] + metricas_cuantiles
+    columnas += [c for claves in claves_distintas.values() for c in claves]
+    return list(dict.fromkeys(columnas))
+
+
+def _gamma(alfa):
+    return (1 + alfa) / (1 - alfa)
+
+
+def cubetas(valores, alfa=error_relativo):
+    valores = np.asarray(valores, dtype='float64')
+    positivos = valores > 0
+    indices = np.full(len(valores), cubeta_cero, dtype='int16')
+    indices[positivos] = np.ceil(np.log(valores[positivos]) / np.log(_gamma(alfa))).astype('int16')
+    return indices
+
+
+def limites_cubeta(indices, alfa=error_relativo):
+    #  (inferior, estimación, superior) de cada cubeta: (γ^(i-1), γ^i], estimación 2γ^i / (γ + 1)
+    gamma = _gamma(alfa)
+    indices = np.asarray(indices)
+    cero = indices == cubeta_cero
+    superior = np.where(cero, 0.0, gamma ** indices.astype('float64'))
+    inferior = np.where(cero, 0.0, superior / gamma)
+    return inferior, 2 * superior / (gamma + 1), superior
+
+
+def _longitud_bits(valores):
+    #  Bits significativos de cada uint64 (0 para el 0), por búsqueda binaria
+    valores = valores.copy()
+    longitud = np.zeros(len(valores), dtype='int64')
+    for desplazamiento in (32, 16, 8, 4, 2, 1):
+        altos = valores >> np.uint64(desplazamiento)
+        hay = altos > 0
+        longitud[hay] += desplazamiento
+        valores[hay] = altos[hay]
+    return longitud + (valores > 0)
+
+
+def registros_hll(df, columnas, precision=precision_hll):
+    #  (registro, rango) de cada fila: los p bits altos del hash eligen el
+    #  registro y el rango es la posición del primer 1 en los bits restantes
+    hashes = pd.util.hash_pandas_object(df[columnas], index=False).to_numpy()
+    registro = (hashes >> np.uint64(64 - precision)).astype('uint16')
+    resto = hashes << np.uint64(precision)
+    rango = np.minimum(64 - _longitud_bits(resto) + 1, 64 - precision + 1).astype('uint8')
+    return registro, rango
+
+
+def estimar_hll(rangos, grupos, cantidad, precision=precision_hll):
+    #  (estimación, error estándar relativo) por grupo a partir de los registros
+    #  no nulos (`rangos`, con `grupos` = número de grupo de cada uno). Los
+    #  registros vacíos cuentan 2^0.
+    m = 1 << precision
+    ocupados = np.bincount(grupos, minlength=cantidad)
+    suma = np.bincount(grupos, weights=np.ldexp(1.0, -rangos.astype('int64')), minlength=cantidad) + (m - ocupados)
+    estimacion = 0.7213 / (1 + 1.079 / m) * m * m / suma
+    error = np.full(cantidad, 1.04 / np.sqrt(m))
+    #  Con pocos valores distintos se usa el conteo lineal de registros vacíos,
+    #  cuyo error es sqrt(m (e^t - t - 1)) / n con t = n / m (mucho menor)
+    vacios = m - ocupados
+    lineal = (estimacion <= 2.5 * m) & (vacios > 0)
+    estimacion[lineal] = m * np.log(m / vacios[lineal])
+    t = estimacion[lineal] / m
+    error[lineal] = np.sqrt(m * (np.exp(t) - t - 1)) / np.maximum(estimacion[lineal], 1)
+    return estimacion, error
+
+
+def _tabla(df):
+    return pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+
+
+def bocetos_lote(chunk):
+    #  {(grano, tipo): DataFrame} con los bocetos parciales del lote limpio
+    parciales = {}
+    for grano, claves in granos.items():
+        partes = []
+        for metrica in metricas_cuantiles:
+            valores = chunk[metrica]
+            validas = valores.notna().to_numpy() & (valores.fillna(-1).to_numpy() >= 0)
+            parte = chunk.loc[validas, claves].copy()
+            parte['metrica'] = metrica
+            parte['cubeta'] = cubetas(valores[validas].to_numpy(dtype='float64'))
+            partes.append(parte)
+        cuantiles = pd.concat(partes, ignore_index=True)
+        cuantiles['metrica'] = cuantiles['metrica'].astype('category')
+        parciales[grano, 'cuantiles'] = (cuantiles.groupby(claves + ['metrica', 'cubeta'], observed=True, sort=False)
+                                         .size().rename('conteo').astype('int32').reset_index())
+
+        partes = []
+        for nombre, columnas in claves_distintas.items():
+            completas = chunk[columnas].notna().all(axis=1).to_numpy()
+            parte = chunk.loc[completas, claves].copy()
+            parte['clave'] = nombre
+            parte['registro'], parte['rango'] = registros_hll(chunk[completas], columnas)
+            partes.append(parte)
+        distintos = pd.concat(partes, ignore_index=True)
+        distintos['clave'] = distintos['clave'].astype('category')
+        parciales[grano, 'distintos'] = (distintos.groupby(claves + ['clave', 'registro'], observed=True, sort=False)
+                                         ['rango'].max().reset_index())
+    return parciales
+
+
+def combinar(grano, tipo, partes):
+    #  Combina bocetos parciales del mismo grano: suma conteos o máximo por registro
+    claves = granos[grano]
+    df = pd.concat(partes, ignore_index=True)
+    if tipo == 'cuantiles':
+        return df.groupby(claves + ['metrica', 'cubeta'], observed=True)['conteo'].sum().astype('int64').reset_index()
+    return df.groupby(claves + ['clave', 'registro'], observed=True)['rango'].max().reset_index()
+
+
+def _carpeta_partes(directorio, grano, tipo):
+    return os.path.join(directorio, f"{grano}.{tipo}")
+
+
+def _archivo_compactado(directorio, grano, tipo):
+    return os.path.join(directorio, f"{grano}.{tipo}.parquet")
+
+
+def preparar_bocetos(directorio=directorio_bocetos, reemplazar=False):
+    #  Crea la carpeta (vacía si `reemplazar`) y guarda los parámetros. No se
+    #  pueden mezclar bocetos construidos con otro error relativo o precisión.
+    if reemplazar and os.path.isdir(directorio):
+        shutil.rmtree(directorio)
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, archivo_parametros)
+    parametros = parametros_actuales()
+    if os.path.exists(ruta):
+        with open(ruta, encoding='utf-8') as archivo:
+            guardados = json.load(archivo)
+        if guardados != json.loads(json.dumps(parametros)):
+            raise ValueError(f"Los bocetos de {directorio} usan otros parámetros; regenérelos con una carga completa")
+        return
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(parametros, archivo, indent=2, ensure_ascii=False)
+
+
+def escribir_parcial(chunk, directorio, nombre):
+    #  Un archivo por lote, grano y tipo. El nombre es fijo por lote: al
+    #  reanudar un lote se sobrescribe en lugar de contarse dos veces.
+    for (grano, tipo), df in bocetos_lote(chunk).items():
+        carpeta = _carpeta_partes(directorio, grano, tipo)
+        os.makedirs(carpeta, exist_ok=True)
+        pq.write_table(_tabla(df), os.path.join(carpeta, f"{nombre}.parquet"), compression='zstd')
+
+
+def _partes_pendientes(directorio, grano, tipo):
+    #  Partes que todavía no entraron en el archivo compactado. Las que ya se
+    #  combinaron figuran en sus metadatos (por si se cortó antes de borrarlas).
+    carpeta = _carpeta_partes(directorio, grano, tipo)
+    if not os.path.isdir(carpeta):
+        return []
+    compactado = _archivo_compactado(directorio, grano, tipo)
+    combinadas = set()
+    if os.path.exists(compactado):
+        metadatos = pq.read_schema(compactado).metadata or {}
+        combinadas = set(json.loads(metadatos.get(b'partes', b'[]')))
+    return sorted(os.path.join(carpeta, archivo) for archivo in os.listdir(carpeta)
+                  if archivo.endswith('.parquet') and archivo not in combinadas)
+
+
+def compactar(directorio=directorio_bocetos):
+    #  Combina el archivo compactado con las partes nuevas de cada grano y borra las partes
+    for grano in granos:
+        for tipo in tipos:
+            partes = _partes_pendientes(directorio, grano, tipo)
+            if not partes:
+                continue
+            compactado = _archivo_compactado(directorio, grano, tipo)
+            tablas = [pq.read_table(ruta).to_pandas() for ruta in partes]
+            if os.path.exists(compactado):
+                tablas.insert(0, pq.read_table(compactado).to_pandas())
+            df = combinar(grano, tipo, tablas)
+            if tipo == 'cuantiles':
+                df['conteo'] = df['conteo'].astype('int32' if df['conteo'].max() < 2 ** 31 else 'int64')
+            tabla = _tabla(df.sort_values(granos[grano])).replace_schema_metadata(
+                {'partes': json.dumps([os.path.basename(ruta) for ruta in partes])})
+            temporal = compactado + '.tmp'
+            pq.write_table(tabla, temporal, compression='zstd')
+            os.replace(temporal, compactado)
+            for ruta in partes:
+                os.remove(ruta)
+
+
+def _nombre_cuantil(q):
+    return f"p{q * 100:g}"
+
+
+class Bocetos:
+    #  Consultas sobre los bocetos guardados. `filtros` usa el formato de
+    #  almacenamiento.leer_staging, p. ej. [('FlightDate', '>=', date(2019, 1, 1))];
+    #  `por` son las claves del grano que se conservan (el resto se combina):
+    #
+    #    b = Bocetos()
+    #    b.cuantiles('aeropuerto_dia', 'ArrDelayMinutes', por=['OriginAirportID'])
+    #    b.distintos('aerolinea_dia', por=['Reporting_Airline'])
+
+    def __init__(self, directorio=directorio_bocetos):
+        self.directorio = directorio
+        with open(os.path.join(directorio, archivo_parametros), encoding='utf-8') as archivo:
+            self.parametros = json.load(archivo)
+        self.error_relativo = self.parametros['error_relativo']
+        self.precision = self.parametros['precision_hll']
+
+    def _leer(self, grano, tipo, filtros, columna, valor):
+        if grano not in self.parametros['granos']:
+            raise ValueError(f"Grano desconocido: {grano} (disponibles: {', '.join(self.parametros['granos'])})")
+        filtros = list(filtros or []) + [(columna, '=', valor)]
+        rutas = _partes_pendientes(self.directorio, grano, tipo)
+        compactado = _archivo_compactado(self.directorio, grano, tipo)
+        if os.path.exists(compactado):
+            rutas.insert(0, compactado)
+        tablas = [pq.read_table(ruta, filters=filtros).to_pandas() for ruta in rutas]
+        tablas = [df for df in tablas if len(df)]
+        return pd.concat(tablas, ignore_index=True) if tablas else None
+
+    def _por(self, grano, por):
+        claves = self.parametros['granos'][grano]
+        por = list(por or [])
+        desconocidas = [c for c in por if c not in claves]
+        if desconocidas:
+            raise ValueError(f"El grano {grano} solo tiene las claves {claves}")
+        return por
+
+    def cuantiles(self, grano, metrica, cuantiles=(0.5, 0.95, 0.99), por=None, filtros=None):
+        #  Por grupo: valores contados y, por cuantil, la estimación y el
+        #  intervalo que contiene el valor exacto (percentile_disc de PostgreSQL):
+        #  p95, p95_min, p95_max. El error relativo nunca supera `error_relativo`.
+        por = self._por(grano, por)
+        columnas = por + ['valores'] + [f"{_nombre_cuantil(q)}{sufijo}" for q in cuantiles for sufijo in ('', '_min', '_max')]
+        df = self._leer(grano, 'cuantiles', filtros, 'metrica', metrica)
+        if df is None:
+            return pd.DataFrame(columns=columnas)
+
+        df = df.groupby(por + ['cubeta'], observed=True)['conteo'].sum().reset_index() if por else \
+            df.groupby('cubeta')['conteo'].sum().reset_index()
+        df = df.sort_values(por + ['cubeta'], kind='stable').reset_index(drop=True)
+        grupos = df.groupby(por, observed=True, sort=False).ngroup().to_numpy() if por else np.zeros(len(df), dtype='int64')
+        inicio = np.flatnonzero(np.r_[True, grupos[1:] != grupos[:-1]])
+        acumulado = np.cumsum(df['conteo'].to_numpy(dtype='int64'))
+        antes = np.r_[0, acumulado[inicio[1:] - 1]]
+        total = np.r_[acumulado[inicio[1:] - 1], acumulado[-1]] - antes
+
+        resultado = df.iloc[inicio][por].reset_index(drop=True)
+        resultado['valores'] = total
+        for q in cuantiles:
+            #  Posición (desde 1) del valor de percentile_disc(q): ceil(q * n)
+            posicion = np.maximum(np.ceil(q * total).astype('int64'), 1)
+            fila = np.searchsorted(acumulado, antes + posicion, side='left')
+            inferior, estimacion, superior = limites_cubeta(df['cubeta'].to_numpy()[fila], self.error_relativo)
+            nombre = _nombre_cuantil(q)
+            resultado[nombre], resultado[f"{nombre}_min"], resultado[f"{nombre}_max"] = estimacion, inferior, superior
+        return resultado[columnas]
+
+    def distintos(self, grano, clave='rutas', por=None, filtros=None, desviaciones=2):
+        #  Valores distintos estimados por grupo, con su error estándar relativo
+        #  (1.04 / sqrt(2^p), menor con pocos valores) y un intervalo de
+        #  ±`desviaciones` errores (2: ~95 %)
+        por = self._por(grano, por)
+        columnas = por + [clave, 'error_estandar', f"{clave}_min", f"{clave}_max"]
+        df = self._leer(grano, 'distintos', filtros, 'clave', clave)
+        if df is None:
+            return pd.DataFrame(columns=columnas)
+
+        df = df.groupby(por + ['registro'], observed=True)['rango'].max().reset_index() if por else \
+            df.groupby('registro')['rango'].max().reset_index()
+        if por:
+            codigos = df.groupby(por, observed=True, sort=True).ngroup().to_numpy()
+            resultado = df.drop_duplicates(por).sort_values(por)[por].reset_index(drop=True)
+        else:
+            codigos = np.zeros(len(df), dtype='int64')
+            resultado = pd.DataFrame(index=range(1))
+        estimacion, error = estimar_hll(df['rango'].to_numpy(), codigos, len(resultado), self.precision)
+        redondeada = np.round(estimacion)
+        resultado[clave] = redondeada.astype('int64')
+        resultado['error_estandar'] = error
+        #  Enteros dentro del intervalo (siempre incluye la estimación redondeada)
+        resultado[f"{clave}_min"] = np.minimum(np.ceil(estimacion * (1 - desviaciones * error)), redondeada).astype('int64')
+        resultado[f"{clave}_max"] = np.maximum(np.floor(estimacion * (1 + desviaciones * error)), redondeada).astype('int64')
+        return resultado[columnas]
+
+    def bytes(self):
+        #  Tamaño en disco de los bocetos
+        return sum(os.path.getsize(os.path.join(carpeta, archivo))
+                   for carpeta, _, archivos in os.walk(self.directorio) for archivo in archivos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Percentiles y conteos distintos aproximados desde los bocetos del ETL")
+    parser.add_argument('--directorio', default=directorio_bocetos)
+    parser.add_argument('--grano', choices=list(granos), default='aeropuerto_dia')
+    parser.add_argument('--metrica', default='ArrDelayMinutes',
+                        help=f"Columna de cuantiles ({', '.join(metricas_cuantiles)}) o conteo distinto ({', '.join(claves_distintas)})")
+    parser.add_argument('--por', nargs='*', help="Claves del grano por las que agrupar (por defecto todo junto)")
+    parser.add_argument('--cuantiles', nargs='+', type=float, default=[0.5, 0.95, 0.99])
+    parser.add_argument('--desde', help="Primera fecha (YYYY-MM-DD)")
+    parser.add_argument('--hasta', help="Última fecha (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    filtros = []
+    if args.desde:
+        filtros.append(('FlightDate', '>=', pd.Timestamp(args.desde)))
+    if args.hasta:
+        filtros.append(('FlightDate', '<=', pd.Timestamp(args.hasta)))
+    bocetos = Bocetos(args.directorio)
+    if args.metrica in claves_distintas:
+        resultado = bocetos.distintos(args.grano, args.metrica, args.por, filtros)
+    else:
+        resultado = bocetos.cuantiles(args.grano, args.metrica, args.cuantiles, args.por, filtros)
+    print(resultado.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,505 @@
+import io
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import pyarrow as pa
+from psycopg2 import sql
+
+from duplicados import clave_vuelo, hash_claves
+from resumenes import definiciones, columnas_derivadas
+
+
+#  Conexiones simultáneas por defecto para COPY
+num_conexiones = 4
+
+#  Formato de COPY: 'binary' (más compacto) o 'text' (CSV)
+formato_copy = 'binary'
+
+#  Diseño físico por tabla: (columna de fecha por la que se particiona por mes,
+#  agrupaciones de las consultas del catálogo de las que salen sus índices)
+diseño_fisico = {'vuelos': ('FlightDate', definiciones)}
+
+#  Columnas enteras del ETL que pueden tener nulos: el staging las devuelve como
+#  float64 en los lotes con nulos, y el primer lote no debe decidir su tipo
+tipos_columnas = {'Hora_Salida': 'smallint'}
+
+#  Clave natural por tabla: con ella cada lote entra con INSERT ... ON CONFLICT
+#  DO NOTHING y repetir una carga no duplica filas
+claves_unicas = {'vuelos': clave_vuelo}
+
+#  Cabecera y cierre del formato binario de COPY
+_cabecera_binaria = b'PGCOPY\n\xff\r\n\x00' + b'\x00\x00\x00\x00' + b'\x00\x00\x00\x00'
+_cierre_binario = b'\xff\xff'
+
+#  Marca de nulo del COPY en texto (CSV): distinta del campo vacío, que es texto vacío
+nulo_texto = '\\N'
+
+#  Épocas de PostgreSQL para fechas y marcas de tiempo
+_epoca_pg = np.datetime64('2000-01-01', 'D')
+_epoca_pg_us = np.datetime64('2000-01-01T00:00:00', 'us')
+
+#  Tipo de PostgreSQL -> tipo big-endian de NumPy para el formato binario
+_tipos_binarios = {
+    'boolean': '|u1',
+    'smallint': '>i2',
+    'integer': '>i4',
+    'bigint': '>i8',
+    'real': '>f4',
+    'double precision': '>f8',
+    'date': '>i4',
+    'timestamp': '>i8',
+}
+
+
+def tipo_postgres(serie):
+    #  Tipo compacto de PostgreSQL para una columna de pandas
+    dtype = serie.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'boolean'
+    if pd.api.types.is_integer_dtype(dtype):
+        bits = np.dtype(dtype.numpy_dtype if hasattr(dtype, 'numpy_dtype') else dtype).itemsize * 8
+        return 'smallint' if bits <= 16 else 'integer' if bits == 32 else 'bigint'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'real' if np.dtype(dtype.numpy_dtype if hasattr(dtype, 'numpy_dtype') else dtype).itemsize == 4 else 'double precision'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        fechas = serie.dropna()
+        return 'date' if (fechas == fechas.dt.normalize()).all() else 'timestamp'
+    return 'text'
+
+
+def tipos_postgres(df, tipos=None):
+    columnas = {col: tipo_postgres(df[col]) for col in df.columns}
+    columnas.update(tipos or {})
+    return columnas
+
+
+def crear_tabla(cursor, tabla, columnas, reemplazar=False, particion=None):
+    #  Con `particion` (columna de fecha) la tabla se particiona por rango; las
+    #  particiones mensuales se crean al cargar y las filas sin fecha van a la de defecto
+    if reemplazar:
+        cursor.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(tabla)))
+    definicion = sql.SQL(', ').join(
+        sql.SQL("{} {}").format(sql.Identifier(col), sql.SQL(tipo)) for col, tipo in columnas.items())
+    if particion is None:
+        cursor.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} ({})").format(sql.Identifier(tabla), definicion))
+        return
+    cursor.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} ({}) PARTITION BY RANGE ({})").format(
+        sql.Identifier(tabla), definicion, sql.Identifier(particion)))
+    cursor.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} DEFAULT").format(
+        sql.Identifier(f"{tabla}_defecto"), sql.Identifier(tabla)))
+
+
+def es_particionada(cursor, tabla):
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+                   (sql.Identifier(tabla).as_string(cursor),))
+    return cursor.fetchone()[0]
+
+
+def particiones(cursor, tabla):
+    cursor.execute("SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass(%s)",
+                   (sql.Identifier(tabla).as_string(cursor),))
+    return {nombre.strip('"') for (nombre,) in cursor.fetchall()}
+
+
+def particion_mes(tabla, mes):
+    #  vuelos, 2019-03 -> vuelos_2019_03
+    return f"{tabla}_{str(mes).replace('-', '_')}"
+
+
+def crear_particiones(cursor, tabla, meses):
+    #  Una partición por mes: [primer día del mes, primer día del siguiente)
+    for mes in meses:
+        cursor.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES FROM ({}) TO ({})").format(
+            sql.Identifier(particion_mes(tabla, mes)), sql.Identifier(tabla),
+            sql.Literal(f"{mes}-01"), sql.Literal(f"{mes + 1}-01")))
+
+
+def indices_consultas(tabla, columnas, definiciones=definiciones):
+    #  Un índice B-tree por agrupación del catálogo: las claves del GROUP BY como
+    #  clave del índice y las columnas que se agregan en INCLUDE, para que cada
+    #  consulta sobre la tabla completa sea un index-only scan. Las columnas
+    #  derivadas se indexan si la tabla las tiene (Hora_Salida) o por sus columnas de origen.
+    def fisicas(columna):
+        if columna in columnas or columna not in columnas_derivadas:
+            return [columna]
+        return columnas_derivadas[columna][0]
+
+    sentencias = []
+    for claves, metricas in definiciones.values():
+        clave = list(dict.fromkeys(c for col in claves for c in fisicas(col)))
+        incluidas = [c for c in dict.fromkeys(c for col, *_ in metricas.values() if col for c in fisicas(col)) if c not in clave]
+        if not all(c in columnas for c in clave + incluidas):
+            continue
+        nombre = f"{tabla}_{'_'.join(clave)}_idx".lower()
+        sentencia = sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} ({})").format(
+            sql.Identifier(nombre), sql.Identifier(tabla), sql.SQL(', ').join(map(sql.Identifier, clave)))
+        if incluidas:
+            sentencia = sql.SQL("{} INCLUDE ({})").format(sentencia, sql.SQL(', ').join(map(sql.Identifier, incluidas)))
+        sentencias.append(sentencia)
+    return sentencias
+
+
+def indice_brin(tabla, columna):
+    #  BRIN: unos pocos bytes por rango de bloques; sirve porque los datos llegan ordenados por fecha
+    return sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} USING brin ({})").format(
+        sql.Identifier(f"{tabla}_{columna}_brin".lower()), sql.Identifier(tabla), sql.Identifier(columna))
+
+
+def tipos_tabla(cursor, tabla):
+    #  Tipos de una tabla existente: los lotes siguientes se envían con estos tipos
+    cursor.execute("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_name = %s AND table_schema = current_schema()
+        ORDER BY ordinal_position
+    """, (tabla,))
+    return {columna: 'timestamp' if tipo.startswith('timestamp') else tipo for columna, tipo in cursor.fetchall()}
+
+
+def restriccion_clave(tabla):
+    return f"{tabla}_clave".lower()
+
+
+def tiene_restriccion(cursor, tabla, nombre):
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = %s::regclass AND conname = %s)",
+                   (sql.Identifier(tabla).as_string(cursor), nombre))
+    return cursor.fetchone()[0]
+
+
+def eliminar_duplicados(cursor, tabla, clave):
+    #  Deja una sola fila por clave (la de menor posición física) y devuelve
+    #  cuántas borró
+    iguales = sql.SQL(' AND ').join(
+        sql.SQL("a.{0} = b.{0}").format(sql.Identifier(columna)) for columna in clave)
+    cursor.execute(sql.SQL("""
+        DELETE FROM {0} a USING {0} b
+        WHERE {1} AND (a.tableoid::oid, a.ctid) > (b.tableoid::oid, b.ctid)
+    """).format(sql.Identifier(tabla), iguales))
+    return cursor.rowcount
+
+
+def quitar_indices(cursor, tabla):
+    #  Guarda y elimina los índices que no pertenecen a una restricción (PK, UNIQUE)
+    cursor.execute("""
+        SELECT i.indexname, i.indexdef
+        FROM pg_indexes i
+        WHERE i.tablename = %s AND i.schemaname = current_schema()
+          AND i.indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)
+    """, (tabla, sql.Identifier(tabla).as_string(cursor)))
+    indices = cursor.fetchall()
+    for nombre, _ in indices:
+        cursor.execute(sql.SQL("DROP INDEX {}").format(sql.Identifier(nombre)))
+    return [definicion for _, definicion in indices]
+
+
+def restaurar_indices(cursor, definiciones):
+    for definicion in definiciones:
+        #  En una tabla particionada `ON ONLY` no crearía el índice en las particiones
+        cursor.execute(definicion.replace(' ON ONLY ', ' ON ', 1))
+
+
+#  SERIALIZACIÓN PARA COPY
+def lote_a_texto(chunk, columnas=None):
+    #  Las columnas enteras que llegan como float (lotes con nulos) se escriben sin decimales
+    enteras = [col for col, tipo in (columnas or {}).items()
+               if tipo in ('smallint', 'integer', 'bigint') and pd.api.types.is_float_dtype(chunk[col])]
+    if enteras:
+        chunk = chunk.astype({col: 'Int64' for col in enteras})
+    buffer = io.StringIO()
+    #  Los nulos van como \N (NULL del COPY) para no confundirlos con el texto vacío
+    chunk.to_csv(buffer, index=False, header=False, na_rep=nulo_texto)
+    buffer.seek(0)
+    return buffer
+
+
+def _celdas_fijas(serie, tipo, nulos):
+    if tipo == 'date':
+        valores = (serie.to_numpy().astype('datetime64[D]') - _epoca_pg).astype('int64')
+    elif tipo == 'timestamp':
+        valores = (serie.to_numpy().astype('datetime64[us]') - _epoca_pg_us).astype('int64')
+    else:
+        #  Los nulos se marcan con longitud -1; el valor de relleno no se envía
+        valores = (serie.fillna(False if tipo == 'boolean' else 0) if nulos.any() else serie).to_numpy()
+    ancho = np.dtype(_tipos_binarios[tipo]).itemsize
+    datos = np.ascontiguousarray(valores.astype(_tipos_binarios[tipo])).view(np.uint8).reshape(-1, ancho)
+    return np.where(nulos, -1, ancho).astype('int64'), datos
+
+
+def _celdas_texto(serie):
+    arreglo = pa.array(serie, from_pandas=True)
+    if isinstance(arreglo, pa.ChunkedArray):
+        arreglo = arreglo.combine_chunks()
+    if pa.types.is_dictionary(arreglo.type):
+        arreglo = arreglo.dictionary_decode()
+    if not pa.types.is_string(arreglo.type):
+        arreglo = arreglo.cast(pa.string())
+    nulos = serie.isna().to_numpy()
+    desplazamientos = np.frombuffer(arreglo.buffers()[1], dtype=np.int32)[arreglo.offset:arreglo.offset + len(arreglo) + 1]
+    datos = np.frombuffer(arreglo.buffers()[2], dtype=np.uint8) if arreglo.buffers()[2] is not None else np.empty(0, np.uint8)
+    longitudes = np.diff(desplazamientos).astype('int64')
+    return np.where(nulos, -1, longitudes), (desplazamientos[:-1].astype('int64'), datos)
+
+
+def lote_a_binario(chunk, columnas):
+    #  Arma el formato binario de COPY sin recorrer filas en Python: se calcula la
+    #  posición de cada celda y los bytes de cada columna se copian de una vez.
+    filas = len(chunk)
+    if not filas:
+        #  Lote vacío: solo cabecera y cierre (COPY no carga nada)
+        return io.BytesIO(_cabecera_binaria + _cierre_binario)
+    celdas = []
+    for col, tipo in columnas.items():
+        serie = chunk[col]
+        if tipo in _tipos_binarios:
+            celdas.append((tipo,) + _celdas_fijas(serie, tipo, serie.isna().to_numpy()))
+        else:
+            celdas.append((tipo,) + _celdas_texto(serie))
+
+    longitudes = np.column_stack([np.maximum(l, 0) + 4 for _, l, _ in celdas]) if celdas else np.zeros((filas, 0), 'int64')
+    tamaño_fila = 2 + longitudes.sum(axis=1)
+    inicio_fila = len(_cabecera_binaria) + np.concatenate([[0], np.cumsum(tamaño_fila)[:-1]]).astype('int64')
+    total = len(_cabecera_binaria) + int(tamaño_fila.sum()) + len(_cierre_binario)
+
+    buffer = np.zeros(total, dtype=np.uint8)
+    buffer[:len(_cabecera_binaria)] = np.frombuffer(_cabecera_binaria, np.uint8)
+    buffer[-2:] = 0xFF
+    buffer[inicio_fila[:, None] + np.arange(2)] = np.frombuffer(np.array(len(columnas), '>i2').tobytes(), np.uint8)
+
+    inicio_celda = inicio_fila + 2
+    for j, (tipo, longitud, datos) in enumerate(celdas):
+        buffer[inicio_celda[:, None] + np.arange(4)] = longitud.astype('>i4').view(np.uint8).reshape(-1, 4)
+        presentes = longitud >= 0
+        destino = inicio_celda[presentes] + 4
+        if tipo in _tipos_binarios:
+            buffer[destino[:, None] + np.arange(datos.shape[1])] = datos[presentes]
+        else:
+            origen, bytes_texto = datos
+            largos = longitud[presentes]
+            if largos.sum():
+                desplazamiento = np.arange(int(largos.sum())) - np.repeat(np.cumsum(largos) - largos, largos)
+                buffer[np.repeat(destino, largos) + desplazamiento] = bytes_texto[np.repeat(origen[presentes], largos) + desplazamiento]
+        inicio_celda = inicio_celda + longitudes[:, j]
+
+    return io.BytesIO(buffer.tobytes())
+
+
+class CargadorCopy:
+    #  Carga lotes con COPY FROM STDIN usando varias conexiones en paralelo. Cada
+    #  lote se confirma en su propia transacción.
+
+    def __init__(self, dsn, conexiones=num_conexiones, formato=formato_copy, reconstruir_indices=False,
+                 diseño=diseño_fisico, claves=claves_unicas):
+        if formato not in ('binary', 'text'):
+            raise ValueError(f"Formato de COPY no soportado: {formato}")
+        self.dsn = dsn
+        self.conexiones = max(1, conexiones)
+        self.formato = formato
+        self.reconstruir_indices = reconstruir_indices
+        self.diseño = diseño or {}
+        self.claves = claves or {}
+        self.filas_omitidas = {}
+        self._particiones = {}
+        self._con_clave = {}
+        self._local = threading.local()
+        self._abiertas = []
+        self._candado = threading.Lock()
+
+    def conectar(self):
+        return psycopg2.connect(self.dsn)
+
+    def _conexion_hilo(self):
+        if not hasattr(self._local, 'conexion'):
+            self._local.conexion = self.conectar()
+            with self._candado:
+                self._abiertas.append(self._local.conexion)
+        return self._local.conexion
+
+    def _cerrar_conexiones(self):
+        with self._candado:
+            for conexion in self._abiertas:
+                conexion.close()
+            self._abiertas.clear()
+        self._local = threading.local()
+
+    def copiar(self, cursor, tabla, chunk, columnas):
+        #  Envía un lote con COPY dentro de la transacción abierta del cursor
+        lista = sql.SQL(', ').join(map(sql.Identifier, columnas))
+        if self.formato == 'binary':
+            datos = lote_a_binario(chunk[list(columnas)], columnas)
+            consulta = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT binary)").format(sql.Identifier(tabla), lista)
+        else:
+            datos = lote_a_texto(chunk[list(columnas)], columnas)
+            consulta = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL {})").format(
+                sql.Identifier(tabla), lista, sql.Literal(nulo_texto))
+        cursor.copy_expert(consulta.as_string(cursor), datos)
+        return len(chunk)
+
+    def insertar(self, cursor, tabla, chunk, columnas):
+        #  Envía un lote y devuelve las filas que entraron. Con la clave de la tabla
+        #  activa (asegurar_clave) el COPY va a una tabla temporal y de ahí pasa con
+        #  ON CONFLICT DO NOTHING: se conserva la versión ya cargada de cada vuelo.
+        if not self._con_clave.get(tabla):
+            self.copiar(cursor, tabla, chunk, columnas)
+            return chunk
+        clave = self.claves[tabla]
+        temporal = f"{tabla}_lote"
+        lista = sql.SQL(', ').join(map(sql.Identifier, columnas))
+        cursor.execute(sql.SQL("CREATE TEMP TABLE IF NOT EXISTS {} (LIKE {}) ON COMMIT DELETE ROWS").format(
+            sql.Identifier(temporal), sql.Identifier(tabla)))
+        self.copiar(cursor, temporal, chunk, columnas)
+        cursor.execute(sql.SQL("""
+            INSERT INTO {0} ({1}) SELECT {1} FROM {2}
+            ON CONFLICT ON CONSTRAINT {3} DO NOTHING RETURNING {4}
+        """).format(sql.Identifier(tabla), lista, sql.Identifier(temporal),
+                     sql.Identifier(restriccion_clave(tabla)), sql.SQL(', ').join(map(sql.Identifier, clave))))
+        insertadas = cursor.fetchall()
+        if len(insertadas) == len(chunk):
+            return chunk
+        #  Filas del lote cuya clave devolvió el INSERT (la primera de cada clave)
+        hashes, _ = hash_claves(chunk, clave)
+        devueltas, _ = hash_claves(pd.DataFrame(insertadas, columns=clave), clave)
+        entraron = np.isin(hashes, devueltas) & ~pd.Series(hashes).duplicated().to_numpy()
+        return chunk[entraron]
+
+    def asegurar_clave(self, cursor, tabla):
+        #  Activa el UPSERT de la tabla: crea la restricción UNIQUE sobre su clave
+        #  (que incluye la columna de partición) si no existe, borrando antes las
+        #  filas repetidas de una tabla cargada sin ella. Devuelve cuántas borró,
+        #  para que quien llama reconstruya los resúmenes.
+        self._con_clave[tabla] = False
+        if tabla not in self.claves:
+            return 0
+        clave = self.claves[tabla]
+        faltan = [columna for columna in clave if columna not in tipos_tabla(cursor, tabla)]
+        if faltan:
+            #  Tabla de una versión anterior del ETL: se carga sin UPSERT
+            print(f"  {tabla} no tiene {', '.join(faltan)}: se carga sin descartar duplicados "
+                  f"(con --reemplazar se vuelve a crear con la clave)")
+            return 0
+        nombre = restriccion_clave(tabla)
+        eliminadas = 0
+        if not tiene_restriccion(cursor, tabla, nombre):
+            eliminadas = eliminar_duplicados(cursor, tabla, clave)
+            cursor.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} UNIQUE ({})").format(
+                sql.Identifier(tabla), sql.Identifier(nombre), sql.SQL(', ').join(map(sql.Identifier, clave))))
+        self._con_clave[tabla] = True
+        return eliminadas
+
+    def copiar_lote(self, tabla, chunk, columnas, resumenes=None):
+        conexion = self._conexion_hilo()
+        try:
+            with conexion.cursor() as cursor:
+                insertadas = self.insertar(cursor, tabla, chunk, columnas)
+                if resumenes:
+                    resumenes.actualizar(cursor, insertadas)
+            conexion.commit()
+        except Exception:
+            conexion.rollback()
+            raise
+        return len(insertadas)
+
+    def preparar_tabla(self, cursor, tabla, chunk, tipos=None, reemplazar=False):
+        #  Crea la tabla si hace falta y devuelve los tipos con los que hay que enviar el lote
+        particion = self.diseño[tabla][0] if tabla in self.diseño else None
+        tipos = {**{col: tipo for col, tipo in tipos_columnas.items() if col in chunk.columns}, **(tipos or {})}
+        crear_tabla(cursor, tabla, tipos_postgres(chunk, tipos), reemplazar, particion)
+        self._particiones.pop(tabla, None)
+        existentes = tipos_tabla(cursor, tabla)
+        return {col: existentes[col] for col in chunk.columns if col in existentes}
+
+    def preparar_particiones(self, cursor, tabla, chunk):
+        #  Crea las particiones mensuales que necesita el lote antes de copiarlo. En
+        #  la carga en paralelo se llama desde el hilo principal y se confirma
+        #  aparte: crear una partición bloquea la tabla madre hasta el COMMIT.
+        if tabla not in self.diseño:
+            return
+        if tabla not in self._particiones:
+            self._particiones[tabla] = particiones(cursor, tabla) if es_particionada(cursor, tabla) else None
+        existentes = self._particiones[tabla]
+        if existentes is None:
+            return
+        columna = self.diseño[tabla][0]
+        meses = np.unique(chunk[columna].dropna().to_numpy().astype('datetime64[M]'))
+        nuevos = [mes for mes in meses if particion_mes(tabla, mes) not in existentes]
+        crear_particiones(cursor, tabla, nuevos)
+        existentes.update(particion_mes(tabla, mes) for mes in nuevos)
+
+    def optimizar(self, tabla):
+        #  Tras la carga: índices del diseño físico (BRIN sobre la fecha y los de las
+        #  consultas del catálogo) y VACUUM ANALYZE, que deja estadísticas y el mapa
+        #  de visibilidad que necesitan los index-only scans
+        if tabla not in self.diseño:
+            return
+        columna, agrupaciones = self.diseño[tabla]
+        conexion = self.conectar()
+        try:
+            conexion.autocommit = True
+            with conexion.cursor() as cursor:
+                columnas = tipos_tabla(cursor, tabla)
+                for sentencia in [indice_brin(tabla, columna)] + indices_consultas(tabla, columnas, agrupaciones):
+                    cursor.execute(sentencia)
+                cursor.execute(sql.SQL("VACUUM (ANALYZE) {}").format(sql.Identifier(tabla)))
+        finally:
+            conexion.close()
+
+    def cargar(self, tabla, lotes, tipos=None, reemplazar=False, resumenes=None):
+        #  Crea la tabla con tipos compactos (a partir del primer lote) y la llena.
+        #  Con `resumenes` (resumenes.Resumenes) cada lote actualiza además las
+        #  tablas resumen en su misma transacción. Devuelve las filas nuevas; las
+        #  que ya estaban (misma clave) quedan en `filas_omitidas[tabla]`.
+        lotes = iter(lotes)
+        primero = next(lotes, None)
+        if primero is None:
+            return 0
+        conexion = self.conectar()
+        indices = []
+        try:
+            with conexion.cursor() as cursor:
+                columnas = self.preparar_tabla(cursor, tabla, primero, tipos, reemplazar)
+                if resumenes:
+                    resumenes.preparar(cursor, reemplazar)
+                if self.asegurar_clave(cursor, tabla) and resumenes:
+                    resumenes.reconstruir(cursor, tabla)
+                if self.reconstruir_indices:
+                    indices = quitar_indices(cursor, tabla)
+            conexion.commit()
+
+            total = enviadas = 0
+            with ThreadPoolExecutor(max_workers=self.conexiones) as pool:
+                pendientes = deque()
+                for chunk in _encadenar(primero, lotes):
+                    with conexion.cursor() as cursor:
+                        self.preparar_particiones(cursor, tabla, chunk)
+                    conexion.commit()
+                    enviadas += len(chunk)
+                    pendientes.append(pool.submit(self.copiar_lote, tabla, chunk, columnas, resumenes))
+                    if len(pendientes) >= self.conexiones * 2:
+                        total += pendientes.popleft().result()
+                while pendientes:
+                    total += pendientes.popleft().result()
+            self.filas_omitidas[tabla] = enviadas - total
+        finally:
+            self._cerrar_conexiones()
+            if indices:
+                with conexion.cursor() as cursor:
+                    restaurar_indices(cursor, indices)
+                conexion.commit()
+            conexion.close()
+        self.optimizar(tabla)
+        return total
+
+    def cargar_tablas(self, tablas, reemplazar=True):
+        #  Carga las tablas del modelo estrella ({nombre: DataFrame o lotes})
+        resultado = {}
+        for nombre, datos in tablas.items():
+            lotes = [datos] if isinstance(datos, pd.DataFrame) else datos
+            resultado[nombre] = self.cargar(nombre, lotes, reemplazar=reemplazar)
+        return resultado
+
+
+def _encadenar(primero, resto):
+    yield primero
+    yield from resto
@@ -0,0 +1,96 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+#  Índice persistente clave natural -> clave sustituta de cada dimensión
+archivo_claves = 'claves_modelo.json'
+
+#  Dimensiones con clave sustituta: columnas de `vuelos` con la clave natural y
+#  tipo entero de la clave sustituta en las tablas de hechos
+dimensiones = {
+    'aerolinea': (['Reporting_Airline'], 'int16'),
+    'aeropuerto': (['OriginAirportID', 'DestAirportID'], 'int16'),
+    'cancelacion': (['CancellationCode'], 'int16'),
+}
+
+
+def clave_fecha(fechas):
+    #  Clave entera yyyymmdd (int32) de una serie de fechas; NaT -> <NA>
+    fechas = pd.to_datetime(fechas, errors='coerce')
+    clave = fechas.dt.year * 10000 + fechas.dt.month * 100 + fechas.dt.day
+    return clave.astype('Int32') if clave.isna().any() else clave.astype('int32')
+
+
+def _naturales(serie):
+    #  Valores distintos no nulos en orden de aparición, con el tipo de la categoría
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        presentes = serie.cat.remove_unused_categories()
+        return [v.item() if hasattr(v, 'item') else v for v in pd.unique(presentes.dropna().astype(presentes.cat.categories.dtype))]
+    return [v.item() if hasattr(v, 'item') else v for v in pd.unique(serie.dropna())]
+
+
+class IndiceClaves:
+    #  Asigna claves sustitutas 1, 2, 3... en orden de aparición. Las claves ya
+    #  asignadas no cambian nunca: los valores nuevos (una aerolínea o un
+    #  aeropuerto que aparece por primera vez) se agregan al final.
+    #  Con `ruta=None` el índice vive solo en memoria.
+
+    def __init__(self, ruta=archivo_claves):
+        self.ruta = ruta
+        self.naturales = {dimension: [] for dimension in dimensiones}
+        if ruta and os.path.exists(ruta):
+            with open(ruta, encoding='utf-8') as archivo:
+                self.naturales.update(json.load(archivo))
+        self._indices = {}
+
+    def _indice(self, dimension):
+        if dimension not in self._indices:
+            self._indices[dimension] = pd.Index(self.naturales[dimension])
+        return self._indices[dimension]
+
+    def ampliar(self, dimension, *series):
+        indice = self._indice(dimension)
+        nuevos = [v for serie in series for v in _naturales(serie)]
+        nuevos = [v for v in dict.fromkeys(nuevos) if v not in indice]
+        if not nuevos:
+            return
+        tipo = dimensiones[dimension][1]
+        if len(indice) + len(nuevos) > np.iinfo(tipo).max:
+            raise OverflowError(f"La dimensión '{dimension}' supera el máximo de claves para {tipo}")
+        self.naturales[dimension].extend(nuevos)
+        self._indices.pop(dimension)
+
+    def ampliar_modelo(self, df):
+        #  Asigna de una vez las claves de todas las dimensiones presentes en `df`,
+        #  en el mismo orden que la construcción en serie (origen antes que destino)
+        for dimension, (columnas, _) in dimensiones.items():
+            series = [df[col] for col in columnas if col in df.columns]
+            if series:
+                self.ampliar(dimension, *series)
+
+    def codificar(self, dimension, serie):
+        #  Clave sustituta de cada valor (entero compacto; <NA> si el valor es nulo)
+        self.ampliar(dimension, serie)
+        indice = self._indice(dimension)
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            por_categoria = indice.get_indexer(serie.cat.categories.astype(object))
+            codigos = serie.cat.codes.to_numpy()
+            posiciones = np.where(codigos >= 0, por_categoria[codigos], -1)
+        else:
+            posiciones = indice.get_indexer(serie)
+        tipo = dimensiones[dimension][1]
+        claves = pd.Series(posiciones + 1, index=serie.index)
+        if (posiciones < 0).any():
+            return claves.where(posiciones >= 0).astype(tipo.capitalize())
+        return claves.astype(tipo)
+
+    def guardar(self):
+        if not self.ruta:
+            return
+        temporal = self.ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(self.naturales, archivo, ensure_ascii=False)
+        os.replace(temporal, self.ruta)
@@ -0,0 +1,44 @@
+import os
+import uuid
+
+import psycopg2
+import pytest
+from psycopg2 import sql
+from psycopg2.extensions import make_dsn
+
+
+#  Servidor de PostgreSQL de las pruebas de carga: el de ETL_TEST_DB_URL (un
+#  usuario que pueda crear bases) o, si no está definida, uno temporal de
+#  `pgserver`. Sin ninguno de los dos las pruebas que lo piden se omiten.
+variable_servidor = 'ETL_TEST_DB_URL'
+
+
+@pytest.fixture(scope='session')
+def servidor_postgres(tmp_path_factory):
+    url = os.environ.get(variable_servidor)
+    if url:
+        yield url
+        return
+    pgserver = pytest.importorskip('pgserver', reason=f"sin {variable_servidor} ni pgserver para levantar PostgreSQL")
+    try:
+        servidor = pgserver.get_server(tmp_path_factory.mktemp('pgdata'), cleanup_mode='stop')
+    except Exception as error:
+        pytest.skip(f"No se pudo iniciar PostgreSQL: {error}")
+    yield servidor.get_uri()
+    servidor.cleanup()
+
+
+@pytest.fixture
+def db_url(servidor_postgres):
+    #  Una base vacía por prueba (las tablas `vuelos` y los resúmenes tienen nombres fijos)
+    nombre = f"prueba_{uuid.uuid4().hex[:12]}"
+    conexion = psycopg2.connect(servidor_postgres)
+    conexion.autocommit = True
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(nombre)))
+        yield make_dsn(servidor_postgres, dbname=nombre)
+        with conexion.cursor() as cursor:
+            cursor.execute(sql.SQL("DROP DATABASE {} WITH (FORCE)").format(sql.Identifier(nombre)))
+    finally:
+        conexion.close()
@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import resource
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pyarrow as pa
+
+from esquema import (construir_fact_vuelos, construir_fact_operaciones_aeropuertos, construir_dim_aerolinea,
+                     construir_dim_aeropuerto, construir_dim_tiempo, construir_dim_cancelacion,
+                     construir_dim_desviaciones, construir_dim_retraso, columnas_por_tabla)
+from claves import IndiceClaves
+from metricas import rss_actual
+
+
+#  Construcción en paralelo de las tablas del modelo estrella. Las columnas
+#  limpias se publican una sola vez como archivo Arrow IPC sin comprimir en
+#  memoria compartida (/dev/shm); cada proceso lo abre con `memory_map` y solo
+#  convierte a pandas las columnas de su tabla. Las columnas numéricas sin
+#  nulos se usan sin copiarlas; nadie recibe el DataFrame completo serializado.
+
+#  Tabla -> (constructor, usa claves sustitutas)
+constructores = {
+    'fact_vuelos.csv': (construir_fact_vuelos, True),
+    'fact_operaciones_aeropuertos.csv': (construir_fact_operaciones_aeropuertos, True),
+    'dim_aerolinea.csv': (construir_dim_aerolinea, True),
+    'dim_aeropuerto.csv': (construir_dim_aeropuerto, True),
+    'dim_tiempo.csv': (construir_dim_tiempo, False),
+    'dim_cancelacion.csv': (construir_dim_cancelacion, True),
+    'dim_desviaciones.csv': (construir_dim_desviaciones, False),
+    'dim_retraso.csv': (construir_dim_retraso, False),
+}
+
+#  Procesos de construcción (0 = todos los núcleos)
+num_procesos = 0
+
+#  Los procesos se crean desde un servidor que ya importó este módulo: arrancan
+#  rápido y sin heredar la memoria del proceso principal (spawn donde no hay fork)
+metodo_inicio = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def directorio_compartido():
+    #  /dev/shm vive en memoria: el archivo publicado no toca el disco
+    return '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def publicar_columnas(df, ruta):
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(ruta, 'wb') as destino, pa.ipc.new_file(destino, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+    return tabla.nbytes
+
+
+def leer_columnas(ruta, columnas):
+    #  Los buffers del archivo mapeado siguen vivos mientras los use el DataFrame
+    tabla = pa.ipc.open_file(pa.memory_map(ruta)).read_all().select(columnas)
+    return tabla.to_pandas(split_blocks=True)
+
+
+def pico_rss():
+    #  Pico de memoria residente del proceso en bytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _construir_tabla(trabajo):
+    nombre, ruta, claves = trabajo
+    funcion, usa_claves = constructores[nombre]
+    df = leer_columnas(ruta, columnas_por_tabla[nombre])
+    tabla = funcion(df, claves=claves) if usa_claves else funcion(df)
+    return nombre, tabla, pico_rss()
+
+
+class ConstructorParalelo:
+    #  Construye las tablas en procesos separados y devuelve {nombre_archivo:
+    #  DataFrame}, igual que la construcción en serie. Tras `construir`,
+    #  `pico_rss` tiene el pico de memoria del proceso principal y de cada tabla.
+
+    def __init__(self, procesos=num_procesos, tablas=None):
+        self.tablas = list(tablas or constructores)
+        self.procesos = min(procesos or os.cpu_count() or 1, len(self.tablas))
+        self.pico_rss = {}
+
+    def construir(self, df, claves=None):
+        #  Las claves sustitutas se asignan antes de repartir el trabajo para que
+        #  todos los procesos usen las mismas
+        claves = claves if claves is not None else IndiceClaves(ruta=None)
+        claves.ampliar_modelo(df)
+
+        descriptor, ruta = tempfile.mkstemp(suffix='.arrow', prefix='modelo_', dir=directorio_compartido())
+        os.close(descriptor)
+        try:
+            columnas = list(dict.fromkeys(col for nombre in self.tablas for col in columnas_por_tabla[nombre]))
+            publicar_columnas(df[columnas], ruta)
+            resultado = {}
+            self.pico_rss = {'principal': rss_actual()}
+            #  Un proceso nuevo por tabla: su pico de memoria es solo el de esa tabla
+            contexto = multiprocessing.get_context(metodo_inicio)
+            if metodo_inicio == 'forkserver':
+                contexto.set_forkserver_preload([__name__])
+            with ProcessPoolExecutor(max_workers=self.procesos, mp_context=contexto, max_tasks_per_child=1) as pool:
+                trabajos = [(nombre, ruta, claves) for nombre in self.tablas]
+                for nombre, tabla, pico in pool.map(_construir_tabla, trabajos):
+                    resultado[nombre] = tabla
+                    self.pico_rss[nombre] = pico
+            return resultado
+        finally:
+            os.remove(ruta)
@@ -0,0 +1,193 @@
+import os
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+import pandas as pd
+
+from agregaciones import Agregacion
+from almacenamiento import iterar_staging, es_csv
+from resumenes import Resumenes, columnas_origen
+
+
+#  Motor de consultas local: responde el catálogo de consultas.py directamente
+#  desde el staging limpio, sin PostgreSQL. Una sola pasada por el staging
+#  (solo las columnas de los resúmenes) calcula en memoria las mismas tablas
+#  resumen que mantiene el ETL en la base (resumenes.py); cada consulta es
+#  luego un filtro y un orden sobre unas pocas filas, con la semántica de
+#  PostgreSQL para que el resultado sea idéntico al de EjecutorConsultas.
+
+#  Filas por lote al recorrer el staging
+tamaño_lote = 500000
+
+_centesimos = Decimal('0.01')
+
+
+def redondear(valor):
+    #  ROUND(CAST(valor AS NUMERIC), 2): PostgreSQL pasa el double a numeric con
+    #  15 cifras significativas y redondea alejándose de cero en los empates
+    #  (2.675 -> 2.68, aunque el double sea 2.67499...). Los numeric no se tocan.
+    if not isinstance(valor, Decimal):
+        valor = Decimal(f"{valor:.15g}")
+    return valor.quantize(_centesimos, rounding=ROUND_HALF_UP)
+
+
+def _candidatos(valores, n):
+    #  Filas que pueden quedar entre las `n` primeras al ordenar por el valor
+    #  redondeado: el redondeo es monótono y mueve cada valor menos de 0.005, así
+    #  que basta redondear las que están a menos de 0.01 de la n-ésima.
+    if len(valores) <= n:
+        return np.ones(len(valores), dtype=bool)
+    corte = np.partition(valores, len(valores) - n)[len(valores) - n]
+    return valores >= corte - 0.02
+
+
+def _resultado(filas, columnas):
+    #  Mismo DataFrame que arma consultas._ejecutar con las filas de psycopg2
+    #  (int para bigint/integer, str para text, Decimal para numeric)
+    return pd.DataFrame(filas, columns=columnas)
+
+
+def aerolinea_mas_vuelos(resumenes):
+    df = resumenes['resumen_aerolinea']
+    total = Decimal(int(df['Vuelos'].sum()))
+    df = df.sort_values(['Vuelos', 'Reporting_Airline'], ascending=[False, True], kind='stable').head(5)
+    filas = [(aerolinea, int(vuelos), redondear(Decimal(int(vuelos)) * Decimal('100.0') / total))
+             for aerolinea, vuelos in zip(df['Reporting_Airline'], df['Vuelos'])]
+    return _resultado(filas, ['aerolinea', 'total_vuelos', 'porcentaje'])
+
+
+def retraso_promedio_por_aeropuerto(resumenes):
+    df = resumenes['resumen_aeropuerto']
+    df = df[df['Registros_Retraso_Llegada'] > 0]
+    promedio = (df['Suma_Retraso_Llegada'] / df['Registros_Retraso_Llegada']).to_numpy()
+    candidatos = _candidatos(promedio, 10)
+    filas = [(int(aeropuerto), redondear(valor))
+             for aeropuerto, valor in zip(df['OriginAirportID'][candidatos], promedio[candidatos])]
+    filas.sort(key=lambda fila: (-fila[1], fila[0]))
+    return _resultado(filas[:10], ['aeropuerto', 'retraso_promedio'])
+
+
+def porcentaje_cancelados_por_aerolinea(resumenes):
+    df = resumenes['resumen_aerolinea']
+    filas = [(aerolinea, int(vuelos), int(cancelados), redondear(Decimal(int(cancelados)) * Decimal('100.0') / Decimal(int(vuelos))))
+             for aerolinea, vuelos, cancelados in zip(df['Reporting_Airline'], df['Vuelos'], df['Vuelos_Cancelados'])]
+    filas.sort(key=lambda fila: (-fila[3], fila[0]))
+    return _resultado(filas[:5], ['aerolinea', 'total_vuelos', 'vuelos_cancelados', 'porcentaje_cancelado'])
+
+
+def distribucion_retrasos_por_hora(resumenes):
+    #  La hora sale de DepTime como en limpieza.hora_salida (la columna Hora_Salida de vuelos)
+    df = resumenes['resumen_hora']
+    df = df[df['Registros_Retraso_Salida'] > 0].sort_values('Hora_Salida')
+    promedio = df['Suma_Retraso_Salida'] / df['Registros_Retraso_Salida']
+    filas = [(int(hora), redondear(valor), int(registros))
+             for hora, valor, registros in zip(df['Hora_Salida'], promedio, df['Registros_Retraso_Salida'])]
+    return _resultado(filas, ['hora', 'retraso_promedio', 'cantidad_vuelos'])
+
+
+def tiempo_real_vs_planeado(resumenes):
+    df = resumenes['resumen_ruta']
+    df = df[df['Registros_Tiempos'] > 0]
+    registros = df['Registros_Tiempos'].to_numpy()
+    real = df['Suma_Tiempo_Real'].to_numpy()
+    planificado = df['Suma_Tiempo_Planificado'].to_numpy()
+    diferencia = (real - planificado) / registros
+    candidatos = _candidatos(diferencia, 10)
+    filas = [(origen, destino, redondear(r / n), redondear(p / n), redondear(d))
+             for origen, destino, r, p, n, d in zip(df['Origin'][candidatos], df['Dest'][candidatos], real[candidatos],
+                                                    planificado[candidatos], registros[candidatos], diferencia[candidatos])]
+    filas.sort(key=lambda fila: (-fila[4], fila[0], fila[1]))
+    return _resultado(filas[:10], ['origen', 'destino', 'tiempo_real', 'tiempo_planificado', 'diferencia'])
+
+
+#  Mismos nombres que consultas.queries. Los empates se ordenan como en
+#  PostgreSQL con los códigos IATA (mayúsculas y dígitos: igual en cualquier collation)
+catalogo = {
+    "Aerolínea con más vuelos": aerolinea_mas_vuelos,
+    "Retraso promedio por aeropuerto": retraso_promedio_por_aeropuerto,
+    "Porcentaje de vuelos cancelados por aerolínea": porcentaje_cancelados_por_aerolinea,
+    "Distribución de retrasos por hora": distribucion_retrasos_por_hora,
+    "Tiempo real vs. planeado en vuelos": tiempo_real_vs_planeado,
+}
+
+
+def huella_staging(ruta):
+    #  Archivos, tamaños y fechas de modificación: cambia si el ETL escribe en el staging
+    if es_csv(ruta) or os.path.isfile(ruta):
+        estado = os.stat(ruta)
+        return ((ruta, estado.st_size, estado.st_mtime_ns),)
+    huella = []
+    for carpeta, _, archivos in os.walk(ruta):
+        for archivo in archivos:
+            estado = os.stat(os.path.join(carpeta, archivo))
+            huella.append((os.path.relpath(os.path.join(carpeta, archivo), ruta), estado.st_size, estado.st_mtime_ns))
+    return tuple(sorted(huella))
+
+
+def calcular_resumenes(staging, tamaño_lote=tamaño_lote, resumenes=None):
+    #  {tabla: DataFrame} con las claves como columnas, igual que las tablas resumen de la base
+    resumenes = resumenes or Resumenes()
+    acumulados = dict.fromkeys(resumenes.definiciones)
+    for chunk in iterar_staging(staging, tamaño_lote, columnas=columnas_origen(resumenes.definiciones)):
+        for tabla, parcial in resumenes.parciales(chunk).items():
+            acumulados[tabla] = Agregacion.combinar(acumulados[tabla], parcial)
+
+    tablas = {}
+    for tabla, (claves, metricas) in resumenes.definiciones.items():
+        df = acumulados[tabla]
+        if df is None:
+            df = pd.DataFrame(columns=list(claves) + list(metricas))
+        else:
+            df = df.reset_index()
+        tablas[tabla] = df
+    return tablas
+
+
+class EjecutorLocal:
+    #  Misma interfaz que consultas.EjecutorConsultas, sobre el staging. Los
+    #  resúmenes se calculan en la primera consulta y se reutilizan mientras el
+    #  staging no cambie. `tiempos` incluye en cada consulta solo su propio cálculo;
+    #  `segundos_resumenes` es lo que tardó la pasada por el staging.
+
+    def __init__(self, staging, tamaño_lote=tamaño_lote):
+        self.staging = staging
+        self.tamaño_lote = tamaño_lote
+        self.tiempos = {}
+        self.errores = {}
+        self.segundos_resumenes = 0.0
+        self._resumenes = None
+        self._huella = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+    def cerrar(self):
+        self._resumenes = None
+
+    def resumenes(self):
+        huella = huella_staging(self.staging)
+        if self._resumenes is None or huella != self._huella:
+            inicio = time.perf_counter()
+            self._resumenes = calcular_resumenes(self.staging, self.tamaño_lote)
+            self._huella = huella
+            self.segundos_resumenes = time.perf_counter() - inicio
+        return self._resumenes
+
+    def ejecutar(self, consultas=None):
+        #  {nombre: DataFrame} en el orden del catálogo ({nombre: función(resúmenes)})
+        consultas = catalogo if consultas is None else consultas
+        self.tiempos, self.errores = {}, {}
+        resumenes = self.resumenes()
+        resultados = {}
+        for nombre, consulta in consultas.items():
+            inicio = time.perf_counter()
+            try:
+                resultados[nombre] = consulta(resumenes)
+                self.tiempos[nombre] = time.perf_counter() - inicio
+            except Exception as e:
+                self.errores[nombre] = e
+        return resultados
@@ -0,0 +1,225 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from limpieza import filas_conservadas
+from metricas import RegistroEtapas
+
+
+#  Clave natural de un vuelo: la misma en el índice de vistos y en la
+#  restricción UNIQUE de `vuelos` que usa la carga con UPSERT (carga.py)
+clave_vuelo = ['FlightDate', 'Reporting_Airline', 'Flight_Number_Reporting_Airline', 'OriginAirportID']
+
+#  Índice persistente de las claves ya vistas (hash de 64 bits de cada una)
+archivo_vistos = 'vuelos_vistos.npy'
+
+#  Ocupación máxima de la tabla antes de duplicar su tamaño (sondeo lineal)
+carga_maxima = 0.5
+
+#  Posiciones iniciales de la tabla (potencia de 2)
+capacidad_inicial = 1 << 16
+
+
+def hash_claves(df, columnas=clave_vuelo):
+    #  Hash de 64 bits de la clave de cada fila y máscara de las filas con la
+    #  clave completa. Los valores se normalizan antes de calcularlo (fecha en
+    #  días, códigos como texto, números como enteros) para que el hash no
+    #  dependa de si el lote viene crudo del CSV, limpio o de PostgreSQL.
+    partes = {}
+    for columna in columnas:
+        serie = df[columna]
+        if columna == 'FlightDate':
+            serie = pd.to_datetime(serie, errors='coerce').dt.normalize().astype('datetime64[ns]')
+        elif pd.api.types.is_numeric_dtype(serie.dtype):
+            serie = serie.astype('Int64')
+        else:
+            serie = serie.astype('string')
+        partes[columna] = serie.reset_index(drop=True)
+    claves = pd.DataFrame(partes)
+    validas = claves.notna().all(axis=1).to_numpy()
+    hashes = pd.util.hash_pandas_object(claves, index=False).to_numpy()
+    #  El 0 marca las posiciones vacías de la tabla
+    return np.where(hashes == 0, np.uint64(1), hashes), validas
+
+
+class ConjuntoHash:
+    #  Conjunto de hashes de 64 bits en una tabla de direccionamiento abierto con
+    #  sondeo lineal sobre un arreglo de NumPy: 8 bytes por posición y ocupación
+    #  entre 25 % y 50 %, es decir, de 16 a 32 MB por millón de claves. Las
+    #  inserciones son vectorizadas: cada vuelta resuelve todas las claves del
+    #  arreglo cuya posición está libre o ya tiene la misma clave.
+
+    def __init__(self, capacidad=capacidad_inicial):
+        capacidad = 1 << max(int(capacidad) - 1, 1).bit_length()
+        self.tabla = np.zeros(capacidad, dtype=np.uint64)
+        self.cantidad = 0
+
+    def __len__(self):
+        return self.cantidad
+
+    def bytes(self):
+        return self.tabla.nbytes
+
+    def _insertar(self, unicos):
+        #  Inserta hashes distintos entre sí; True en los que no estaban
+        mascara = np.uint64(len(self.tabla) - 1)
+        posiciones = unicos & mascara
+        insertados = np.zeros(len(unicos), dtype=bool)
+        pendientes = np.arange(len(unicos))
+        while len(pendientes):
+            ocupadas = self.tabla[posiciones[pendientes]]
+            presentes = ocupadas == unicos[pendientes]
+            libres = pendientes[ocupadas == 0]
+            if len(libres):
+                #  Varias claves pueden llegar a la misma posición libre: se queda la primera
+                _, primeras = np.unique(posiciones[libres], return_index=True)
+                ganadoras = libres[primeras]
+                self.tabla[posiciones[ganadoras]] = unicos[ganadoras]
+                insertados[ganadoras] = True
+            #  Las demás encuentran su posición ocupada por otra clave y pasan a la siguiente
+            pendientes = pendientes[~presentes & ~insertados[pendientes]]
+            posiciones[pendientes] = (posiciones[pendientes] + np.uint64(1)) & mascara
+        self.cantidad += int(insertados.sum())
+        return insertados
+
+    def _reservar(self, cantidad):
+        capacidad = len(self.tabla)
+        while cantidad > capacidad * carga_maxima:
+            capacidad *= 2
+        if capacidad == len(self.tabla):
+            return
+        claves = self.tabla[self.tabla != 0]
+        self.tabla = np.zeros(capacidad, dtype=np.uint64)
+        self.cantidad = 0
+        self._insertar(claves)
+
+    def agregar(self, hashes):
+        #  Agrega los hashes y devuelve True en cada posición cuyo hash no estaba en
+        #  el conjunto ni aparece antes en el mismo arreglo
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        nuevos = np.zeros(len(hashes), dtype=bool)
+        if not len(hashes):
+            return nuevos
+        unicos, primeros = np.unique(hashes, return_index=True)
+        self._reservar(self.cantidad + len(unicos))
+        nuevos[primeros[self._insertar(unicos)]] = True
+        return nuevos
+
+    def contiene(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        mascara = np.uint64(len(self.tabla) - 1)
+        posiciones = hashes & mascara
+        encontrados = np.zeros(len(hashes), dtype=bool)
+        pendientes = np.arange(len(hashes))
+        while len(pendientes):
+            ocupadas = self.tabla[posiciones[pendientes]]
+            encontrados[pendientes[ocupadas == hashes[pendientes]]] = True
+            pendientes = pendientes[(ocupadas != 0) & (ocupadas != hashes[pendientes])]
+            posiciones[pendientes] = (posiciones[pendientes] + np.uint64(1)) & mascara
+        return encontrados
+
+    def guardar(self, ruta):
+        temporal = ruta + '.tmp'
+        with open(temporal, 'wb') as archivo:
+            np.save(archivo, self.tabla)
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta):
+        conjunto = cls(capacidad=2)
+        conjunto.tabla = np.load(ruta)
+        conjunto.cantidad = int(np.count_nonzero(conjunto.tabla))
+        return conjunto
+
+
+class Deduplicador:
+    #  Etapa de streaming que descarta los vuelos repetidos antes de la limpieza:
+    #  se queda la primera aparición válida de cada clave en el orden del origen,
+    #  en esta ejecución o en las anteriores. Las filas con la clave incompleta o
+    #  que la limpieza va a descartar (limpieza.filas_conservadas) pasan sin tocar
+    #  y no marcan su clave como vista, así que una copia inválida no le quita el
+    #  lugar a una válida que llega después. Con `ruta=None` el índice vive solo
+    #  en memoria; con `reemplazar` empieza vacío (el ETL completo regenera el
+    #  staging desde el origen).
+    #
+    #  En modo incremental los hashes nuevos de cada lote se agregan a un diario
+    #  (`ruta` + '.diario') cuando el lote queda confirmado, y `guardar` los
+    #  integra en el índice al terminar; al reanudar se leen el índice y el diario.
+    #  La probabilidad de que dos claves distintas compartan el hash es ~n²/2^65
+    #  (1e-7 con dos millones de vuelos); la restricción UNIQUE de `vuelos` es exacta.
+
+    def __init__(self, ruta=archivo_vistos, reemplazar=False):
+        self.ruta = ruta
+        self.diario = ruta + '.diario' if ruta else None
+        self.filas = 0
+        self.descartes = {'duplicados_en_lote': 0, 'duplicados_ya_vistos': 0}
+        self._pendientes = {}
+        if reemplazar and ruta:
+            for archivo in (ruta, self.diario):
+                if os.path.exists(archivo):
+                    os.remove(archivo)
+        self.conjunto = ConjuntoHash.cargar(ruta) if ruta and os.path.exists(ruta) else ConjuntoHash()
+        if self.diario and os.path.exists(self.diario):
+            with open(self.diario, 'rb') as archivo:
+                datos = archivo.read()
+            #  Una escritura cortada deja bytes sueltos al final: se ignoran
+            self.conjunto.agregar(np.frombuffer(datos[:len(datos) - len(datos) % 8], dtype=np.uint64))
+
+    def filtrar(self, chunk, registro=None, indice=None):
+        #  Devuelve el lote sin los vuelos ya vistos; con `indice` guarda sus
+        #  hashes nuevos hasta que se llame a `confirmar(indice)`
+        registro = registro if registro is not None else RegistroEtapas()
+        with registro.etapa('duplicados', len(chunk)) as medicion:
+            hashes, validas = hash_claves(chunk)
+            validas = validas & filas_conservadas(chunk)
+            nuevos = self.conjunto.agregar(hashes[validas])
+            en_lote = len(nuevos) - len(np.unique(hashes[validas]))
+            conservar = validas.copy()
+            conservar[validas] = nuevos
+            conservar |= ~validas
+            descartes = {'duplicados_en_lote': en_lote, 'duplicados_ya_vistos': int((~nuevos).sum()) - en_lote}
+            for filtro, filas in descartes.items():
+                medicion['descartes'][filtro] = filas
+                self.descartes[filtro] += filas
+            self.filas += len(chunk)
+            if indice is not None:
+                self._pendientes[indice] = hashes[validas][nuevos]
+        return chunk[conservar] if not conservar.all() else chunk
+
+    def iterar(self, lotes, registro):
+        #  Filtra pares (índice, lote) como los que reciben limpieza.mapear_en_orden
+        for indice, chunk in lotes:
+            yield indice, self.filtrar(chunk, registro, indice)
+
+    def confirmar(self, indice):
+        hashes = self._pendientes.pop(indice, None)
+        if hashes is None or not self.diario or not len(hashes):
+            return
+        with open(self.diario, 'ab') as archivo:
+            archivo.write(hashes.tobytes())
+            archivo.flush()
+            os.fsync(archivo.fileno())
+
+    def descartar_diario(self):
+        #  Olvida las claves de los lotes confirmados desde el último `guardar`
+        self._pendientes.clear()
+        if self.diario and os.path.exists(self.diario):
+            os.remove(self.diario)
+        self.conjunto = ConjuntoHash.cargar(self.ruta) if self.ruta and os.path.exists(self.ruta) else ConjuntoHash()
+
+    def guardar(self):
+        self._pendientes.clear()
+        if not self.ruta:
+            return
+        self.conjunto.guardar(self.ruta)
+        if os.path.exists(self.diario):
+            os.remove(self.diario)
+
+    def informe(self):
+        duplicados = sum(self.descartes.values())
+        por_millon = self.conjunto.bytes() / max(len(self.conjunto), 1) * 1e6
+        return (f"{duplicados:,} vuelos duplicados descartados de {self.filas:,} "
+                f"({self.descartes['duplicados_en_lote']:,} repetidos dentro de un lote, "
+                f"{self.descartes['duplicados_ya_vistos']:,} ya vistos); índice de {len(self.conjunto):,} claves, "
+                f"{self.conjunto.bytes() / 1e6:.1f} MB ({por_millon / 1e6:.1f} MB por millón de claves)")
@@ -0,0 +1,479 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from agregaciones import Agregacion
+from almacenamiento import compresion_parquet
+from exportacion import archivo_destino
+from claves import IndiceClaves, archivo_claves, clave_fecha
+from reglas import Tramos, Mapeo, Bandera
+
+
+#  Columnas que usan las tablas del modelo dimensional
+columnas_modelo = [
+    'FlightDate', 'OriginAirportID', 'DestAirportID', 'Reporting_Airline', 'DOT_ID_Reporting_Airline',
+    'Origin', 'OriginCityName', 'OriginState', 'OriginWac', 'Distance',
+    'CRSDepTime', 'DepTime', 'CRSArrTime', 'ArrTime', 'CRSElapsedTime', 'ActualElapsedTime',
+    'Cancelled', 'CancellationCode', 'Diverted', 'Div1AirportID', 'TaxiOut', 'TaxiIn',
+    'DepDelayMinutes', 'ArrDelayMinutes', 'CarrierDelay', 'WeatherDelay', 'NASDelay',
+    'SecurityDelay', 'LateAircraftDelay',
+]
+
+#  Columnas que lee cada tabla (la construcción en paralelo solo materializa estas)
+columnas_por_tabla = {
+    'fact_vuelos.csv': ['FlightDate', 'OriginAirportID', 'DestAirportID', 'Reporting_Airline', 'Distance',
+                        'CRSDepTime', 'DepTime', 'CRSArrTime', 'ArrTime', 'CRSElapsedTime', 'ActualElapsedTime',
+                        'Cancelled', 'CancellationCode', 'Diverted', 'TaxiOut', 'TaxiIn', 'DepDelayMinutes'],
+    'fact_operaciones_aeropuertos.csv': ['OriginAirportID', 'FlightDate', 'Cancelled', 'DepDelayMinutes', 'ArrDelayMinutes',
+                                         'TaxiOut', 'TaxiIn', 'CarrierDelay', 'WeatherDelay', 'NASDelay',
+                                         'SecurityDelay', 'LateAircraftDelay'],
+    'dim_aerolinea.csv': ['Reporting_Airline', 'DOT_ID_Reporting_Airline', 'Cancelled', 'DepDelayMinutes', 'ArrDelayMinutes'],
+    'dim_aeropuerto.csv': ['OriginAirportID', 'Origin', 'OriginCityName', 'OriginState', 'OriginWac',
+                           'Cancelled', 'DepDelayMinutes', 'ArrDelayMinutes'],
+    'dim_tiempo.csv': ['FlightDate'],
+    'dim_cancelacion.csv': ['CancellationCode'],
+    'dim_desviaciones.csv': ['Diverted', 'Div1AirportID', 'ArrTime', 'CRSArrTime'],
+    'dim_retraso.csv': ['CarrierDelay', 'WeatherDelay', 'NASDelay', 'SecurityDelay', 'LateAircraftDelay',
+                        'DepDelayMinutes', 'ArrDelayMinutes'],
+}
+
+
+#  Reglas de las columnas derivadas (reglas.py)
+retraso_importante = Bandera('>', 15)
+estaciones = Mapeo({12: 'Invierno', 1: 'Invierno', 2: 'Invierno',
+                    3: 'Primavera', 4: 'Primavera', 5: 'Primavera',
+                    6: 'Verano', 7: 'Verano', 8: 'Verano'}, defecto='Otoño')
+#  Los componentes del retraso no son negativos: el total 0 es el único valor del primer tramo
+categorias_retraso = Tramos([0, 15, 60], ['Sin Retraso', 'Retraso Leve', 'Retraso Moderado', 'Retraso Severo'])
+
+
+def _claves(claves):
+    #  Sin índice persistente las claves sustitutas se asignan en orden de aparición
+    return claves if claves is not None else IndiceClaves(ruta=None)
+
+
+#  FACT_VUELOS (Hechos de Vuelos)
+def construir_fact_vuelos(df, inicio=1, claves=None):
+    claves = _claves(claves)
+    fact_vuelos = df[['FlightDate', 'OriginAirportID', 'DestAirportID', 'Reporting_Airline', 'Distance',
+                       'CRSDepTime', 'DepTime', 'CRSArrTime', 'ArrTime', 'CRSElapsedTime', 'ActualElapsedTime',
+                       'Cancelled', 'Diverted', 'TaxiOut', 'TaxiIn']].copy()
+
+    # Renombrar columnas según el modelo dimensional
+    fact_vuelos.rename(columns={
+        'FlightDate': 'FechaVuelo',
+        'OriginAirportID': 'ID_Aeropuerto_Origen',
+        'DestAirportID': 'ID_Aeropuerto_Destino',
+        'Reporting_Airline': 'ID_Aerolinea',
+        'Distance': 'Distancia',
+        'CRSDepTime': 'HoraSalidaProgramada',
+        'DepTime': 'HoraSalidaReal',
+        'CRSArrTime': 'HoraLlegadaProgramada',
+        'ArrTime': 'HoraLlegadaReal',
+        'CRSElapsedTime': 'DuracionPlanificada',
+        'ActualElapsedTime': 'DuracionReal',
+        'Cancelled': 'Cancelado',
+        'Diverted': 'Desviado',
+        'TaxiOut': 'TaxiOut',
+        'TaxiIn': 'TaxiIn'
+    }, inplace=True)
+
+    # Claves foráneas enteras: aerolínea y aeropuertos con su clave sustituta
+    fact_vuelos['ID_Aerolinea'] = claves.codificar('aerolinea', fact_vuelos['ID_Aerolinea'])
+    fact_vuelos['ID_Aeropuerto_Origen'] = claves.codificar('aeropuerto', fact_vuelos['ID_Aeropuerto_Origen'])
+    fact_vuelos['ID_Aeropuerto_Destino'] = claves.codificar('aeropuerto', fact_vuelos['ID_Aeropuerto_Destino'])
+
+    # Generar ID_Vuelo como clave primaria (`inicio` continúa la numeración entre lotes)
+    fact_vuelos['ID_Vuelo'] = np.arange(inicio, inicio + len(fact_vuelos), dtype='int32')
+
+    # Agregar la clave foránea ID_Tiempo (yyyymmdd) en lugar de la FechaVuelo
+    fact_vuelos['ID_Tiempo'] = clave_fecha(fact_vuelos.pop('FechaVuelo'))
+
+    # Calcular RetrasoFlag (1 = más de 15 min, 0 = menor a 15 min)
+    fact_vuelos['RetrasoFlag'] = retraso_importante.aplicar(df['DepDelayMinutes'])
+
+    # Asignar ID_Retraso según la existencia de retraso
+    fact_vuelos['ID_Retraso'] = fact_vuelos['ID_Vuelo'].astype('Int32').where(df['DepDelayMinutes'] > 0)
+
+    # Asignar ID_Cancelacion (clave de dim_cancelacion) si el vuelo fue cancelado
+    fact_vuelos['ID_Cancelacion'] = claves.codificar('cancelacion', df['CancellationCode']).astype('Int16').where(df['Cancelled'] == 1)
+
+    # Asignar ID_Desviacion si el vuelo fue desviado
+    fact_vuelos['ID_Desviacion'] = fact_vuelos['ID_Vuelo'].astype('Int32').where(df['Diverted'] == 1)
+
+    return fact_vuelos
+
+
+#   FACT_OPERACIONES_AEROPORTUARIAS (Actividad Aeroportuaria Mejorada)
+agregacion_operaciones = Agregacion(['OriginAirportID', 'FlightDate'], {
+    'Vuelos_Atendidos': ('FlightDate', 'count'),
+    'Vuelos_Cancelados': ('Cancelled', 'sum'),
+    'Retrasos_Promedio_Salida': ('DepDelayMinutes', 'mean'),
+    'Retrasos_Promedio_Llegada': ('ArrDelayMinutes', 'mean'),
+    'Total_TaxiOut': ('TaxiOut', 'sum'),
+    'Total_TaxiIn': ('TaxiIn', 'sum'),
+    'Retrasos_Aerolinea': ('CarrierDelay', 'sum'),
+    'Retrasos_Clima': ('WeatherDelay', 'sum'),
+    'Retrasos_Trafico_Aereo': ('NASDelay', 'sum'),
+    'Retrasos_Seguridad': ('SecurityDelay', 'sum'),
+    'Retrasos_Llegada_Tardia_Avion': ('LateAircraftDelay', 'sum'),
+    'Retrasos_Severos': ('DepDelayMinutes', 'count_if', ('>', 60)),
+})
+
+
+def construir_fact_operaciones_aeropuertos(df, claves=None):
+    return _completar_fact_operaciones(agregacion_operaciones.calcular(df).reset_index(), claves)
+
+
+def _completar_fact_operaciones(fact_operaciones_aeropuertos, claves=None):
+    # Calcular el promedio general de retrasos combinando salida y llegada
+    fact_operaciones_aeropuertos['Retrasos_Promedio_Total'] = fact_operaciones_aeropuertos[['Retrasos_Promedio_Salida', 'Retrasos_Promedio_Llegada']].mean(axis=1)
+
+    # Renombrar columnas según el modelo dimensional
+    fact_operaciones_aeropuertos.rename(columns={
+        'OriginAirportID': 'ID_Aeropuerto',
+        'FlightDate': 'ID_Tiempo',
+    }, inplace=True)
+
+    # Claves foráneas enteras del aeropuerto y de la fecha (yyyymmdd)
+    fact_operaciones_aeropuertos['ID_Aeropuerto'] = _claves(claves).codificar('aeropuerto', fact_operaciones_aeropuertos['ID_Aeropuerto'])
+    fact_operaciones_aeropuertos['ID_Tiempo'] = clave_fecha(fact_operaciones_aeropuertos['ID_Tiempo'])
+
+    # Generar ID_Operacion como clave primaria
+    fact_operaciones_aeropuertos['ID_Operacion'] = range(1, len(fact_operaciones_aeropuertos) + 1)
+
+    return fact_operaciones_aeropuertos
+
+
+#  DIM_AEROLINEA
+#  Promedio de cancelaciones y tiempo promedio de retraso por aerolínea en una sola pasada
+agregacion_aerolinea = Agregacion(['Reporting_Airline'], {
+    'Promedio_Cancelaciones': ('Cancelled', 'mean'),
+    'Retraso_Salida': ('DepDelayMinutes', 'mean'),
+    'Retraso_Llegada': ('ArrDelayMinutes', 'mean'),
+})
+
+
+def construir_dim_aerolinea(df, claves=None):
+    aerolineas = df[['Reporting_Airline', 'DOT_ID_Reporting_Airline']].drop_duplicates()
+    return _ensamblar_dim_aerolinea(aerolineas, agregacion_aerolinea.calcular(df), claves)
+
+
+def _ensamblar_dim_aerolinea(aerolineas, metricas, claves=None):
+    dim_aerolinea = aerolineas.copy()
+
+    # ID_Aerolinea: clave sustituta del índice persistente
+    dim_aerolinea['ID_Aerolinea'] = _claves(claves).codificar('aerolinea', dim_aerolinea['Reporting_Airline'])
+
+    # Renombrar columnas según el modelo dimensional
+    dim_aerolinea.rename(columns={
+        'DOT_ID_Reporting_Airline': 'DOT_ID'
+    }, inplace=True)
+
+    # Tiempo promedio de retraso combinando salida y llegada
+    metricas['Tiempo_Promedio_Retraso'] = metricas[['Retraso_Salida', 'Retraso_Llegada']].mean(axis=1)
+
+    # Unir cálculos con la tabla de dimensiones
+    return dim_aerolinea.join(metricas[['Promedio_Cancelaciones', 'Tiempo_Promedio_Retraso']], on='Reporting_Airline')
+
+
+#  DIM_AEROPUERTO (Dimensión de Aeropuertos)
+#  Cantidad de vuelos, promedio de retrasos y de cancelaciones en una sola pasada
+agregacion_aeropuerto = Agregacion(['OriginAirportID'], {
+    'Cantidad_Vuelos_Diarios': (None, 'size'),
+    'Retraso_Salida': ('DepDelayMinutes', 'mean'),
+    'Retraso_Llegada': ('ArrDelayMinutes', 'mean'),
+    'Promedio_Cancelaciones': ('Cancelled', 'mean'),
+})
+
+
+def construir_dim_aeropuerto(df, claves=None):
+    aeropuertos = df[['OriginAirportID', 'Origin', 'OriginCityName', 'OriginState', 'OriginWac']].drop_duplicates()
+    return _ensamblar_dim_aeropuerto(aeropuertos, agregacion_aeropuerto.calcular(df), claves)
+
+
+def _ensamblar_dim_aeropuerto(aeropuertos, metricas, claves=None):
+    dim_aeropuerto = aeropuertos.copy()
+
+    # ID_Aeropuerto: clave sustituta del índice persistente
+    dim_aeropuerto['ID_Aeropuerto'] = _claves(claves).codificar('aeropuerto', dim_aeropuerto['OriginAirportID'])
+
+    # Renombrar columnas según el modelo dimensional
+    dim_aeropuerto.rename(columns={
+        'OriginAirportID': 'Codigo_Aeropuerto',
+        'Origin': 'Nombre_Aeropuerto',
+        'OriginCityName': 'Ciudad',
+        'OriginState': 'Estado',
+        'OriginWac': 'WAC_Code'
+    }, inplace=True)
+
+    # Cálculo del Promedio de Retrasos
+    metricas['Promedio_Retrasos'] = metricas[['Retraso_Salida', 'Retraso_Llegada']].mean(axis=1)
+
+    # Unir los cálculos con la tabla de aeropuertos
+    return dim_aeropuerto.join(metricas[['Cantidad_Vuelos_Diarios', 'Promedio_Retrasos', 'Promedio_Cancelaciones']], on='Codigo_Aeropuerto')
+
+
+#  DIM_TIEMPO
+def construir_dim_tiempo(df):
+    fechas = pd.to_datetime(df['FlightDate'], errors='coerce').drop_duplicates()
+    return _ensamblar_dim_tiempo(fechas)
+
+
+def _ensamblar_dim_tiempo(fechas):
+    dim_tiempo = fechas.to_frame(name='Fecha')
+
+    # Clave primaria entera yyyymmdd (la misma que usan las tablas de hechos)
+    dim_tiempo.insert(0, 'ID_Tiempo', clave_fecha(dim_tiempo['Fecha']))
+
+    # Extraer atributos de tiempo
+    dim_tiempo['Año'] = dim_tiempo['Fecha'].dt.year
+    dim_tiempo['Mes'] = dim_tiempo['Fecha'].dt.month
+    dim_tiempo['Día'] = dim_tiempo['Fecha'].dt.day
+    dim_tiempo['DíaDeLaSemana'] = dim_tiempo['Fecha'].dt.dayofweek + 1  # Ajuste para que lunes sea 1 y domingo 7
+    dim_tiempo['Trimestre'] = dim_tiempo['Fecha'].dt.quarter
+
+    # Calcular estación del año
+    dim_tiempo['Estación'] = estaciones.aplicar(dim_tiempo['Mes'])
+
+    return dim_tiempo
+
+
+#     DIM_CANCELACION
+def construir_dim_cancelacion(df, claves=None):
+    return _ensamblar_dim_cancelacion(df[['CancellationCode']].dropna().drop_duplicates(), claves)
+
+
+def _ensamblar_dim_cancelacion(codigos, claves=None):
+    dim_cancelacion = codigos.copy()
+
+    # ID_Cancelacion: clave sustituta del índice persistente
+    dim_cancelacion['ID_Cancelacion'] = _claves(claves).codificar('cancelacion', dim_cancelacion['CancellationCode'])
+
+    # Mapeo de razones de cancelación según código
+    razones_cancelacion = {
+        'A': 'Problemas con la aerolínea',
+        'B': 'Condiciones climáticas',
+        'C': 'Problemas del sistema nacional de aviación',
+        'D': 'Otros',
+        'Un': 'Desconocido'  # Se agrega el valor desconocido
+    }
+
+    # Aplicar mapeo de razones de cancelación
+    dim_cancelacion['Razón_Cancelacion'] = dim_cancelacion['CancellationCode'].map(razones_cancelacion)
+
+    # Reemplazar valores nulos con "Indefinido"
+    dim_cancelacion['Razón_Cancelacion'] = dim_cancelacion['Razón_Cancelacion'].fillna('Indefinido')
+
+    return dim_cancelacion
+
+
+#     DIM_DESVIACIONES
+def construir_dim_desviaciones(df, inicio=1):
+    dim_desviaciones = df[df['Diverted'] == 1][['Div1AirportID', 'ArrTime', 'CRSArrTime']].dropna().copy()
+
+    # Generar ID_Desviacion
+    dim_desviaciones['ID_Desviacion'] = range(inicio, inicio + len(dim_desviaciones))
+
+    # Calcular Retraso_Desviacion
+    dim_desviaciones['Retraso_Desviacion'] = dim_desviaciones['ArrTime'] - dim_desviaciones['CRSArrTime']
+
+    # Renombrar columnas según el modelo dimensional
+    dim_desviaciones.rename(columns={
+        'Div1AirportID': 'ID_Aeropuerto_Desviado',
+        'ArrTime': 'Hora_Nueva_Llegada'
+    }, inplace=True)
+
+    return dim_desviaciones
+
+
+# DIM_RETRASO
+def construir_dim_retraso(df, inicio=1):
+    dim_retraso = df[['CarrierDelay', 'WeatherDelay', 'NASDelay', 'SecurityDelay', 'LateAircraftDelay',
+                      'DepDelayMinutes', 'ArrDelayMinutes']].dropna().copy()
+
+    # Generar ID_Retraso
+    dim_retraso['ID_Retraso'] = range(inicio, inicio + len(dim_retraso))
+
+    # Renombrar columnas según el modelo dimensional
+    dim_retraso.rename(columns={
+        'CarrierDelay': 'Retraso_Aerolinea',
+        'WeatherDelay': 'Retraso_Clima',
+        'NASDelay': 'Retraso_Trafico_Aereo',
+        'SecurityDelay': 'Retraso_Seguridad',
+        'LateAircraftDelay': 'Retraso_Llegada_Tardia_Avion',
+        'DepDelayMinutes': 'Retraso_Salida',
+        'ArrDelayMinutes': 'Retraso_Llegada'
+    }, inplace=True)
+
+    # Calcular el total de minutos de retraso (sumando todos los factores)
+    dim_retraso['Retraso_TotalMinutos'] = (
+        dim_retraso['Retraso_Salida'] +
+        dim_retraso['Retraso_Llegada'] +
+        dim_retraso['Retraso_Aerolinea'] +
+        dim_retraso['Retraso_Clima'] +
+        dim_retraso['Retraso_Trafico_Aereo'] +
+        dim_retraso['Retraso_Seguridad']
+    )
+
+    # Categorizar los retrasos
+    dim_retraso['Retraso_Categoria'] = categorias_retraso.aplicar(dim_retraso['Retraso_TotalMinutos'])
+
+    return dim_retraso
+
+
+#  CONSTRUCCIÓN EN STREAMING
+#  Las tablas se actualizan lote a lote: los agregados se guardan como sumas y
+#  conteos parciales de `Agregacion` (se pueden sumar entre lotes), las
+#  dimensiones como conjuntos de valores distintos y las tablas fila a fila se
+#  escriben al disco a medida que llegan. La memoria depende del tamaño del lote, no del dataset.
+def _valores_clave(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.astype(serie.cat.categories.dtype)
+    return serie
+
+
+def _distintos(acumulado, nuevos):
+    nuevos = nuevos.apply(_valores_clave).drop_duplicates()
+    if acumulado is None:
+        return nuevos
+    return pd.concat([acumulado, nuevos], ignore_index=True).drop_duplicates()
+
+
+agregaciones_modelo = {
+    'operaciones': agregacion_operaciones,
+    'aerolinea': agregacion_aerolinea,
+    'aeropuerto': agregacion_aeropuerto,
+}
+
+#  Atributos que forman el estado del constructor entre ejecuciones
+_atributos_estado = ['siguiente_id', 'aerolineas', 'aeropuertos', 'fechas', 'codigos', 'parciales']
+
+
+class ConstructorEstrella:
+    tablas_por_filas = ['fact_vuelos.csv', 'dim_desviaciones.csv', 'dim_retraso.csv']
+
+    def __init__(self, directorio='.', claves=None, formato='csv'):
+        #  Las claves sustitutas se guardan en `directorio` y se conservan entre ejecuciones.
+        #  `formato` (exportacion.formatos_exportacion) es el de las tablas fila a
+        #  fila; el estado para reanudar (guardar_estado) solo admite 'csv'.
+        self.directorio = directorio
+        self.formato = formato
+        self._escritores = {}
+        self.claves = claves if claves is not None else IndiceClaves(os.path.join(directorio, archivo_claves))
+        self.siguiente_id = {nombre: 1 for nombre in self.tablas_por_filas}
+        self.aerolineas = None
+        self.aeropuertos = None
+        self.fechas = None
+        self.codigos = None
+        self.parciales = {nombre: None for nombre in agregaciones_modelo}
+        for nombre in self.tablas_por_filas:
+            ruta = self.ruta(nombre)
+            if os.path.exists(ruta):
+                os.remove(ruta)
+
+    def ruta(self, nombre):
+        #  'fact_vuelos.csv' -> archivo de la tabla fila a fila en el formato elegido
+        return archivo_destino(nombre, self.formato, self.directorio)
+
+    def _escribir(self, nombre, tabla):
+        if tabla.empty:
+            return
+        ruta = self.ruta(nombre)
+        if self.formato == 'parquet':
+            #  Un grupo de filas por lote; los lotes vienen del staging tipado y
+            #  comparten los tipos del primero
+            if nombre not in self._escritores:
+                esquema = pa.Schema.from_pandas(tabla, preserve_index=False).remove_metadata()
+                self._escritores[nombre] = pq.ParquetWriter(ruta, esquema, compression=compresion_parquet)
+            escritor = self._escritores[nombre]
+            escritor.write_table(pa.Table.from_pandas(tabla, schema=escritor.schema, preserve_index=False))
+        else:
+            tabla.to_csv(ruta, mode='a', index=False, header=self.siguiente_id[nombre] == 1,
+                         compression='gzip' if self.formato == 'csv.gz' else None)
+        self.siguiente_id[nombre] += len(tabla)
+
+    def cerrar(self):
+        #  Cierra los archivos Parquet de las tablas fila a fila
+        for escritor in self._escritores.values():
+            escritor.close()
+        self._escritores.clear()
+
+    def agregar(self, chunk):
+        #  Tablas fila a fila: se escriben con IDs que continúan entre lotes
+        filas = {
+            'fact_vuelos.csv': construir_fact_vuelos(chunk, self.siguiente_id['fact_vuelos.csv'], self.claves),
+            'dim_desviaciones.csv': construir_dim_desviaciones(chunk, self.siguiente_id['dim_desviaciones.csv']),
+            'dim_retraso.csv': construir_dim_retraso(chunk, self.siguiente_id['dim_retraso.csv']),
+        }
+        for nombre, tabla in filas.items():
+            self._escribir(nombre, tabla)
+
+        #  Dimensiones: valores distintos en orden de aparición
+        self.aerolineas = _distintos(self.aerolineas, chunk[['Reporting_Airline', 'DOT_ID_Reporting_Airline']])
+        self.aeropuertos = _distintos(self.aeropuertos, chunk[['OriginAirportID', 'Origin', 'OriginCityName', 'OriginState', 'OriginWac']])
+        self.fechas = _distintos(self.fechas, pd.to_datetime(chunk['FlightDate'], errors='coerce').to_frame())
+        self.codigos = _distintos(self.codigos, chunk[['CancellationCode']].dropna())
+
+        #  Agregados parciales
+        for nombre, acumulado in self.parciales.items():
+            self.parciales[nombre] = Agregacion.combinar(acumulado, agregaciones_modelo[nombre].parcial(chunk))
+
+        return filas
+
+    def finalizar(self):
+        #  Devuelve las tablas agregadas; las tablas fila a fila ya están en disco
+        self.cerrar()
+        metricas = {nombre: agregaciones_modelo[nombre].finalizar(parcial) for nombre, parcial in self.parciales.items()}
+        fact_operaciones_aeropuertos = metricas['operaciones'].reset_index()
+        dim_aerolinea = _ensamblar_dim_aerolinea(self.aerolineas, metricas['aerolinea'], self.claves)
+        dim_aeropuerto = _ensamblar_dim_aeropuerto(self.aeropuertos, metricas['aeropuerto'], self.claves)
+
+        return {
+            "fact_operaciones_aeropuertos.csv": _completar_fact_operaciones(fact_operaciones_aeropuertos, self.claves),
+            "dim_aerolinea.csv": dim_aerolinea,
+            "dim_aeropuerto.csv": dim_aeropuerto,
+            "dim_tiempo.csv": _ensamblar_dim_tiempo(self.fechas['FlightDate']),
+            "dim_cancelacion.csv": _ensamblar_dim_cancelacion(self.codigos, self.claves),
+        }
+
+    def guardar_estado(self, ruta):
+        #  Guarda agregados parciales, valores distintos, IDs y el tamaño de cada CSV
+        #  fila a fila; el archivo se reemplaza de forma atómica. El índice de claves
+        #  se guarda antes: si el proceso se corta, al rehacer el lote las claves
+        #  nuevas ya están y se asignan igual.
+        self.claves.guardar()
+        estado = {atributo: getattr(self, atributo) for atributo in _atributos_estado}
+        estado['tamaños'] = {
+            nombre: os.path.getsize(os.path.join(self.directorio, nombre))
+            if os.path.exists(os.path.join(self.directorio, nombre)) else 0
+            for nombre in self.tablas_por_filas
+        }
+        temporal = ruta + '.tmp'
+        pd.to_pickle(estado, temporal)
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar_estado(cls, ruta, directorio='.', claves=None):
+        #  Sin estado guardado se empieza de cero. Con estado, los CSV fila a fila se
+        #  recortan al tamaño guardado para descartar filas de un lote no confirmado.
+        if not os.path.exists(ruta):
+            return cls(directorio, claves)
+        constructor = cls.__new__(cls)
+        constructor.directorio = directorio
+        constructor.formato = 'csv'
+        constructor._escritores = {}
+        constructor.claves = claves if claves is not None else IndiceClaves(os.path.join(directorio, archivo_claves))
+        estado = pd.read_pickle(ruta)
+        for atributo in _atributos_estado:
+            setattr(constructor, atributo, estado[atributo])
+        for nombre, tamaño in estado['tamaños'].items():
+            archivo = os.path.join(directorio, nombre)
+            if os.path.exists(archivo):
+                with open(archivo, 'r+b') as csv:
+                    csv.truncate(tamaño)
+        return constructor
@@ -0,0 +1,153 @@
+import gzip
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from almacenamiento import compresion_parquet
+from metricas import RegistroEtapas
+
+
+#  Formatos de exportación de las tablas del modelo y extensión de cada uno
+formatos_exportacion = {'csv': '.csv', 'csv.gz': '.csv.gz', 'parquet': '.parquet'}
+formato_exportacion = 'csv'
+
+#  Filas por escritura: las tablas grandes (fact_vuelos) se escriben por partes
+#  en lugar de un único `to_csv`; en Parquet cada parte es un grupo de filas
+filas_por_grupo = 250000
+
+#  Hilos de exportación (una tabla por hilo)
+num_hilos = 4
+
+#  Manifiesto con las filas y los bytes de cada archivo exportado
+archivo_manifiesto = 'exportacion_manifiesto.json'
+
+
+def archivo_destino(nombre, formato, directorio='.'):
+    #  'fact_vuelos.csv' -> ./fact_vuelos.parquet, ./fact_vuelos.csv.gz...
+    return os.path.join(directorio, nombre.removesuffix('.csv') + formatos_exportacion[formato])
+
+
+def formato_archivo(ruta):
+    #  ./rutas.csv.gz -> 'csv.gz'
+    for formato, extension in sorted(formatos_exportacion.items(), key=lambda item: -len(item[1])):
+        if ruta.endswith(extension):
+            return formato
+    raise ValueError(f"No se reconoce el formato de {ruta}: use {', '.join(formatos_exportacion.values())}")
+
+
+def _partes(tabla, filas):
+    for inicio in range(0, len(tabla), filas):
+        yield tabla.iloc[inicio:inicio + filas]
+
+
+def _escribir_csv(tabla, ruta, filas, comprimir):
+    abrir = gzip.open if comprimir else open
+    with abrir(ruta, 'wt', encoding='utf-8', newline='') as destino:
+        for i, parte in enumerate(_partes(tabla, filas)):
+            parte.to_csv(destino, index=False, header=i == 0)
+
+
+def _escribir_parquet(tabla, ruta, filas):
+    #  El esquema sale de la tabla completa: una parte sin valores en una columna no fija su tipo
+    esquema = pa.Schema.from_pandas(tabla, preserve_index=False).remove_metadata()
+    with pq.ParquetWriter(ruta, esquema, compression=compresion_parquet) as escritor:
+        for parte in _partes(tabla, filas):
+            escritor.write_table(pa.Table.from_pandas(parte, schema=esquema, preserve_index=False), row_group_size=filas)
+
+
+def exportar_tabla(tabla, nombre, formato=formato_exportacion, directorio='.', filas=filas_por_grupo):
+    #  Escribe una tabla y devuelve su entrada del manifiesto y sus métricas
+    if formato not in formatos_exportacion:
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
+    ruta = archivo_destino(nombre, formato, directorio)
+    registro = RegistroEtapas()
+    with registro.etapa(f"exportacion.{nombre.removesuffix('.csv')}", len(tabla)):
+        if formato == 'parquet':
+            _escribir_parquet(tabla, ruta, filas)
+        else:
+            _escribir_csv(tabla, ruta, filas, comprimir=formato == 'csv.gz')
+    return entrada_manifiesto(ruta, len(tabla), formato), registro
+
+
+def escribir_lotes(lotes, ruta, formato=None):
+    #  Escribe lotes de Arrow (RecordBatch con un mismo esquema) a medida que
+    #  llegan: en memoria solo está el lote actual. En Parquet cada lote es un
+    #  grupo de filas. Se escribe en un temporal, así que el archivo aparece
+    #  completo o no aparece. Devuelve su entrada del manifiesto.
+    formato = formato or formato_archivo(ruta)
+    if formato not in formatos_exportacion:
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
+    temporal = ruta + '.tmp'
+    filas, escritor = 0, None
+    try:
+        with open(temporal, 'wb') as archivo:
+            destino = gzip.open(archivo, 'wb') if formato == 'csv.gz' else archivo
+            for lote in lotes:
+                if escritor is None:
+                    escritor = (pq.ParquetWriter(destino, lote.schema, compression=compresion_parquet) if formato == 'parquet'
+                                else pacsv.CSVWriter(destino, lote.schema))
+                escritor.write_batch(lote)
+                filas += lote.num_rows
+            if escritor is not None:
+                escritor.close()
+            if destino is not archivo:
+                destino.close()
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return entrada_manifiesto(ruta, filas, formato)
+
+
+def leer_por_lotes(ruta, filas=filas_por_grupo):
+    #  DataFrames de a lo sumo `filas` filas de un archivo exportado (CSV, CSV comprimido o Parquet)
+    if formato_archivo(ruta) == 'parquet':
+        for lote in pq.ParquetFile(ruta).iter_batches(batch_size=filas):
+            yield lote.to_pandas()
+    else:
+        yield from pd.read_csv(ruta, chunksize=filas)
+
+
+def entrada_manifiesto(ruta, filas, formato='csv'):
+    tabla = os.path.basename(ruta).split('.')[0]
+    return {'tabla': tabla, 'archivo': ruta, 'formato': formato, 'filas': filas, 'bytes': os.path.getsize(ruta)}
+
+
+def exportar_tablas(tablas, formato=formato_exportacion, directorio='.', hilos=num_hilos, filas=filas_por_grupo,
+                    manifiesto=archivo_manifiesto, metricas=None, adicionales=()):
+    #  Exporta todas las tablas no vacías ({nombre_archivo: DataFrame}) en paralelo
+    #  y guarda el manifiesto. `adicionales` son entradas de archivos ya escritos
+    #  (las tablas fila a fila del modo streaming). Devuelve las entradas del manifiesto.
+    vacias = [nombre for nombre, tabla in tablas.items() if tabla.empty]
+    with ThreadPoolExecutor(max_workers=max(1, hilos)) as pool:
+        futuros = {nombre: pool.submit(exportar_tabla, tabla, nombre, formato, directorio, filas)
+                   for nombre, tabla in tablas.items() if not tabla.empty}
+        entradas = list(adicionales)
+        for nombre, futuro in futuros.items():
+            entrada, registro = futuro.result()
+            entradas.append(entrada)
+            if metricas is not None:
+                metricas.combinar(registro)
+
+    if manifiesto:
+        guardar_manifiesto({
+            'generado': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'formato': formato,
+            'tablas': entradas,
+            'vacias': [nombre.removesuffix('.csv') for nombre in vacias],
+        }, os.path.join(directorio, manifiesto))
+    return entradas
+
+
+def guardar_manifiesto(contenido, ruta=archivo_manifiesto):
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(contenido, archivo, indent=2, ensure_ascii=False)
+    os.replace(temporal, ruta)
@@ -0,0 +1,300 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from functools import partial
+
+import pandas as pd
+
+from limpieza import limpiar_lote, mapear_en_orden
+from almacenamiento import lote_a_arrow, escribir_particiones, ampliar_esquema
+from esquema import ConstructorEstrella
+from metricas import RegistroEtapas, Metricas
+from bocetos import preparar_bocetos, escribir_parcial, compactar
+
+
+#  Manifiesto con marcas de agua y lotes confirmados por fuente
+archivo_estado = 'etl_estado.json'
+
+#  Carpeta con las instantáneas del constructor del modelo estrella
+directorio_estado = 'etl_estado'
+
+#  Tabla de PostgreSQL donde se confirma cada lote junto con sus datos
+tabla_checkpoints = 'etl_checkpoints'
+
+#  Bytes del inicio y del final del archivo que entran en la huella
+bytes_huella = 1 << 20
+
+
+def huella_archivo(ruta):
+    #  Tamaño + fecha de modificación + hash del primer y último MiB: detecta
+    #  archivos reemplazados o ampliados sin leerlos completos.
+    info = os.stat(ruta)
+    resumen = hashlib.blake2b(digest_size=16)
+    resumen.update(f"{info.st_size}:{info.st_mtime_ns}".encode())
+    with open(ruta, 'rb') as archivo:
+        resumen.update(archivo.read(bytes_huella))
+        if info.st_size > bytes_huella:
+            archivo.seek(max(info.st_size - bytes_huella, bytes_huella))
+            resumen.update(archivo.read())
+    return resumen.hexdigest()
+
+
+def cargar_estado(ruta=archivo_estado):
+    if not os.path.exists(ruta):
+        return {'fuentes': {}, 'estado_constructor': None}
+    with open(ruta, encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def guardar_estado(estado, ruta=archivo_estado):
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(estado, archivo, indent=2, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+
+def _constructor_completo(estado):
+    return (estado.get('ejecucion_completa') or {}).get('estado_constructor')
+
+
+def volver_a_ejecucion_completa(estado, staging, bocetos=None, duplicados=None):
+    #  Devuelve el constructor del modelo estrella a la instantánea de la última
+    #  ejecución completa y cada fuente sin terminar al lote en que estaba
+    #  entonces. Sus lotes posteriores se borran del staging y de los bocetos
+    #  parciales (los de otra huella no se sobrescribirían al releerlos) y el
+    #  diario de vistos se descarta, porque lo guardado en el índice coincide con
+    #  esa instantánea. PostgreSQL no cambia: `etl_checkpoints` y la clave de
+    #  `vuelos` evitan cargar dos veces lo que ya tiene.
+    completa = estado.get('ejecucion_completa')
+    if completa is None:
+        if any(info['completado'] for info in estado['fuentes'].values()):
+            #  Estado de una versión anterior, sin la instantánea de la última ejecución completa
+            raise ValueError(f"No hay instantánea de la última ejecución completa en {directorio_estado}; "
+                             f"borre {archivo_estado} y {directorio_estado} y vuelva a procesar las fuentes")
+        completa = {'estado_constructor': None, 'fuentes': {}}
+    for nombre, info in estado['fuentes'].items():
+        if info['completado']:
+            continue
+        registrada = completa['fuentes'].get(nombre)
+        lotes = registrada['lotes_confirmados'] if registrada and registrada['huella'] == info['huella'] else 0
+        prefijo = f"lote-{info['huella'][:12]}-"
+        for directorio in filter(None, (staging, bocetos)):
+            for carpeta, _, archivos in os.walk(directorio):
+                for archivo in archivos:
+                    if archivo.startswith(prefijo) and int(archivo[len(prefijo):len(prefijo) + 6]) >= lotes:
+                        os.remove(os.path.join(carpeta, archivo))
+        info['manifiesto'] = [entrada for entrada in info['manifiesto'] if entrada['lote'] < lotes]
+        info['lotes_confirmados'] = lotes
+        info['marca_agua_pendiente'] = _maxima(*(_fecha(entrada['marca_agua']) for entrada in info['manifiesto']))
+    if estado['estado_constructor'] not in (None, completa['estado_constructor']) \
+            and os.path.exists(estado['estado_constructor']):
+        os.remove(estado['estado_constructor'])
+    estado['estado_constructor'] = completa['estado_constructor']
+    if duplicados:
+        duplicados.descartar_diario()
+
+
+def _fecha(valor):
+    return None if valor is None else pd.Timestamp(valor)
+
+
+def _maxima(*fechas):
+    fechas = [f for f in fechas if f is not None and not pd.isna(f)]
+    return max(fechas).strftime('%Y-%m-%d') if fechas else None
+
+
+def limpiar_nuevos(lote, ruta, marca_agua, prefijo):
+    #  Limpia el lote, descarta lo que ya cubre la marca de agua y lo escribe en
+    #  el staging. El nombre del archivo es fijo por lote: al reanudar se sobrescribe.
+    indice, chunk = lote
+    registros = len(chunk)
+    registro = RegistroEtapas()
+    chunk = limpiar_lote(chunk, registro)
+    with registro.etapa('incremental.marca_agua', len(chunk)) as medicion:
+        if marca_agua is not None:
+            filas = len(chunk)
+            chunk = chunk[chunk['FlightDate'] > pd.Timestamp(marca_agua)]
+            medicion['descartes']['marca_agua'] = filas - len(chunk)
+    with registro.etapa('staging', len(chunk)):
+        tabla = lote_a_arrow(chunk)
+        if len(chunk):
+            escribir_particiones(tabla, ruta, f"{prefijo}-{indice:06d}")
+    return indice, registros, chunk, tabla.schema, registro
+
+
+def crear_tabla_checkpoints(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {tabla_checkpoints} (
+            fuente text NOT NULL,
+            huella text NOT NULL,
+            lote integer NOT NULL,
+            filas integer NOT NULL,
+            confirmado timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (fuente, huella, lote)
+        )
+    """)
+
+
+def lotes_en_postgres(conexion, fuente, huella):
+    with conexion.cursor() as cursor:
+        crear_tabla_checkpoints(cursor)
+        cursor.execute(f"SELECT lote FROM {tabla_checkpoints} WHERE fuente = %s AND huella = %s", (fuente, huella))
+        lotes = {lote for (lote,) in cursor.fetchall()}
+    conexion.commit()
+    return lotes
+
+
+def ejecutar_incremental(fuente, staging, leer_lotes, chunk_size, workers=1, cargador=None, tabla='vuelos',
+                         cargar_modelo=False, resumenes=None, metricas=None, ruta_estado=archivo_estado, bocetos=None,
+                         duplicados=None):
+    #  Procesa solo los datos nuevos de `fuente` y reanuda desde el último lote
+    #  confirmado. `leer_lotes(saltar_filas)` devuelve el lector de pandas.
+    #  Por cada lote, en este orden:
+    #    0. con `duplicados` (duplicados.Deduplicador), descarte de los vuelos ya vistos
+    #    1. limpieza + filtro por marca de agua + staging (archivo fijo por lote)
+    #       y, con `bocetos` (carpeta), sus bocetos parciales (también fijos por lote)
+    #    2. agregados parciales y filas nuevas del modelo estrella
+    #    3. COPY a PostgreSQL, tablas resumen y registro en `etl_checkpoints` en la
+    #       misma transacción
+    #    4. instantánea del constructor y manifiesto (reemplazo atómico) y, después,
+    #       las claves nuevas del lote en el diario del índice de vistos
+    #  Si el proceso se corta entre 3 y 4, al reanudar el lote se rehace en local
+    #  pero no se vuelve a cargar, porque PostgreSQL ya lo tiene confirmado.
+    metricas = metricas if metricas is not None else Metricas()
+    estado = cargar_estado(ruta_estado)
+    huella = huella_archivo(fuente)
+    info = estado['fuentes'].get(fuente)
+
+    if info and info['huella'] == huella and info['completado']:
+        print(f"  {fuente} no tiene datos nuevos (marca de agua {info['marca_agua']}).")
+    else:
+        if not info or info['huella'] != huella:
+            if info and not info['completado']:
+                #  Cambió a mitad de una ejecución: sus lotes confirmados ya están en el constructor
+                print(f"  {fuente} cambió antes de terminar: se vuelve a la última ejecución completa.")
+                volver_a_ejecucion_completa(estado, staging, bocetos, duplicados)
+            #  Fuente nueva o modificada: se relee completa y se filtra por la marca de agua
+            info = {
+                'huella': huella,
+                'tamaño_lote': chunk_size,
+                'marca_agua': info['marca_agua'] if info else None,
+                'marca_agua_pendiente': None,
+                'lotes_confirmados': 0,
+                'completado': False,
+                'manifiesto': [],
+            }
+        elif info['tamaño_lote'] != chunk_size:
+            raise ValueError(f"La ejecución pendiente usa lotes de {info['tamaño_lote']} filas; no se puede reanudar con {chunk_size}")
+        estado['fuentes'][fuente] = info
+
+        inicio = info['lotes_confirmados']
+        if inicio:
+            print(f"  Reanudando {fuente} desde el lote {inicio}.")
+
+        constructor = ConstructorEstrella.cargar_estado(estado['estado_constructor']) \
+            if estado['estado_constructor'] else ConstructorEstrella()
+        os.makedirs(directorio_estado, exist_ok=True)
+        if bocetos:
+            preparar_bocetos(bocetos)
+
+        conexion = cargador.conectar() if cargador else None
+        cargados = lotes_en_postgres(conexion, fuente, huella) if conexion else set()
+        if conexion and resumenes:
+            with conexion.cursor() as cursor:
+                resumenes.preparar(cursor)
+            conexion.commit()
+        columnas_tabla = {}
+
+        try:
+            limpiar = partial(limpiar_nuevos, ruta=staging, marca_agua=info['marca_agua'], prefijo=f"lote-{huella[:12]}")
+            lotes = enumerate(metricas.iterar('lectura', leer_lotes(inicio * chunk_size)), start=inicio)
+            if duplicados:
+                lotes = duplicados.iterar(lotes, metricas)
+            for indice, registros, chunk, esquema, registro in mapear_en_orden(limpiar, lotes, workers):
+                print(f" Lote {indice}: {registros} registros leídos, {len(chunk)} nuevos.")
+                metricas.combinar(registro, indice)
+                if len(chunk):
+                    ampliar_esquema(staging, [esquema])
+                    if bocetos:
+                        with metricas.etapa('bocetos', len(chunk)):
+                            escribir_parcial(chunk, bocetos, f"lote-{huella[:12]}-{indice:06d}")
+                with metricas.etapa('modelo', len(chunk)):
+                    filas_modelo = constructor.agregar(chunk) if len(chunk) else {}
+
+                if conexion and indice not in cargados:
+                    with metricas.etapa('carga', len(chunk)):
+                        with conexion.cursor() as cursor:
+                            destinos = {tabla: chunk}
+                            if cargar_modelo:
+                                destinos.update({nombre.removesuffix('.csv'): filas for nombre, filas in filas_modelo.items()})
+                            insertadas = chunk
+                            for destino, datos in destinos.items():
+                                if datos.empty:
+                                    continue
+                                if destino not in columnas_tabla:
+                                    columnas_tabla[destino] = cargador.preparar_tabla(cursor, destino, datos)
+                                    #  Si había filas repetidas de cargas sin la clave, los resúmenes se rehacen
+                                    if cargador.asegurar_clave(cursor, destino) and resumenes and destino == tabla:
+                                        resumenes.reconstruir(cursor, tabla)
+                                cargador.preparar_particiones(cursor, destino, datos)
+                                filas = cargador.insertar(cursor, destino, datos, columnas_tabla[destino])
+                                if destino == tabla:
+                                    insertadas = filas
+                            if resumenes and not insertadas.empty:
+                                resumenes.actualizar(cursor, insertadas)
+                            cursor.execute(f"INSERT INTO {tabla_checkpoints} (fuente, huella, lote, filas) VALUES (%s, %s, %s, %s)",
+                                           (fuente, huella, indice, len(chunk)))
+                        conexion.commit()
+
+                anterior = estado['estado_constructor']
+                estado['estado_constructor'] = os.path.join(directorio_estado, f"constructor-{huella[:12]}-{indice + 1:06d}.pkl")
+                constructor.guardar_estado(estado['estado_constructor'])
+
+                maxima = chunk['FlightDate'].max() if len(chunk) else None
+                info['marca_agua_pendiente'] = _maxima(_fecha(info['marca_agua_pendiente']), maxima)
+                info['lotes_confirmados'] = indice + 1
+                info['manifiesto'].append({
+                    'lote': indice,
+                    'filas_leidas': registros,
+                    'filas_nuevas': len(chunk),
+                    'marca_agua': _maxima(maxima),
+                    'confirmado': datetime.now().isoformat(timespec='seconds'),
+                })
+                guardar_estado(estado, ruta_estado)
+                if anterior and anterior not in (estado['estado_constructor'], _constructor_completo(estado)) \
+                        and os.path.exists(anterior):
+                    os.remove(anterior)
+                if duplicados:
+                    duplicados.confirmar(indice)
+
+            #  Fuente completa: la marca de agua avanza hasta la fecha máxima vista
+            info['marca_agua'] = _maxima(_fecha(info['marca_agua']), _fecha(info['marca_agua_pendiente']))
+            info['marca_agua_pendiente'] = None
+            info['completado'] = True
+            anterior = _constructor_completo(estado)
+            estado['ejecucion_completa'] = {
+                'estado_constructor': estado['estado_constructor'],
+                'fuentes': {nombre: {'huella': datos['huella'], 'lotes_confirmados': datos['lotes_confirmados']}
+                            for nombre, datos in estado['fuentes'].items()},
+            }
+            guardar_estado(estado, ruta_estado)
+            if anterior and anterior != estado['estado_constructor'] and os.path.exists(anterior):
+                os.remove(anterior)
+            if bocetos:
+                with metricas.etapa('bocetos.compactar'):
+                    compactar(bocetos)
+            if duplicados:
+                duplicados.guardar()
+                print(f"  {duplicados.informe()}")
+            if conexion:
+                with metricas.etapa('carga.optimizar'):
+                    cargador.optimizar(tabla)
+        finally:
+            if conexion:
+                conexion.close()
+
+    if not estado['estado_constructor']:
+        return {}
+    constructor = ConstructorEstrella.cargar_estado(estado['estado_constructor'])
+    return constructor.finalizar() if constructor.parciales['operaciones'] is not None else {}
@@ -0,0 +1,160 @@
+import bz2
+import gzip
+import io
+import os
+import zipfile
+from contextlib import ExitStack, contextmanager, nullcontext
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+
+from limpieza import dtypes, columnas_limpieza
+from almacenamiento import columnas_particion
+from esquema import columnas_modelo
+from resumenes import columnas_origen
+from bocetos import columnas_bocetos
+from duplicados import clave_vuelo
+
+
+#  Codificación del CSV de BTS
+codificacion = 'ISO-8859-1'
+
+#  Parser de CSV: 'c' (pandas) o 'pyarrow' (lector en streaming de Arrow)
+motor_csv = 'c'
+
+#  Bytes que se leen de una vez del origen (y tamaño de bloque del parser 'pyarrow')
+tamaño_buffer = 1 << 20
+
+#  Orígenes comprimidos que se leen como flujo, sin descomprimir a disco
+#  (.zip: el CSV más grande del archivo, como el que descarga Dataset.py)
+abrir_comprimido = {'.gz': gzip.open, '.bz2': bz2.open}
+
+#  Columnas que lee cada etapa posterior a la lectura. Lo que no aparece aquí
+#  no se parsea ni llega al staging ni a `vuelos`.
+columnas_por_uso = {
+    'limpieza': columnas_limpieza,
+    'staging': columnas_particion,
+    'modelo': columnas_modelo,
+    'resumenes': columnas_origen(),
+    'bocetos': columnas_bocetos(),
+    'duplicados': clave_vuelo,
+}
+
+#  dtype de pandas -> tipo de Arrow para el parser 'pyarrow'
+_tipos_arrow = {
+    'int8': pa.int8(),
+    'int16': pa.int16(),
+    'int32': pa.int32(),
+    'int64': pa.int64(),
+    'float32': pa.float32(),
+    'float64': pa.float64(),
+    'str': pa.string(),
+}
+
+
+def columnas_necesarias(usos=columnas_por_uso):
+    return list(dict.fromkeys(col for columnas in usos.values() for col in columnas))
+
+
+def es_comprimido(ruta):
+    return os.path.splitext(ruta)[1].lower() in ('.zip', *abrir_comprimido)
+
+
+def miembro_csv(archivo_zip):
+    miembros = [m for m in archivo_zip.infolist() if m.filename.lower().endswith('.csv')]
+    if not miembros:
+        raise ValueError(f"{archivo_zip.filename} no contiene ningún CSV")
+    return max(miembros, key=lambda m: m.file_size)
+
+
+@contextmanager
+def abrir_origen(ruta, buffer=tamaño_buffer):
+    #  Flujo binario de `ruta` (CSV, .zip, .gz o .bz2) que se descomprime a
+    #  medida que se lee, con un buffer de `buffer` bytes
+    extension = os.path.splitext(ruta)[1].lower()
+    with ExitStack() as pila:
+        if extension == '.zip':
+            archivo_zip = pila.enter_context(zipfile.ZipFile(ruta))
+            flujo = pila.enter_context(archivo_zip.open(miembro_csv(archivo_zip)))
+        elif extension in abrir_comprimido:
+            flujo = pila.enter_context(abrir_comprimido[extension](ruta, 'rb'))
+        else:
+            flujo = pila.enter_context(open(ruta, 'rb', buffering=0))
+        yield pila.enter_context(io.BufferedReader(flujo, buffer_size=buffer))
+
+
+def columnas_archivo(ruta):
+    with abrir_origen(ruta) as archivo:
+        return list(pd.read_csv(archivo, nrows=0, encoding=codificacion).columns)
+
+
+def planificar_lectura(ruta, usos=columnas_por_uso):
+    #  {columna: dtype} de las columnas del archivo que se usan, en el orden del
+    #  archivo. Las que faltan en el archivo se ignoran (la limpieza ya lo tolera).
+    necesarias = set(columnas_necesarias(usos))
+    columnas = [col for col in columnas_archivo(ruta) if col in necesarias]
+    sin_tipo = [col for col in columnas if col not in dtypes]
+    if sin_tipo:
+        raise ValueError(f"Columnas sin tipo en limpieza.dtypes: {', '.join(sin_tipo)}")
+    return {col: dtypes[col] for col in columnas}
+
+
+def leer_csv(ruta, chunk_size, columnas=None, motor=motor_csv, saltar_filas=0, buffer=tamaño_buffer):
+    #  Lector por lotes de `ruta` (CSV o CSV comprimido en .zip/.gz/.bz2).
+    #  `columnas` es el plan de `planificar_lectura`; None lee todas las
+    #  columnas (con los tipos conocidos de `dtypes`). `saltar_filas` omite filas
+    #  de datos tras el encabezado (reanudación).
+    if motor == 'c':
+        if es_comprimido(ruta):
+            return _lotes_pandas(ruta, chunk_size, columnas, saltar_filas, buffer)
+        return _lector_pandas(ruta, chunk_size, columnas, saltar_filas)
+    if motor == 'pyarrow':
+        return _lotes_arrow(ruta, chunk_size, columnas, saltar_filas, buffer)
+    raise ValueError(f"Parser de CSV no soportado: {motor}")
+
+
+def _lector_pandas(origen, chunk_size, columnas, saltar_filas):
+    return pd.read_csv(origen, chunksize=chunk_size, delimiter=',', encoding=codificacion, low_memory=True,
+                       usecols=list(columnas) if columnas else None, dtype=columnas or dtypes,
+                       skiprows=range(1, saltar_filas + 1) if saltar_filas else None)
+
+
+def _lotes_pandas(ruta, chunk_size, columnas, saltar_filas, buffer):
+    #  El flujo descomprimido se cierra al terminar o al cerrar el generador
+    with abrir_origen(ruta, buffer) as archivo, _lector_pandas(archivo, chunk_size, columnas, saltar_filas) as lector:
+        yield from lector
+
+
+def _lotes_arrow(ruta, chunk_size, columnas, saltar_filas, buffer):
+    if columnas is None:
+        columnas = {col: dtypes.get(col) for col in columnas_archivo(ruta)}
+    tipos = {col: _tipos_arrow[tipo] for col, tipo in columnas.items() if tipo}
+    with abrir_origen(ruta, buffer) if es_comprimido(ruta) else nullcontext(ruta) as origen:
+        lector = pv.open_csv(
+            origen,
+            read_options=pv.ReadOptions(encoding=codificacion, skip_rows_after_names=saltar_filas, block_size=buffer),
+            convert_options=pv.ConvertOptions(include_columns=list(columnas), column_types=tipos, strings_can_be_null=True),
+        )
+        yield from _reagrupar(lector, chunk_size)
+
+
+def _reagrupar(lector, chunk_size):
+    #  Los bloques de Arrow no coinciden con `chunk_size`: se reagrupan para que los
+    #  lotes sean los mismos que con el parser de pandas (la reanudación depende de ello)
+    inicio, pendiente = 0, None
+    for bloque in lector:
+        bloque = pa.Table.from_batches([bloque])
+        pendiente = bloque if pendiente is None else pa.concat_tables([pendiente, bloque])
+        while pendiente.num_rows >= chunk_size:
+            yield _a_pandas(pendiente.slice(0, chunk_size), inicio)
+            pendiente = pendiente.slice(chunk_size)
+            inicio += chunk_size
+    if pendiente is not None and pendiente.num_rows:
+        yield _a_pandas(pendiente, inicio)
+
+
+def _a_pandas(tabla, inicio):
+    chunk = tabla.to_pandas()
+    chunk.index = pd.RangeIndex(inicio, inicio + len(chunk))
+    return chunk
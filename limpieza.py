@@ -0,0 +1,175 @@
+import gzip
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from metricas import RegistroEtapas
+from bocetos import escribir_parcial
+
+
+#  Definir tipos de datos para reducir consumo de memoria (evita float16 en `read_csv`).
+#  Las columnas numéricas que pueden venir vacías se leen como float32.
+dtypes = {
+    'Year': 'int16',
+    'Quarter': 'int8',
+    'Month': 'int8',
+    'DayofMonth': 'int8',
+    'DayOfWeek': 'int8',
+    'FlightDate': 'str',
+    'Reporting_Airline': 'str',
+    'DOT_ID_Reporting_Airline': 'int32',
+    'Flight_Number_Reporting_Airline': 'int32',
+    'OriginAirportID': 'int32',
+    'Origin': 'str',
+    'OriginCityName': 'str',
+    'OriginState': 'str',
+    'OriginWac': 'int16',
+    'DestAirportID': 'int32',
+    'Dest': 'str',
+    'CRSDepTime': 'int16',
+    'DepTime': 'float32',
+    'DepDelayMinutes': 'float32',
+    'TaxiOut': 'float32',
+    'TaxiIn': 'float32',
+    'CRSArrTime': 'int16',
+    'ArrTime': 'float32',
+    'ArrDelayMinutes': 'float32',
+    'Cancelled': 'int8',
+    'CancellationCode': 'str',
+    'Diverted': 'int8',
+    'CRSElapsedTime': 'float32',
+    'ActualElapsedTime': 'float32',
+    'Distance': 'float32',
+    'CarrierDelay': 'float32',
+    'WeatherDelay': 'float32',
+    'NASDelay': 'float32',
+    'SecurityDelay': 'float32',
+    'LateAircraftDelay': 'float32',
+    'Div1AirportID': 'float32',
+}
+
+#  Columnas clave a mantener
+columnas_clave = ['FlightDate', 'DepTime', 'ArrTime', 'Origin', 'Dest', 'Reporting_Airline']
+
+#  Columnas numéricas que no deben tener valores negativos
+columnas_sin_negativos = ['DepDelayMinutes', 'ArrDelayMinutes', 'TaxiOut', 'TaxiIn', 'CRSElapsedTime', 'ActualElapsedTime']
+
+#  Columnas que no aportan al modelo
+columnas_innecesarias = ['Unnamed: 0']
+
+#  Columnas de texto que se guardan como categorías
+columnas_texto = ['Reporting_Airline', 'Origin', 'Dest']
+
+#  Columnas que lee la propia limpieza (filtros y cálculos adicionales)
+columnas_limpieza = list(dict.fromkeys(columnas_clave + columnas_sin_negativos + ['DepDelayMinutes']))
+
+
+def limpiar_lote(chunk, registro=None):
+    #  `registro` (metricas.RegistroEtapas) recibe el tiempo y las filas
+    #  descartadas de cada paso
+    registro = registro if registro is not None else RegistroEtapas()
+
+    #  ELIMINAR COLUMNAS INNECESARIAS
+    with registro.etapa('limpieza.columnas', len(chunk)):
+        chunk.drop(columns=[col for col in columnas_innecesarias if col in chunk.columns], inplace=True)
+
+    #  VERIFICAR QUE LAS COLUMNAS CLAVE EXISTEN
+    with registro.etapa('limpieza.nulos', len(chunk)) as medicion:
+        columnas_presentes = [col for col in columnas_clave if col in chunk.columns]
+        if columnas_presentes:
+            filas = len(chunk)
+            chunk.dropna(subset=columnas_presentes, how="any", inplace=True)
+            medicion['descartes']['nulos_clave'] = filas - len(chunk)
+
+    #  CONVERTIR `FlightDate` A `datetime`
+    with registro.etapa('limpieza.fechas', len(chunk)):
+        if 'FlightDate' in chunk.columns:
+            chunk['FlightDate'] = pd.to_datetime(chunk['FlightDate'], errors='coerce')
+
+    #  ELIMINAR FILAS CON VALORES NEGATIVOS
+    with registro.etapa('limpieza.negativos', len(chunk)) as medicion:
+        for col in columnas_sin_negativos:
+            if col in chunk.columns:
+                filas = len(chunk)
+                chunk = chunk[chunk[col] >= 0]
+                medicion['descartes'][f'negativos_{col}'] = filas - len(chunk)
+
+    #  NORMALIZAR FORMATOS DE TEXTO
+    with registro.etapa('limpieza.categorias', len(chunk)):
+        for col in columnas_texto:
+            if col in chunk.columns:
+                chunk[col] = chunk[col].astype("category")  # ⚡ Reduce memoria
+
+    #  CALCULOS ADICIONALES
+    with registro.etapa('limpieza.calculos', len(chunk)):
+        if 'DepTime' in chunk.columns and 'ArrTime' in chunk.columns:
+            chunk['DuracionVuelo'] = chunk['ArrTime'] - chunk['DepTime']
+
+        if 'DepDelayMinutes' in chunk.columns:
+            chunk['RetrasoImportante'] = np.where(chunk['DepDelayMinutes'] > 15, 1, 0)
+
+        #  Hora de salida ya calculada: las consultas no interpretan DepTime en cada ejecución
+        if 'DepTime' in chunk.columns:
+            chunk['Hora_Salida'] = hora_salida(chunk['DepTime'])
+
+    return chunk
+
+
+def filas_conservadas(chunk):
+    #  Máscara de las filas que conserva `limpiar_lote` (sin nulos en las columnas
+    #  clave ni negativos o nulos en `columnas_sin_negativos`), sin modificar el
+    #  lote. Si cambian esos filtros hay que cambiar también esta máscara.
+    mascara = np.ones(len(chunk), dtype=bool)
+    columnas_presentes = [col for col in columnas_clave if col in chunk.columns]
+    if columnas_presentes:
+        mascara &= chunk[columnas_presentes].notna().all(axis=1).to_numpy()
+    for col in columnas_sin_negativos:
+        if col in chunk.columns:
+            mascara &= (chunk[col] >= 0).to_numpy(dtype=bool, na_value=False)
+    return mascara
+
+
+def hora_salida(dep_time):
+    #  HHMM -> HH (Int16); nula si no es una hora válida (fuera de 0-2359 o minutos >= 60)
+    return (dep_time // 100).where(dep_time.between(0, 2359) & (dep_time % 100 < 60)).astype('Int16')
+
+
+def limpiar_y_comprimir(lote, bocetos=None):
+    #  Recibe (indice, chunk); el encabezado solo se escribe en el primer lote.
+    #  Cada lote se comprime por separado: varios miembros gzip seguidos forman
+    #  un archivo .gz válido, igual que al escribir con `to_csv(mode='a')`.
+    indice, chunk = lote
+    registros = len(chunk)
+    registro = RegistroEtapas()
+    chunk = limpiar_lote(chunk, registro)
+    with registro.etapa('staging', len(chunk)):
+        datos = gzip.compress(chunk.to_csv(index=False, header=indice == 0).encode('utf-8'))
+    if bocetos:
+        with registro.etapa('bocetos', len(chunk)):
+            escribir_parcial(chunk, bocetos, f"lote-{indice:06d}")
+    return registros, len(chunk), datos, registro
+
+
+def mapear_en_orden(funcion, lotes, workers=1):
+    #  Aplica `funcion` a cada lote y devuelve los resultados en el orden original.
+    #  Con workers > 1 los lotes se reparten entre procesos; como máximo hay
+    #  2 * workers lotes en vuelo para que la memoria no crezca con el archivo.
+    if workers is None or workers <= 0:
+        workers = os.cpu_count() or 1
+
+    if workers == 1:
+        for lote in lotes:
+            yield funcion(lote)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pendientes = deque()
+        for lote in lotes:
+            pendientes.append(pool.submit(funcion, lote))
+            if len(pendientes) >= workers * 2:
+                yield pendientes.popleft().result()
+        while pendientes:
+            yield pendientes.popleft().result()
@@ -0,0 +1,194 @@
+import cProfile
+import json
+import os
+import platform
+import resource
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+
+
+#  Instrumentación por etapa del ETL: tiempo real, tiempo de CPU, filas de
+#  entrada y salida, filas descartadas por cada filtro y variación de memoria.
+#  Los procesos de limpieza llenan su propio RegistroEtapas y lo devuelven con
+#  el lote; el proceso principal lo combina en Metricas, que escribe una línea
+#  JSON por medición o un archivo de texto para Prometheus (node_exporter).
+
+#  Perfilado opcional (--perfil / --rastrear-memoria). Se configura antes de
+#  crear los procesos de limpieza; los perfiles de cProfile solo se recogen en
+#  el proceso principal (con --workers 1 incluyen la limpieza).
+directorio_perfiles = None
+rastrear_memoria = False
+_perfiles = {}
+_perfil_activo = False
+
+#  Prefijo de las métricas de Prometheus
+prefijo_prometheus = 'etl_etapa'
+
+
+def rss_actual():
+    #  Memoria residente del proceso en bytes (Linux); en otros sistemas el máximo histórico
+    try:
+        with open('/proc/self/statm') as archivo:
+            return int(archivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if platform.system() == 'Darwin' else 1024)
+
+
+def configurar(perfil=None, memoria=False):
+    #  `perfil`: carpeta donde guardar un .prof de cProfile por etapa
+    #  `memoria`: pico de memoria de Python por etapa con tracemalloc
+    global directorio_perfiles, rastrear_memoria
+    directorio_perfiles = perfil
+    rastrear_memoria = memoria
+    if memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+class RegistroEtapas:
+    #  Mediciones de un lote (o de una ejecución). Es serializable para que los
+    #  procesos de limpieza lo devuelvan junto con sus resultados.
+
+    def __init__(self):
+        self.eventos = []
+
+    @contextmanager
+    def etapa(self, nombre, filas_entrada=0):
+        #  with registro.etapa('limpieza.nulos', len(chunk)) as medicion:
+        #      ...
+        #      medicion['descartes']['nulos_clave'] = descartadas
+        #  Si no se indica `filas_salida`, son las de entrada menos los descartes.
+        #  Con medicion['omitir'] = True no se registra.
+        global _perfil_activo
+        medicion = {'etapa': nombre, 'filas_entrada': filas_entrada, 'filas_salida': None, 'descartes': {}}
+        perfil = None
+        if directorio_perfiles and not _perfil_activo:
+            perfil = _perfiles.setdefault(nombre, cProfile.Profile())
+            _perfil_activo = True
+        if rastrear_memoria:
+            tracemalloc.reset_peak()
+            memoria_python = tracemalloc.get_traced_memory()[0]
+        rss, cpu, inicio = rss_actual(), time.process_time(), time.perf_counter()
+        if perfil:
+            perfil.enable()
+        try:
+            yield medicion
+        finally:
+            if perfil:
+                perfil.disable()
+                _perfil_activo = False
+            medicion['segundos'] = time.perf_counter() - inicio
+            medicion['cpu_segundos'] = time.process_time() - cpu
+            medicion['memoria_delta_bytes'] = rss_actual() - rss
+            if rastrear_memoria:
+                medicion['pico_python_bytes'] = tracemalloc.get_traced_memory()[1] - memoria_python
+            if medicion['filas_salida'] is None:
+                medicion['filas_salida'] = medicion['filas_entrada'] - sum(medicion['descartes'].values())
+            if not medicion.pop('omitir', False):
+                self.agregar(medicion)
+
+    def agregar(self, medicion):
+        self.eventos.append(medicion)
+
+
+class Metricas(RegistroEtapas):
+    #  Totales por etapa de toda la ejecución. Con `ruta` escribe cada medición
+    #  como una línea JSON (formato 'jsonl') o, al cerrar, los totales como
+    #  archivo de texto de Prometheus (formato 'prometheus').
+
+    def __init__(self, ruta=None, formato='jsonl'):
+        super().__init__()
+        if formato not in ('jsonl', 'prometheus'):
+            raise ValueError(f"Formato de métricas no soportado: {formato}")
+        self.ruta = ruta
+        self.formato = formato
+        self.ejecucion = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.totales = {}
+        self._archivo = open(ruta, 'a', encoding='utf-8') if ruta and formato == 'jsonl' else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def agregar(self, medicion):
+        total = self.totales.setdefault(medicion['etapa'], {
+            'ejecuciones': 0, 'segundos': 0.0, 'cpu_segundos': 0.0, 'filas_entrada': 0, 'filas_salida': 0,
+            'descartes': {}, 'memoria_delta_bytes': 0,
+        })
+        total['ejecuciones'] += 1
+        for campo in ('segundos', 'cpu_segundos', 'filas_entrada', 'filas_salida', 'memoria_delta_bytes'):
+            total[campo] += medicion[campo]
+        total['ultima_memoria_delta_bytes'] = medicion['memoria_delta_bytes']
+        for filtro, filas in medicion['descartes'].items():
+            total['descartes'][filtro] = total['descartes'].get(filtro, 0) + filas
+        if 'pico_python_bytes' in medicion:
+            total['pico_python_bytes'] = max(total.get('pico_python_bytes', 0), medicion['pico_python_bytes'])
+
+        if self._archivo:
+            self._archivo.write(json.dumps({'ejecucion': self.ejecucion, **medicion}, ensure_ascii=False) + '\n')
+            self._archivo.flush()
+
+    def combinar(self, registro, lote=None):
+        #  Suma las mediciones que devolvió un proceso de limpieza
+        for medicion in registro.eventos:
+            self.agregar({**medicion, 'lote': lote} if lote is not None else medicion)
+
+    def iterar(self, nombre, lotes):
+        #  Mide el tiempo que tarda cada `next()` del lector (la lectura en sí). El
+        #  último, que solo encuentra el final del lector, no cuenta como lote.
+        lotes = iter(lotes)
+        while True:
+            with self.etapa(nombre) as medicion:
+                chunk = next(lotes, None)
+                medicion['filas_entrada'] = len(chunk) if chunk is not None else 0
+                medicion['omitir'] = chunk is None
+            if chunk is None:
+                return
+            yield chunk
+
+    def prometheus(self):
+        lineas = []
+        series = [
+            ('segundos_total', 'segundos', 'counter', "Tiempo real por etapa"),
+            ('cpu_segundos_total', 'cpu_segundos', 'counter', "Tiempo de CPU del proceso por etapa"),
+            ('filas_entrada_total', 'filas_entrada', 'counter', "Filas que entran en la etapa"),
+            ('filas_salida_total', 'filas_salida', 'counter', "Filas que salen de la etapa"),
+            ('memoria_delta_bytes', 'ultima_memoria_delta_bytes', 'gauge', "Variación del RSS en la última ejecución de la etapa"),
+            ('ejecuciones_total', 'ejecuciones', 'counter', "Veces que se ejecutó la etapa (lotes)"),
+        ]
+        if rastrear_memoria:
+            series.append(('pico_python_bytes', 'pico_python_bytes', 'gauge', "Pico de memoria de Python (tracemalloc)"))
+        for nombre, campo, tipo, ayuda in series:
+            lineas += [f"# HELP {prefijo_prometheus}_{nombre} {ayuda}", f"# TYPE {prefijo_prometheus}_{nombre} {tipo}"]
+            lineas += [f'{prefijo_prometheus}_{nombre}{{etapa="{etapa}"}} {total.get(campo, 0)}' for etapa, total in self.totales.items()]
+        nombre = f"{prefijo_prometheus}_filas_descartadas_total"
+        lineas += [f"# HELP {nombre} Filas descartadas por cada filtro", f"# TYPE {nombre} counter"]
+        lineas += [f'{nombre}{{etapa="{etapa}",filtro="{filtro}"}} {filas}'
+                   for etapa, total in self.totales.items() for filtro, filas in total['descartes'].items()]
+        return '\n'.join(lineas) + '\n'
+
+    def resumen(self):
+        print(f"  {'etapa':<42} {'lotes':>6} {'s':>9} {'cpu s':>9} {'filas entrada':>14} {'filas salida':>13} {'Δ RSS':>10}")
+        for etapa, total in self.totales.items():
+            print(f"  {etapa:<42} {total['ejecuciones']:>6} {total['segundos']:9.3f} {total['cpu_segundos']:9.3f}"
+                  f" {total['filas_entrada']:>14,} {total['filas_salida']:>13,} {total['memoria_delta_bytes'] / 1e6:8.1f}MB")
+            for filtro, filas in total['descartes'].items():
+                print(f"    descartadas por {filtro}: {filas:,}")
+
+    def cerrar(self):
+        if self._archivo:
+            self._archivo.close()
+            self._archivo = None
+        if self.ruta and self.formato == 'prometheus':
+            #  El recolector de archivos de texto exige un reemplazo atómico
+            temporal = self.ruta + '.tmp'
+            with open(temporal, 'w', encoding='utf-8') as archivo:
+                archivo.write(self.prometheus())
+            os.replace(temporal, self.ruta)
+        if directorio_perfiles and _perfiles:
+            os.makedirs(directorio_perfiles, exist_ok=True)
+            for etapa, perfil in _perfiles.items():
+                perfil.dump_stats(os.path.join(directorio_perfiles, f"{etapa}.prof"))
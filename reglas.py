@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+
+#  Comparaciones permitidas en banderas y conteos condicionales
+comparaciones = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+
+
+#  Reglas declarativas para columnas derivadas. Cada regla se compila una vez
+#  a arreglos de NumPy y se aplica a una serie completa sin recorrer filas:
+#    Tramos   -> np.searchsorted sobre los límites
+#    Mapeo    -> arreglo de búsqueda (claves enteras) o Index.get_indexer
+#    Bandera  -> una comparación vectorizada
+#    Casos    -> np.select sobre varias banderas
+#  Tramos, Mapeo y Casos devuelven categorías con las etiquetas en el orden declarado.
+
+
+def _valores(serie):
+    return serie.to_numpy(dtype='float64', na_value=np.nan) if not isinstance(serie, np.ndarray) else serie
+
+
+def _categorias(codigos, etiquetas, indice):
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=etiquetas), index=indice)
+
+
+class Tramos:
+    #  Tramos cerrados por la derecha: valor <= limites[i] -> etiquetas[i]; lo que
+    #  supera el último límite (y los nulos) -> etiquetas[-1].
+    #  Tramos([15, 60], ['Leve', 'Moderado', 'Severo'])
+
+    def __init__(self, limites, etiquetas):
+        if len(etiquetas) != len(limites) + 1:
+            raise ValueError("Se necesita una etiqueta más que límites")
+        if list(limites) != sorted(limites):
+            raise ValueError("Los límites deben estar ordenados")
+        self.limites = np.asarray(limites, dtype='float64')
+        self.etiquetas = list(etiquetas)
+
+    def codigos(self, valores):
+        #  Los NaN quedan al final de `searchsorted`, es decir, en el último tramo
+        return np.searchsorted(self.limites, _valores(valores), side='left')
+
+    def aplicar(self, serie):
+        return _categorias(self.codigos(serie), self.etiquetas, serie.index)
+
+
+class Mapeo:
+    #  Valor -> etiqueta según una tabla; lo que no está en la tabla -> `defecto`.
+    #  Mapeo({12: 'Invierno', 1: 'Invierno', ...}, defecto='Otoño')
+
+    def __init__(self, tabla, defecto):
+        self.etiquetas = list(dict.fromkeys(list(tabla.values()) + [defecto]))
+        posicion = {etiqueta: i for i, etiqueta in enumerate(self.etiquetas)}
+        self.claves = pd.Index(list(tabla))
+        self.codigo_claves = np.array([posicion[v] for v in tabla.values()], dtype='int64')
+        self.codigo_defecto = posicion[defecto]
+
+        #  Claves enteras pequeñas (meses, días, códigos): arreglo de búsqueda directa
+        self.busqueda = None
+        if len(tabla) and all(isinstance(c, (int, np.integer)) and 0 <= c < 4096 for c in tabla):
+            self.busqueda = np.full(max(tabla) + 1, self.codigo_defecto, dtype='int64')
+            self.busqueda[np.asarray(list(tabla), dtype='int64')] = self.codigo_claves
+
+    def codigos(self, serie):
+        if self.busqueda is not None and pd.api.types.is_integer_dtype(serie.dtype) and not serie.hasnans:
+            valores = serie.to_numpy(dtype='int64')
+            dentro = (valores >= 0) & (valores < len(self.busqueda))
+            return np.where(dentro, self.busqueda[np.where(dentro, valores, 0)], self.codigo_defecto)
+        posiciones = self.claves.get_indexer(serie)
+        return np.where(posiciones >= 0, self.codigo_claves[posiciones], self.codigo_defecto)
+
+    def aplicar(self, serie):
+        return _categorias(self.codigos(serie), self.etiquetas, serie.index)
+
+
+class Bandera:
+    #  Condición sobre una columna numérica; los nulos nunca la cumplen.
+    #  Bandera('>', 15).aplicar(df['DepDelayMinutes']) -> 0/1 (int8)
+
+    def __init__(self, comparacion, umbral):
+        if comparacion not in comparaciones:
+            raise ValueError(f"Comparación no soportada: {comparacion}")
+        self.comparacion = comparacion
+        self.umbral = umbral
+
+    def evaluar(self, valores):
+        #  Arreglo booleano; los NaN dan False en cualquier comparación salvo '!='
+        valores = _valores(valores)
+        resultado = comparaciones[self.comparacion](valores, self.umbral)
+        return resultado & ~np.isnan(valores) if self.comparacion == '!=' else resultado
+
+    def aplicar(self, serie):
+        return pd.Series(self.evaluar(serie).astype('int8'), index=serie.index)
+
+
+class Casos:
+    #  Primera bandera que se cumple -> su etiqueta; ninguna -> `defecto`.
+    #  Casos([(Bandera('==', 0), 'Sin Retraso'), (Bandera('<=', 15), 'Leve')], defecto='Otro')
+
+    def __init__(self, casos, defecto):
+        self.casos = list(casos)
+        self.etiquetas = list(dict.fromkeys([etiqueta for _, etiqueta in self.casos] + [defecto]))
+        posicion = {etiqueta: i for i, etiqueta in enumerate(self.etiquetas)}
+        self.codigos_casos = [posicion[etiqueta] for _, etiqueta in self.casos]
+        self.codigo_defecto = posicion[defecto]
+
+    def codigos(self, serie):
+        valores = _valores(serie)
+        return np.select([bandera.evaluar(valores) for bandera, _ in self.casos], self.codigos_casos, self.codigo_defecto)
+
+    def aplicar(self, serie):
+        return _categorias(self.codigos(serie), self.etiquetas, serie.index)
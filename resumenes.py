@@ -0,0 +1,188 @@
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from agregaciones import Agregacion
+from limpieza import hora_salida
+
+
+#  Tabla de una sola fila con la versión de los datos: sube cada vez que se
+#  actualizan los resúmenes y sirve de clave para la caché de consultas.py
+tabla_version = 'resumen_version'
+
+#  Columnas calculadas antes de agregar:
+#    (columnas de origen, función sobre el lote, expresión SQL equivalente sobre vuelos)
+columnas_derivadas = {
+    #  Hora de salida (HHMM -> HH); si no es una hora válida queda nula y el vuelo no se cuenta
+    'Hora_Salida': (
+        ['DepTime'],
+        lambda df: hora_salida(df['DepTime']),
+        'CASE WHEN "DepTime" BETWEEN 0 AND 2359 AND "DepTime"::integer % 100 < 60 THEN floor("DepTime" / 100) END',
+    ),
+    #  Tiempos de vuelo solo cuando se conocen el real y el planificado
+    'Tiempo_Real': (
+        ['ActualElapsedTime', 'CRSElapsedTime'],
+        lambda df: df['ActualElapsedTime'].where(df['CRSElapsedTime'].notna()),
+        'CASE WHEN "CRSElapsedTime" IS NOT NULL THEN "ActualElapsedTime" END',
+    ),
+    'Tiempo_Planificado': (
+        ['ActualElapsedTime', 'CRSElapsedTime'],
+        lambda df: df['CRSElapsedTime'].where(df['ActualElapsedTime'].notna()),
+        'CASE WHEN "ActualElapsedTime" IS NOT NULL THEN "CRSElapsedTime" END',
+    ),
+}
+
+#  Tablas resumen: claves (con su tipo en PostgreSQL) y métricas sumables.
+#  Los promedios se guardan como suma + registros para poder sumar lotes nuevos.
+definiciones = {
+    'resumen_aerolinea': ({'Reporting_Airline': 'text'}, {
+        'Vuelos': (None, 'size'),
+        'Vuelos_Cancelados': ('Cancelled', 'count_if', ('==', 1)),
+    }),
+    'resumen_aeropuerto': ({'OriginAirportID': 'integer'}, {
+        'Vuelos': (None, 'size'),
+        'Registros_Retraso_Llegada': ('ArrDelayMinutes', 'count'),
+        'Suma_Retraso_Llegada': ('ArrDelayMinutes', 'sum'),
+    }),
+    'resumen_ruta': ({'Origin': 'text', 'Dest': 'text'}, {
+        'Vuelos': (None, 'size'),
+        'Registros_Tiempos': ('Tiempo_Real', 'count'),
+        'Suma_Tiempo_Real': ('Tiempo_Real', 'sum'),
+        'Suma_Tiempo_Planificado': ('Tiempo_Planificado', 'sum'),
+    }),
+    'resumen_hora': ({'Hora_Salida': 'smallint'}, {
+        'Vuelos': (None, 'size'),
+        'Registros_Retraso_Salida': ('DepDelayMinutes', 'count'),
+        'Suma_Retraso_Salida': ('DepDelayMinutes', 'sum'),
+    }),
+}
+
+_tipos_metrica = {'size': 'bigint', 'count': 'bigint', 'count_if': 'bigint', 'sum': 'double precision'}
+
+#  Operadores de agregaciones.comparaciones en SQL
+_operadores_sql = {'>': '>', '>=': '>=', '<': '<', '<=': '<=', '==': '=', '!=': '<>'}
+
+
+def columnas_origen(definiciones=definiciones):
+    #  Columnas de `vuelos` que necesitan los resúmenes
+    columnas = []
+    for claves, metricas in definiciones.values():
+        for c in list(claves) + [col for col, *_ in metricas.values() if col]:
+            columnas.extend(columnas_derivadas[c][0] if c in columnas_derivadas else [c])
+    return list(dict.fromkeys(columnas))
+
+
+def _columnas_lote(df, columnas):
+    #  Solo las columnas que piden los resúmenes, más las derivadas
+    base = {c for c in columnas if c not in columnas_derivadas}
+    for c in columnas:
+        if c in columnas_derivadas:
+            base.update(columnas_derivadas[c][0])
+    lote = df[[c for c in df.columns if c in base]]
+    derivadas = {c: columnas_derivadas[c][1](lote) for c in columnas if c in columnas_derivadas}
+    return lote.assign(**derivadas) if derivadas else lote
+
+
+def _expresion(columna):
+    if columna in columnas_derivadas:
+        return sql.SQL(columnas_derivadas[columna][2])
+    return sql.Identifier(columna)
+
+
+def _metrica_sql(columna, operacion, condicion):
+    if operacion == 'size':
+        return sql.SQL("COUNT(*)")
+    if operacion == 'count':
+        return sql.SQL("COUNT({})").format(_expresion(columna))
+    if operacion == 'sum':
+        return sql.SQL("COALESCE(SUM({}), 0)").format(_expresion(columna))
+    return sql.SQL("COUNT(*) FILTER (WHERE {} {} {})").format(
+        _expresion(columna), sql.SQL(_operadores_sql[condicion.comparacion]), sql.Literal(condicion.umbral))
+
+
+class Resumenes:
+    #  Tablas resumen de `vuelos` (por aerolínea, aeropuerto, par origen-destino y
+    #  hora de salida). Cada lote que se carga suma su parte con un UPSERT en la
+    #  misma transacción que el COPY, así los resúmenes nunca se adelantan ni se
+    #  atrasan respecto a `vuelos`.
+
+    def __init__(self, definiciones=definiciones):
+        self.definiciones = definiciones
+        self.agregaciones = {tabla: Agregacion(claves, metricas) for tabla, (claves, metricas) in definiciones.items()}
+
+    def parciales(self, chunk):
+        #  {tabla: DataFrame con las claves como índice y las métricas del lote}
+        columnas = set()
+        for agregacion in self.agregaciones.values():
+            columnas.update(agregacion.claves)
+            columnas.update(col for col, _, _ in agregacion.metricas.values() if col)
+        lote = _columnas_lote(chunk, columnas)
+        return {tabla: agregacion.calcular(lote) for tabla, agregacion in self.agregaciones.items()}
+
+    def preparar(self, cursor, reemplazar=False):
+        for tabla, (claves, metricas) in self.definiciones.items():
+            if reemplazar:
+                cursor.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(tabla)))
+            columnas = [sql.SQL("{} {} NOT NULL").format(sql.Identifier(c), sql.SQL(t)) for c, t in claves.items()]
+            columnas += [sql.SQL("{} {} NOT NULL DEFAULT 0").format(sql.Identifier(m), sql.SQL(_tipos_metrica[op]))
+                         for m, (_, op, *_) in metricas.items()]
+            columnas.append(sql.SQL("PRIMARY KEY ({})").format(sql.SQL(', ').join(map(sql.Identifier, claves))))
+            cursor.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} ({})").format(sql.Identifier(tabla),
+                                                                               sql.SQL(', ').join(columnas)))
+        cursor.execute(sql.SQL("""
+            CREATE TABLE IF NOT EXISTS {} (
+                version bigint NOT NULL,
+                actualizado timestamptz NOT NULL DEFAULT now()
+            )
+        """).format(sql.Identifier(tabla_version)))
+        cursor.execute(sql.SQL("INSERT INTO {0} (version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM {0})")
+                       .format(sql.Identifier(tabla_version)))
+
+    def actualizar(self, cursor, chunk):
+        #  Suma el lote a los resúmenes. Las filas se envían ordenadas por clave para
+        #  que las cargas en paralelo bloqueen las filas siempre en el mismo orden.
+        for tabla, parcial in self.parciales(chunk).items():
+            if parcial.empty:
+                continue
+            filas = parcial.sort_index().reset_index()
+            columnas = list(filas.columns)
+            claves = list(self.definiciones[tabla][0])
+            consulta = sql.SQL("INSERT INTO {} ({}) VALUES %s ON CONFLICT ({}) DO UPDATE SET {}").format(
+                sql.Identifier(tabla),
+                sql.SQL(', ').join(map(sql.Identifier, columnas)),
+                sql.SQL(', ').join(map(sql.Identifier, claves)),
+                sql.SQL(', ').join(sql.SQL("{0} = {1}.{0} + EXCLUDED.{0}").format(sql.Identifier(m), sql.Identifier(tabla))
+                                   for m in columnas if m not in claves))
+            execute_values(cursor, consulta.as_string(cursor), list(zip(*(filas[c].tolist() for c in columnas))),
+                           page_size=1000)
+        self.nueva_version(cursor)
+
+    def nueva_version(self, cursor):
+        cursor.execute(sql.SQL("UPDATE {} SET version = version + 1, actualizado = now()")
+                       .format(sql.Identifier(tabla_version)))
+
+    def reconstruir(self, cursor, tabla='vuelos'):
+        #  Recalcula todos los resúmenes desde `vuelos` (bases cargadas antes de
+        #  que existieran los resúmenes, o tras modificar `vuelos` a mano)
+        self.preparar(cursor, reemplazar=True)
+        for destino, (claves, metricas) in self.definiciones.items():
+            expresiones = [_expresion(c) for c in claves]
+            consulta = sql.SQL("INSERT INTO {} ({}) SELECT {} FROM {} WHERE {} GROUP BY {}").format(
+                sql.Identifier(destino),
+                sql.SQL(', ').join(map(sql.Identifier, list(claves) + list(metricas))),
+                sql.SQL(', ').join(expresiones + [_metrica_sql(*definicion) for definicion in
+                                                  (self.agregaciones[destino].metricas[m] for m in metricas)]),
+                sql.Identifier(tabla),
+                sql.SQL(' AND ').join(sql.SQL("({}) IS NOT NULL").format(e) for e in expresiones),
+                sql.SQL(', ').join(sql.SQL(str(i + 1)) for i in range(len(claves))))
+            cursor.execute(consulta)
+        self.nueva_version(cursor)
+
+
+def version_datos(cursor):
+    #  Versión actual de los datos, o None si la base no tiene resúmenes
+    cursor.execute("SELECT to_regclass(%s)", (tabla_version,))
+    if cursor.fetchone()[0] is None:
+        return None
+    cursor.execute(sql.SQL("SELECT version FROM {}").format(sql.Identifier(tabla_version)))
+    fila = cursor.fetchone()
+    return fila[0] if fila else None
@@ -0,0 +1,170 @@
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import pytest
+
+from benchmarks.generador import generar_csv
+from carga import CargadorCopy
+from duplicados import clave_vuelo
+from incremental import ejecutar_incremental
+from lectura import leer_csv, planificar_lectura
+from limpieza import limpiar_lote
+from resumenes import Resumenes, definiciones
+
+
+def consultar(db_url, consulta):
+    conexion = psycopg2.connect(db_url)
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute(consulta)
+            return cursor.fetchall()
+    finally:
+        conexion.close()
+
+
+def tabla_tipos():
+    #  Una columna por cada tipo que envía la carga, con un nulo en cada una
+    return pd.DataFrame({
+        'logico': pd.array([True, None, False], dtype='boolean'),
+        'corto': pd.array([1, None, -3], dtype='Int16'),
+        'entero': pd.array([100000, None, -7], dtype='Int32'),
+        'largo': pd.array([2 ** 40, None, 5], dtype='Int64'),
+        'real': np.array([1.5, np.nan, -2.25], dtype='float32'),
+        'doble': [0.1, np.nan, 1e300],
+        'fecha': pd.to_datetime(['2019-01-31', None, '1999-12-01']),
+        'momento': pd.to_datetime(['2019-01-31 10:30:15', None, '2000-01-01 00:00:00.5'], format='ISO8601'),
+        'texto': ['á,"b"', None, ''],
+        'categoria': pd.Categorical(['AA', None, 'DL']),
+    })
+
+
+filas_tipos = [
+    (True, 1, 100000, 2 ** 40, 1.5, 0.1, datetime.date(2019, 1, 31), datetime.datetime(2019, 1, 31, 10, 30, 15),
+     'á,"b"', 'AA'),
+    (None,) * 10,
+    (False, -3, -7, 5, -2.25, 1e300, datetime.date(1999, 12, 1), datetime.datetime(2000, 1, 1, 0, 0, 0, 500000),
+     '', 'DL'),
+]
+
+
+@pytest.fixture(scope='module')
+def origen_vuelos(tmp_path_factory):
+    ruta = str(tmp_path_factory.mktemp('origen') / 'vuelos.csv')
+    generar_csv(ruta, 3000)
+    return ruta
+
+
+@pytest.fixture(scope='module')
+def vuelos(origen_vuelos):
+    #  Vuelos limpios y sin claves repetidas, en lotes como los del staging
+    chunk = pd.concat(leer_csv(origen_vuelos, 1000, planificar_lectura(origen_vuelos)), ignore_index=True)
+    return limpiar_lote(chunk).drop_duplicates(clave_vuelo).reset_index(drop=True)
+
+
+def lotes(df, tamaño=500):
+    return [df.iloc[inicio:inicio + tamaño] for inicio in range(0, len(df), tamaño)]
+
+
+def estado_vuelos(db_url):
+    #  Filas de `vuelos` y de cada tabla resumen, en un orden fijo
+    estado = {'vuelos': consultar(db_url, "SELECT count(*), count(DISTINCT (\"FlightDate\", \"Reporting_Airline\", "
+                                          "\"Flight_Number_Reporting_Airline\", \"OriginAirportID\")) FROM vuelos")}
+    for tabla, (claves, _) in definiciones.items():
+        orden = ', '.join(f'"{c}"' for c in claves)
+        estado[tabla] = consultar(db_url, f"SELECT * FROM {tabla} ORDER BY {orden}")
+    return estado
+
+
+@pytest.mark.parametrize('formato', ['binary', 'text'])
+def test_copy_conserva_valores_y_nulos(db_url, formato):
+    df = tabla_tipos()
+    cargador = CargadorCopy(db_url, conexiones=2, formato=formato, diseño={}, claves={})
+    #  El lote vacío del medio no cambia nada
+    assert cargador.cargar('tipos', [df.iloc[:2], df.iloc[:0], df.iloc[2:]], reemplazar=True) == 3
+    assert consultar(db_url, "SELECT * FROM tipos ORDER BY largo NULLS FIRST") == [filas_tipos[1], filas_tipos[2], filas_tipos[0]]
+    columnas = dict(consultar(db_url, "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = 'tipos'"))
+    assert columnas == {'logico': 'boolean', 'corto': 'smallint', 'entero': 'integer', 'largo': 'bigint',
+                        'real': 'real', 'doble': 'double precision', 'fecha': 'date',
+                        'momento': 'timestamp without time zone', 'texto': 'text', 'categoria': 'text'}
+
+
+@pytest.mark.parametrize('formato', ['binary', 'text'])
+def test_tabla_vacia(db_url, formato):
+    cargador = CargadorCopy(db_url, formato=formato, diseño={}, claves={})
+    assert cargador.cargar_tablas({'vacia': tabla_tipos().iloc[:0]}) == {'vacia': 0}
+    assert consultar(db_url, "SELECT count(*) FROM vacia") == [(0,)]
+
+
+def test_reconstruir_indices(db_url):
+    df = tabla_tipos()
+    cargador = CargadorCopy(db_url, reconstruir_indices=True, diseño={}, claves={})
+    cargador.cargar('tipos', [df], reemplazar=True)
+    conexion = psycopg2.connect(db_url)
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute("CREATE INDEX tipos_entero ON tipos (entero) INCLUDE (texto)")
+            cursor.execute("ALTER TABLE tipos ADD CONSTRAINT tipos_largo UNIQUE (largo)")
+        conexion.commit()
+    finally:
+        conexion.close()
+    indices = consultar(db_url, "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'tipos' ORDER BY 1")
+
+    otro = df.assign(largo=pd.array([7, None, 8], dtype='Int64'))
+    assert cargador.cargar('tipos', lotes(otro, 1)) == 3
+    assert consultar(db_url, "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'tipos' ORDER BY 1") == indices
+    assert consultar(db_url, "SELECT count(*) FROM tipos") == [(6,)]
+    assert consultar(db_url, "SELECT bool_and(indisvalid) FROM pg_index WHERE indrelid = 'tipos'::regclass") == [(True,)]
+
+
+@pytest.mark.parametrize('formato', ['binary', 'text'])
+def test_recarga_con_upsert_no_cambia_vuelos_ni_resumenes(db_url, vuelos, formato):
+    cargador = CargadorCopy(db_url, conexiones=2, formato=formato)
+    assert cargador.cargar('vuelos', lotes(vuelos), resumenes=Resumenes(), reemplazar=True) == len(vuelos)
+    antes = estado_vuelos(db_url)
+    assert antes['vuelos'] == [(len(vuelos), len(vuelos))]
+
+    assert cargador.cargar('vuelos', lotes(vuelos), resumenes=Resumenes()) == 0
+    assert cargador.filas_omitidas['vuelos'] == len(vuelos)
+    assert estado_vuelos(db_url) == antes
+
+
+def test_carga_parcial_suma_solo_las_filas_nuevas(db_url, vuelos):
+    cargador = CargadorCopy(db_url)
+    mitad = len(vuelos) // 2
+    cargador.cargar('vuelos', lotes(vuelos.iloc[:mitad]), resumenes=Resumenes(), reemplazar=True)
+    #  Lotes con filas ya cargadas, nuevas y repetidas dentro del mismo lote
+    assert cargador.cargar('vuelos', lotes(pd.concat([vuelos, vuelos.iloc[-10:]])), resumenes=Resumenes()) == len(vuelos) - mitad
+    assert cargador.filas_omitidas['vuelos'] == mitad + 10
+    cargados = estado_vuelos(db_url)
+
+    conexion = psycopg2.connect(db_url)
+    try:
+        with conexion.cursor() as cursor:
+            Resumenes().reconstruir(cursor, 'vuelos')
+        conexion.commit()
+    finally:
+        conexion.close()
+    reconstruidos = estado_vuelos(db_url)
+    assert cargados['vuelos'] == [(len(vuelos), len(vuelos))]
+    for tabla in definiciones:
+        #  Las sumas de reales pueden diferir en el último decimal según el orden
+        pd.testing.assert_frame_equal(pd.DataFrame(cargados[tabla]), pd.DataFrame(reconstruidos[tabla]), check_exact=False)
+
+
+def test_recarga_incremental_no_agrega_filas(db_url, vuelos, origen_vuelos, tmp_path, monkeypatch):
+    #  Un ETL incremental sin estado sobre una base que ya tiene los vuelos: todos
+    #  los lotes pasan por el UPSERT y no entra ninguno
+    cargador = CargadorCopy(db_url)
+    cargador.cargar('vuelos', lotes(vuelos), resumenes=Resumenes(), reemplazar=True)
+    antes = estado_vuelos(db_url)
+
+    monkeypatch.chdir(tmp_path)
+    plan = planificar_lectura(origen_vuelos)
+    ejecutar_incremental(origen_vuelos, str(tmp_path / 'staging'),
+                         lambda saltar: leer_csv(origen_vuelos, 1000, plan, saltar_filas=saltar), 1000,
+                         cargador=cargador, resumenes=Resumenes(), ruta_estado=str(tmp_path / 'estado.json'))
+    assert os.path.exists(tmp_path / 'estado.json')
+    assert estado_vuelos(db_url) == antes
@@ -0,0 +1,58 @@
+import psycopg2
+import pytest
+
+from consultas import EjecutorConsultas
+
+consulta_hora = "Distribución de retrasos por hora"
+
+
+@pytest.fixture
+def vuelos_sin_hora(db_url):
+    #  `vuelos` como la dejaba `to_sql` antes de que el ETL calculara Hora_Salida,
+    #  sin tablas resumen: DepTime 2400 no es una hora válida y no se cuenta
+    conexion = psycopg2.connect(db_url)
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE vuelos ("Reporting_Airline" text, "OriginAirportID" bigint, "Origin" text, "Dest" text,
+                                     "Cancelled" double precision, "DepTime" double precision,
+                                     "DepDelayMinutes" double precision, "ArrDelayMinutes" double precision,
+                                     "ActualElapsedTime" double precision, "CRSElapsedTime" double precision)
+            """)
+            cursor.executemany("INSERT INTO vuelos VALUES ('AA', 1, 'JFK', 'LAX', 0, %s, %s, 1, 300, 310)",
+                               [(1005, 10), (1059, 20), (2400, 5), (None, 7), (130, 4), (130, None)])
+        conexion.commit()
+    finally:
+        conexion.close()
+    return db_url
+
+
+def test_hora_sin_columna_hora_salida(vuelos_sin_hora):
+    with EjecutorConsultas(vuelos_sin_hora, conexiones=1) as ejecutor:
+        resultados = ejecutor.ejecutar()
+    assert not ejecutor.errores
+    hora = resultados[consulta_hora]
+    assert hora['hora'].tolist() == [1, 10]
+    assert hora['retraso_promedio'].astype(float).tolist() == [4.0, 15.0]
+    assert hora['cantidad_vuelos'].tolist() == [1, 2]
+
+
+def test_hora_con_columna_hora_salida(vuelos_sin_hora):
+    with EjecutorConsultas(vuelos_sin_hora, conexiones=1) as ejecutor:
+        antes = ejecutor.ejecutar()[consulta_hora]
+    conexion = psycopg2.connect(vuelos_sin_hora)
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute("""
+                ALTER TABLE vuelos ADD COLUMN "Hora_Salida" smallint;
+                UPDATE vuelos SET "Hora_Salida" = floor("DepTime" / 100) WHERE "DepTime" BETWEEN 0 AND 2359;
+                ALTER TABLE vuelos DROP COLUMN "DepTime";
+            """)
+        conexion.commit()
+    finally:
+        conexion.close()
+    #  Sin DepTime la consulta solo puede usar la columna calculada en el ETL
+    with EjecutorConsultas(vuelos_sin_hora, conexiones=1) as ejecutor:
+        despues = ejecutor.ejecutar()[consulta_hora]
+    assert not ejecutor.errores
+    assert despues.equals(antes)
@@ -0,0 +1,177 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from carga import claves_unicas
+from duplicados import ConjuntoHash, Deduplicador, clave_vuelo, hash_claves
+from limpieza import limpiar_lote
+
+
+def lote_crudo(filas):
+    #  Filas (fecha, aerolínea, vuelo, aeropuerto, ArrDelayMinutes) con el resto
+    #  de las columnas que revisa la limpieza, como las lee el CSV
+    fechas, aerolineas, vuelos, aeropuertos, retrasos = zip(*filas)
+    return pd.DataFrame({
+        'FlightDate': list(fechas),
+        'Reporting_Airline': list(aerolineas),
+        'Flight_Number_Reporting_Airline': np.array(vuelos, dtype='float64'),
+        'OriginAirportID': np.array(aeropuertos, dtype='int64'),
+        'Origin': 'JFK', 'Dest': 'LAX',
+        'DepTime': 1005.0, 'ArrTime': 1330.0,
+        'ArrDelayMinutes': np.array(retrasos, dtype='float64'),
+    })
+
+
+def test_agregar_marca_solo_la_primera_aparicion():
+    conjunto = ConjuntoHash()
+    hashes = np.array([5, 7, 5, 9], dtype=np.uint64)
+    assert conjunto.agregar(hashes).tolist() == [True, True, False, True]
+    assert conjunto.agregar(np.array([9, 11], dtype=np.uint64)).tolist() == [False, True]
+    assert len(conjunto) == 4
+    assert conjunto.agregar(np.array([], dtype=np.uint64)).tolist() == []
+
+
+def test_contiene_con_colisiones():
+    #  Todos los hashes caen en la misma posición: el sondeo lineal los separa
+    conjunto = ConjuntoHash(capacidad=64)
+    capacidad = np.uint64(len(conjunto.tabla))
+    hashes = np.arange(1, 20, dtype=np.uint64) * capacidad + np.uint64(3)
+    assert conjunto.agregar(hashes[::2]).all()
+    assert conjunto.contiene(hashes).tolist() == [i % 2 == 0 for i in range(len(hashes))]
+
+
+def test_crece_al_superar_la_carga_maxima():
+    conjunto = ConjuntoHash(capacidad=4)
+    hashes = np.random.default_rng(0).integers(1, np.iinfo(np.uint64).max, 10000, dtype=np.uint64)
+    for inicio in range(0, len(hashes), 1000):
+        conjunto.agregar(hashes[inicio:inicio + 1000])
+    assert len(conjunto) == len(np.unique(hashes))
+    assert len(conjunto) <= len(conjunto.tabla) * 0.5
+    assert conjunto.contiene(hashes).all()
+    assert not conjunto.contiene(hashes + np.uint64(1)).any()
+
+
+def test_guardar_y_cargar(tmp_path):
+    ruta = str(tmp_path / 'vistos.npy')
+    conjunto = ConjuntoHash()
+    hashes = np.arange(1, 3000, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    conjunto.agregar(hashes)
+    conjunto.guardar(ruta)
+    cargado = ConjuntoHash.cargar(ruta)
+    assert len(cargado) == len(conjunto)
+    assert np.array_equal(cargado.tabla, conjunto.tabla)
+    assert cargado.contiene(hashes).all()
+    assert not cargado.agregar(hashes).any()
+
+
+def test_hash_igual_crudo_categorico_y_de_postgres():
+    crudo = lote_crudo([('2019-01-31', 'AA', 100, 12478, 1), ('2019-02-01', 'DL', 7, 10397, 2)])
+    limpio = limpiar_lote(crudo.copy())
+    assert isinstance(limpio['Reporting_Airline'].dtype, pd.CategoricalDtype)
+    #  psycopg2 devuelve fechas como datetime.date, enteros como int y texto como str
+    postgres = pd.DataFrame({
+        'FlightDate': [datetime.date(2019, 1, 31), datetime.date(2019, 2, 1)],
+        'Reporting_Airline': ['AA', 'DL'],
+        'Flight_Number_Reporting_Airline': pd.array([100, 7], dtype='Int64'),
+        'OriginAirportID': [12478, 10397],
+    })
+    esperados, validas = hash_claves(crudo)
+    assert validas.all()
+    for df in (limpio, postgres):
+        hashes, validas = hash_claves(df)
+        assert validas.all()
+        assert np.array_equal(hashes, esperados)
+    #  Otro vuelo del mismo día da otro hash
+    assert len(set(esperados.tolist())) == 2
+
+
+def test_hash_clave_incompleta():
+    crudo = lote_crudo([('2019-01-31', 'AA', 100, 12478, 1), ('no es fecha', 'AA', 100, 12478, 1)])
+    crudo.loc[0, 'Reporting_Airline'] = None
+    _, validas = hash_claves(crudo)
+    assert validas.tolist() == [False, False]
+
+
+def test_filtrar_descarta_repetidos_en_lote_y_ya_vistos():
+    duplicados = Deduplicador(ruta=None)
+    primero = lote_crudo([('2019-01-31', 'AA', 100, 1, 1), ('2019-01-31', 'AA', 100, 1, 2), ('2019-01-31', 'AA', 101, 1, 3)])
+    segundo = lote_crudo([('2019-01-31', 'AA', 101, 1, 4), ('2019-01-31', 'AA', 102, 1, 5)])
+    assert duplicados.filtrar(primero)['ArrDelayMinutes'].tolist() == [1, 3]
+    assert duplicados.filtrar(segundo)['ArrDelayMinutes'].tolist() == [5]
+    assert duplicados.descartes == {'duplicados_en_lote': 1, 'duplicados_ya_vistos': 1}
+
+
+@pytest.mark.parametrize('mismo_lote', [True, False])
+def test_copia_invalida_no_quita_el_lugar_a_la_valida(mismo_lote):
+    #  La primera copia tiene un retraso negativo y la limpieza la descarta: la
+    #  copia válida que llega después debe quedar
+    invalida = ('2019-01-31', 'AA', 100, 1, -5)
+    valida = ('2019-01-31', 'AA', 100, 1, 8)
+    lotes = [lote_crudo([invalida, valida])] if mismo_lote else [lote_crudo([invalida]), lote_crudo([valida])]
+    duplicados = Deduplicador(ruta=None)
+    limpios = pd.concat([limpiar_lote(duplicados.filtrar(lote)) for lote in lotes])
+    assert limpios['ArrDelayMinutes'].tolist() == [8]
+    assert sum(duplicados.descartes.values()) == 0
+    #  Una tercera copia, válida, ya es un duplicado
+    assert len(duplicados.filtrar(lote_crudo([valida]))) == 0
+
+
+def test_confirmar_y_reanudar_tras_escritura_cortada(tmp_path):
+    ruta = str(tmp_path / 'vistos.npy')
+    lote = lote_crudo([('2019-01-31', 'AA', 100, 1, 1), ('2019-01-31', 'AA', 101, 1, 2)])
+    pendiente = lote_crudo([('2019-02-01', 'AA', 100, 1, 3)])
+
+    duplicados = Deduplicador(ruta)
+    duplicados.filtrar(lote, indice=0)
+    duplicados.filtrar(pendiente, indice=1)
+    duplicados.confirmar(0)
+    #  El lote 1 no se confirmó (se cortó antes del COPY) y el diario quedó con
+    #  una escritura a medias
+    with open(duplicados.diario, 'ab') as archivo:
+        archivo.write(b'\x01\x02\x03')
+    assert not tmp_path.joinpath('vistos.npy').exists()
+
+    reanudado = Deduplicador(ruta)
+    assert len(reanudado.conjunto) == 2
+    assert len(reanudado.filtrar(lote)) == 0
+    assert len(reanudado.filtrar(pendiente)) == 1
+
+    reanudado.guardar()
+    assert tmp_path.joinpath('vistos.npy').exists()
+    assert not tmp_path.joinpath('vistos.npy.diario').exists()
+    assert len(Deduplicador(ruta).conjunto) == 3
+
+
+def test_descartar_diario(tmp_path):
+    ruta = str(tmp_path / 'vistos.npy')
+    guardado = lote_crudo([('2019-01-31', 'AA', 100, 1, 1)])
+    nuevo = lote_crudo([('2019-02-01', 'AA', 100, 1, 2)])
+    duplicados = Deduplicador(ruta)
+    duplicados.filtrar(guardado)
+    duplicados.guardar()
+
+    duplicados.filtrar(nuevo, indice=0)
+    duplicados.confirmar(0)
+    duplicados.descartar_diario()
+    assert not tmp_path.joinpath('vistos.npy.diario').exists()
+    #  Vuelve al índice guardado: el vuelo confirmado después se olvida
+    for deduplicador in (duplicados, Deduplicador(ruta)):
+        assert len(deduplicador.filtrar(guardado)) == 0
+    assert len(Deduplicador(ruta).filtrar(nuevo)) == 1
+
+
+def test_reemplazar_empieza_vacio(tmp_path):
+    ruta = str(tmp_path / 'vistos.npy')
+    lote = lote_crudo([('2019-01-31', 'AA', 100, 1, 1)])
+    duplicados = Deduplicador(ruta)
+    duplicados.filtrar(lote, indice=0)
+    duplicados.confirmar(0)
+    duplicados.guardar()
+    assert len(Deduplicador(ruta).filtrar(lote)) == 0
+    assert len(Deduplicador(ruta, reemplazar=True).filtrar(lote)) == 1
+
+
+def test_clave_vuelo_es_la_de_la_restriccion():
+    assert claves_unicas['vuelos'] == clave_vuelo